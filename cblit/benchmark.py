@@ -0,0 +1,154 @@
+"""Script to benchmark whole games.
+
+Record the LLM and embeddings calls of a run once, and then replay them offline, so that runs are repeatable:
+
+    CBLIT_CASSETTE=benchmark.jsonl.gz CBLIT_CASSETTE_MODE=record python -m cblit.benchmark 3
+    CBLIT_CASSETTE=benchmark.jsonl.gz python -m cblit.benchmark 3
+
+Set `CBLIT_CASSETTE_LATENCY=1` to replay the recorded latency as well.
+
+Add `logging` to compare the logging overhead of concurrent games, with prompts and responses logged in full
+in the event loop thread, in full from a background thread, and sampled:
+
+    CBLIT_CASSETTE=benchmark.jsonl.gz python -m cblit.benchmark 10 logging
+
+Add `memory` to compare the resident memory of idle players with their games hibernating and awake:
+
+    CBLIT_CASSETTE=benchmark.jsonl.gz python -m cblit.benchmark 1000 memory
+"""
+import asyncio
+import gc
+import os
+import sys
+import time
+
+from loguru import logger
+
+from cblit.game.corpus import PregeneratedCorpus
+from cblit.game.game import Game
+from cblit.logs import LoggingPolicy, configure_logging
+from cblit.loop_monitor import LoopLagMonitor
+from cblit.metrics import metrics
+from cblit.socketio.game import GameSession
+
+# Number of phrasebook phrases said to the officer in a game
+BENCHMARK_TURNS = 5
+
+
+async def run_game() -> None:
+    """Generate and play a game, observing how long each step takes."""
+    start_time = time.perf_counter()
+    game = await Game.generate()
+    metrics.observe("benchmark.generate_seconds", time.perf_counter() - start_time)
+
+    start_time = time.perf_counter()
+    await game.start()
+    metrics.observe("benchmark.start_seconds", time.perf_counter() - start_time)
+
+    # Hard difficulty does not add random hints, so replies are the same from run to run
+    for phrase in game.phrasebook.phrases[:BENCHMARK_TURNS]:
+        start_time = time.perf_counter()
+        await game.say_to_officer(phrase.conlang, "hard")
+        metrics.observe("benchmark.say_seconds", time.perf_counter() - start_time)
+
+    start_time = time.perf_counter()
+    await game.give_document(0, "hard")
+    metrics.observe("benchmark.give_document_seconds", time.perf_counter() - start_time)
+
+
+async def run_benchmark(games: int) -> None:
+    """Play games one after another, and report the timings, including the event loop lag.
+
+    Args:
+        games (int): number of games to play
+    """
+    configure_logging()
+    lag_monitor = LoopLagMonitor()
+    lag_monitor.start()
+    start_time = time.perf_counter()
+    for i in range(games):
+        logger.info(f"Benchmark game #{i}")
+        await run_game()
+    total_seconds = time.perf_counter() - start_time
+    lag_monitor.stop()
+    for name, statistic in sorted(metrics.statistics.items()):
+        if name.startswith(("benchmark.", "event_loop.", "file_io.", "translator.")):
+            logger.info(f"{name}: {statistic.report()}")
+    logger.info(f"{games} games in {total_seconds:.3f} seconds, {games / total_seconds:.3f} games per second")
+
+
+async def run_logging_benchmark(games: int) -> None:
+    """Play games concurrently with each logging policy, and report the throughput.
+
+    Args:
+        games (int): number of games to play with each policy
+    """
+    policies = {
+        "verbose, in the event loop": LoggingPolicy(verbose=True, enqueue=False),
+        "verbose, in background": LoggingPolicy(verbose=True),
+        "sampled, in background": LoggingPolicy.from_env(),
+    }
+    throughputs = {}
+    for name, policy in policies.items():
+        configure_logging(policy)
+        start_time = time.perf_counter()
+        await asyncio.gather(*(run_game() for _ in range(games)))
+        throughputs[name] = games / (time.perf_counter() - start_time)
+    # Records of the last policy may still be queued, the report goes after them
+    await logger.complete()
+    configure_logging()
+    for name, throughput in throughputs.items():
+        logger.info(f"Logging {name}: {throughput:.3f} games per second")
+
+
+def get_resident_memory() -> int:
+    """Get resident memory of the process, including native allocations, e.g. of the FAISS indexes, on Linux.
+
+    Returns:
+        int: resident memory, in bytes
+    """
+    gc.collect()
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+async def run_memory_benchmark(players: int) -> None:
+    """Hold started games of idle players, and report their resident memory, hibernating and then awake.
+
+    Every game of the corpus is loaded once beforehand, so that the embeddings cache shared by all players
+    is not counted towards them. Hibernating games are measured first, as the resident memory does not drop
+    once awake games are freed. Each game hibernates right after it starts, so only one is awake at a time.
+
+    Args:
+        players (int): number of idle players
+    """
+    configure_logging()
+    corpus = PregeneratedCorpus()
+    for _ in corpus.usage:
+        (await corpus.pick()).to_game()
+    sessions = []
+    baseline = get_resident_memory()
+    for i in range(players):
+        session = GameSession(str(i), (await corpus.pick()).to_game())
+        await session.start()
+        session.hibernate()
+        sessions.append(session)
+    hibernating = get_resident_memory()
+    start_time = time.perf_counter()
+    for session in sessions:
+        await session.wake()
+    wake_seconds = time.perf_counter() - start_time
+    awake = get_resident_memory()
+    for name, memory in [("hibernating", hibernating - baseline), ("awake", awake - baseline)]:
+        logger.info(f"Idle players {name}: {memory * 1000 / players / 2 ** 20:.1f} MiB per 1,000 players")
+    logger.info(f"Waking a player takes {wake_seconds / players * 1000:.3f} milliseconds")
+
+
+if __name__ == "__main__":
+    benchmark_games = int(sys.argv[1]) if sys.argv[1:] else 1
+    if sys.argv[2:] == ["logging"]:
+        asyncio.run(run_logging_benchmark(benchmark_games))
+    elif sys.argv[2:] == ["memory"]:
+        asyncio.run(run_memory_benchmark(benchmark_games))
+    else:
+        asyncio.run(run_benchmark(benchmark_games))
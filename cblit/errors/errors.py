@@ -4,3 +4,11 @@ class CblitOpenaiError(Exception):
 
 class CblitArgumentError(ValueError):
     pass
+
+
+class CblitTimeoutError(TimeoutError):
+    """A stage of a turn has not finished in time."""
+
+
+class CblitModelUnavailableError(CblitOpenaiError):
+    """The language model backend is unavailable."""
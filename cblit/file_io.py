@@ -0,0 +1,169 @@
+"""Asynchronous file I/O module.
+
+Blocking reads and writes of corpus games, snapshots, journals and scripts run in a dedicated thread pool,
+so that the event loop never waits for the disk, and a slow disk cannot take over the default executor.
+Large files are read through memory maps, and parsed by orjson straight from the mapped pages.
+"""
+import asyncio
+import contextvars
+import functools
+import mmap
+import os
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, TypeVar
+
+import orjson
+
+from cblit.metrics import metrics
+
+T = TypeVar("T")
+
+# Files at least this large are read through a memory map, in bytes
+MMAP_THRESHOLD = 1024 * 1024
+
+
+@functools.cache
+def get_file_io_executor() -> ThreadPoolExecutor:
+    """Get the thread pool of file I/O, which bounds how many file operations run at the same time.
+
+    Its size is set by `CBLIT_FILE_IO_WORKERS`.
+
+    Returns:
+        ThreadPoolExecutor: executor shared by the process
+    """
+    return ThreadPoolExecutor(int(os.getenv("CBLIT_FILE_IO_WORKERS", "4")), thread_name_prefix="cblit-file-io")
+
+
+async def run_file_io(func: Callable[..., T], *args: Any) -> T:
+    """Run a blocking file operation in the file I/O thread pool.
+
+    The operation runs in a copy of the current context, as with `asyncio.to_thread`.
+
+    Args:
+        func (Callable[..., T]): blocking operation
+        args (Any): its arguments
+
+    Returns:
+        T: result of the operation
+    """
+    context = contextvars.copy_context()
+    start_time = time.perf_counter()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(
+            get_file_io_executor(), functools.partial(context.run, func, *args)
+        )
+    finally:
+        metrics.observe("file_io.seconds", time.perf_counter() - start_time)
+
+
+def load_json(path: str) -> Any:
+    """Read and parse a JSON file, blocking.
+
+    Args:
+        path (str): file path
+
+    Returns:
+        Any: parsed JSON
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size < MMAP_THRESHOLD:
+            return orjson.loads(f.read())
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapping, memoryview(mapping) as view:
+            metrics.increment("file_io.mapped_reads")
+            return orjson.loads(view)
+
+
+def write_text_atomically(path: str, data: str) -> None:
+    """Write a text file, blocking, so that readers never see it partially written.
+
+    Args:
+        path (str): file path
+        data (str): text to write
+    """
+    temporary_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temporary_path, "w") as f:
+        f.write(data)
+    os.replace(temporary_path, path)
+
+
+def create_text_atomically(path: str, data: str) -> None:
+    """Write a new text file, blocking, so that readers never see it partially written.
+
+    The complete file is linked into place, which fails if the path is taken, even by a concurrent writer.
+
+    Args:
+        path (str): file path
+        data (str): text to write
+
+    Raises:
+        FileExistsError: if the file exists
+    """
+    temporary_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temporary_path, "w") as f:
+        f.write(data)
+    try:
+        os.link(temporary_path, path)
+    finally:
+        os.remove(temporary_path)
+
+
+def read_text_file(path: str) -> str:
+    """Read a text file, blocking.
+
+    Args:
+        path (str): file path
+
+    Returns:
+        str: text
+    """
+    with open(path) as f:
+        return f.read()
+
+
+async def read_json(path: str) -> Any:
+    """Read and parse a JSON file.
+
+    Args:
+        path (str): file path
+
+    Returns:
+        Any: parsed JSON
+    """
+    return await run_file_io(load_json, path)
+
+
+async def read_text(path: str) -> str:
+    """Read a text file.
+
+    Args:
+        path (str): file path
+
+    Returns:
+        str: text
+    """
+    return await run_file_io(read_text_file, path)
+
+
+async def write_text(path: str, data: str) -> None:
+    """Write a text file atomically.
+
+    Args:
+        path (str): file path
+        data (str): text to write
+    """
+    await run_file_io(write_text_atomically, path, data)
+
+
+async def list_directory(path: str) -> list[str]:
+    """List a directory.
+
+    Args:
+        path (str): directory path
+
+    Returns:
+        list[str]: names of the entries
+    """
+    return await run_file_io(os.listdir, path)
@@ -0,0 +1,276 @@
+"""Pregenerated games corpus module."""
+import asyncio
+import collections
+import dataclasses
+import fcntl
+import math
+import os
+import random
+import time
+from collections.abc import Callable
+
+from langchain.callbacks import get_openai_callback
+from loguru import logger
+
+from cblit.file_io import list_directory
+from cblit.game.game import Game
+from cblit.game.pregenerated_game import PREGENERATED_GAMES_DIRECTORY, PregeneratedGame, get_game_ids
+from cblit.metrics import metrics
+
+# Seconds between checks of whether the corpus needs to grow
+REFILL_CHECK_INTERVAL = 30.0
+# Window over which the token budget is enforced, in seconds
+TOKEN_BUDGET_WINDOW = 3600.0
+# Tokens a game generation is assumed to take before any has been observed
+DEFAULT_GAME_TOKENS = 10000
+# File in the corpus directory locked by the only refiller allowed to grow the corpus
+REFILLER_LOCK_FILENAME = ".refiller.lock"
+
+
+class PregeneratedCorpus:
+    """Corpus of pregenerated games, which keeps track of how often each game is drawn."""
+    directory: str
+    usage: dict[str, int]
+
+    def __init__(self, directory: str = PREGENERATED_GAMES_DIRECTORY) -> None:
+        """Initialise corpus from a directory of pregenerated games.
+
+        Args:
+            directory (str): directory with pregenerated games
+        """
+        self.directory = directory
+        self.usage = {}
+        self.refresh()
+
+    def refresh(self) -> None:
+        """Pick up games added to the directory, or removed from it, by other workers or by hand."""
+        self._sync_games(os.listdir(self.directory), set(self.usage))
+
+    async def arefresh(self) -> None:
+        """Pick up games added to the directory, or removed from it, without blocking the event loop."""
+        known = set(self.usage)
+        self._sync_games(await list_directory(self.directory), known)
+
+    def _sync_games(self, filenames: list[str], known: set[str]) -> None:
+        """Add games, which are not in the corpus yet, and forget the ones, which files have disappeared.
+
+        Args:
+            filenames (list[str]): names of the directory entries
+            known (set[str]): games in the corpus when the directory was listed, games published meanwhile are kept
+        """
+        game_ids = get_game_ids(filenames)
+        for game_id in known.difference(game_ids):
+            self.usage.pop(game_id, None)
+        for game_id in game_ids:
+            self.usage.setdefault(game_id, 0)
+        self._report()
+
+    @property
+    def fresh_games(self) -> int:
+        """Get number of games that have not been drawn yet.
+
+        Returns:
+            int: number of fresh games
+        """
+        return sum(1 for count in self.usage.values() if count == 0)
+
+    async def pick(self) -> PregeneratedGame:
+        """Draw one of the least used games.
+
+        Returns:
+            PregeneratedGame: drawn game
+        """
+        least_usage = min(self.usage.values())
+        game_id = random.choice([game_id for game_id, count in self.usage.items() if count == least_usage])
+        metrics.increment("corpus.draws")
+        if least_usage > 0:
+            metrics.increment("corpus.repeated_draws")
+        self.usage[game_id] += 1
+        self._report()
+        return await PregeneratedGame.aget_by_id(game_id, self.directory)
+
+    async def publish(self, game: PregeneratedGame) -> str:
+        """Save a new game into the corpus, making it available to be drawn immediately.
+
+        Args:
+            game (PregeneratedGame): game to publish
+
+        Returns:
+            str: ID of the game in the corpus
+        """
+        game_id = await game.asave(self.directory)
+        self.usage[game_id] = 0
+        metrics.increment("corpus.published")
+        self._report()
+        return game_id
+
+    def _report(self) -> None:
+        """Report corpus size and reuse."""
+        metrics.set_gauge("corpus.size", len(self.usage))
+        metrics.set_gauge("corpus.fresh_games", self.fresh_games)
+        metrics.set_gauge("corpus.reuse_rate", metrics.ratio("corpus.repeated_draws", "corpus.draws"))
+
+
+@dataclasses.dataclass
+class RefillPolicy:
+    """Limits of the background corpus generation."""
+    # Target number of fresh games per active player
+    games_per_player: float = 1.0
+    # Maximum number of games generated at the same time
+    max_concurrency: int = 1
+    # Maximum number of tokens spent on generation per hour
+    token_budget: int = 200000
+
+
+class CorpusRefiller:
+    """Background generator of new corpus games, driven by demand.
+
+    It keeps a target number of fresh games per active player, and only generates when the server is idle,
+    with bounded concurrency and a token budget. Only one process runs a refiller for a corpus directory at a time,
+    so that the budget is not multiplied by the number of workers.
+    """
+    corpus: PregeneratedCorpus
+    active_players: Callable[[], int]
+    is_idle: Callable[[], bool]
+    policy: RefillPolicy
+    spent_tokens: collections.deque[tuple[float, int]]
+    generations: set[asyncio.Task[None]]
+    _task: asyncio.Task[None] | None
+    # Descriptor of the locked file, if this refiller grows the corpus
+    _lock: int | None
+
+    def __init__(
+            self,
+            corpus: PregeneratedCorpus,
+            active_players: Callable[[], int],
+            is_idle: Callable[[], bool],
+            policy: RefillPolicy
+    ) -> None:
+        """Initialise refiller.
+
+        Args:
+            corpus (PregeneratedCorpus): corpus to publish new games into
+            active_players (Callable[[], int]): number of currently active players
+            is_idle (Callable[[], bool]): whether the server has spare capacity for generation
+            policy (RefillPolicy): generation limits
+        """
+        self.corpus = corpus
+        self.active_players = active_players
+        self.is_idle = is_idle
+        self.policy = policy
+        self.spent_tokens = collections.deque()
+        self.generations = set()
+        self._task = None
+        self._lock = None
+
+    def start(self) -> bool:
+        """Start watching the corpus in the background, unless another process is growing it already.
+
+        Returns:
+            bool: whether this process grows the corpus
+        """
+        if self._task is None:
+            if not self._acquire_lock():
+                logger.info("The corpus is grown by another process")
+                return False
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        return True
+
+    def stop(self) -> None:
+        """Stop watching the corpus, cancelling generations in progress."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for generation in self.generations:
+            generation.cancel()
+        if self._lock is not None:
+            os.close(self._lock)
+            self._lock = None
+
+    def _acquire_lock(self) -> bool:
+        """Lock the corpus directory for this refiller, the lock is released by the OS if the process dies.
+
+        Returns:
+            bool: whether the lock has been acquired
+        """
+        lock = os.open(os.path.join(self.corpus.directory, REFILLER_LOCK_FILENAME), os.O_CREAT | os.O_RDWR)
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(lock)
+            return False
+        self._lock = lock
+        return True
+
+    @property
+    def tokens_in_window(self) -> int:
+        """Get number of tokens spent within the budget window.
+
+        Returns:
+            int: spent tokens
+        """
+        window_start = time.monotonic() - TOKEN_BUDGET_WINDOW
+        while self.spent_tokens and self.spent_tokens[0][0] < window_start:
+            self.spent_tokens.popleft()
+        return sum(tokens for _, tokens in self.spent_tokens)
+
+    @property
+    def expected_game_tokens(self) -> float:
+        """Get number of tokens a game generation is expected to take.
+
+        Returns:
+            float: mean tokens per observed generation
+        """
+        statistic = metrics.statistics.get("corpus.generation_tokens")
+        return statistic.mean if statistic is not None else DEFAULT_GAME_TOKENS
+
+    @property
+    def deficit(self) -> int:
+        """Get number of fresh games missing to reach the target.
+
+        Returns:
+            int: number of games to generate
+        """
+        target = math.ceil(self.policy.games_per_player * self.active_players())
+        return max(0, target - self.corpus.fresh_games - len(self.generations))
+
+    def _can_generate(self) -> bool:
+        """Check whether one more generation may be started now.
+
+        Returns:
+            bool: whether the concurrency and token budgets allow it, and the server is idle
+        """
+        return (
+            len(self.generations) < self.policy.max_concurrency
+            and self.tokens_in_window + self.expected_game_tokens <= self.policy.token_budget
+            and self.is_idle()
+        )
+
+    async def _run(self) -> None:
+        """Watch the corpus, and schedule generations while there is a deficit."""
+        while True:
+            await self.corpus.arefresh()
+            while self.deficit > 0 and self._can_generate():
+                task = asyncio.get_running_loop().create_task(self._generate())
+                self.generations.add(task)
+                task.add_done_callback(self.generations.discard)
+            metrics.set_gauge("corpus.generations_in_progress", len(self.generations))
+            await asyncio.sleep(REFILL_CHECK_INTERVAL)
+
+    async def _generate(self) -> None:
+        """Generate a game, and publish it into the corpus."""
+        start_time = time.monotonic()
+        with get_openai_callback() as callback:
+            try:
+                game = await Game.generate()
+                await game.start()
+                game_id = await self.corpus.publish(PregeneratedGame.from_game(game))
+            except Exception as error:
+                metrics.increment("corpus.generation_errors")
+                logger.error(f"Could not generate a corpus game: {error}")
+                return
+            finally:
+                self.spent_tokens.append((time.monotonic(), callback.total_tokens))
+        metrics.observe("corpus.generation_tokens", callback.total_tokens)
+        metrics.observe("corpus.generation_seconds", time.monotonic() - start_time)
+        logger.info(f"Published {game_id} into the corpus")
@@ -0,0 +1,100 @@
+"""Turn deadline module.
+
+A turn runs under a deadline, and each of its LLM stages runs under a sub-deadline,
+which never extends past the turn's one.
+"""
+import asyncio
+import contextlib
+import contextvars
+import dataclasses
+import time
+from collections.abc import Awaitable, Iterator
+from typing import TypeVar
+
+from cblit.errors.errors import CblitTimeoutError
+from cblit.game.trace import get_turn_trace
+from cblit.metrics import metrics
+
+T = TypeVar("T")
+
+
+@dataclasses.dataclass
+class DeadlinePolicy:
+    """Timeouts of turns and their stages."""
+    # Time a whole turn may take, in seconds
+    turn_timeout: float = 120.0
+    # Time a single LLM stage of a turn may take, in seconds
+    stage_timeout: float = 60.0
+    # Time a translation may take, before an approximate one is composed locally instead, in seconds
+    translation_target: float = 10.0
+
+
+@dataclasses.dataclass
+class Deadline:
+    """Deadline of the current turn."""
+    # Event loop time the turn has to finish by
+    expires_at: float
+    stage_timeout: float
+    translation_target: float
+
+    def remaining(self) -> float:
+        """Get time left until the deadline.
+
+        Returns:
+            float: remaining time in seconds, 0 if the deadline has passed
+        """
+        return max(0.0, self.expires_at - asyncio.get_running_loop().time())
+
+
+current_deadline: contextvars.ContextVar[Deadline | None] = contextvars.ContextVar("current_deadline", default=None)
+
+
+@contextlib.contextmanager
+def turn_deadline(policy: DeadlinePolicy) -> Iterator[Deadline]:
+    """Run the stages within the context under a turn deadline.
+
+    Args:
+        policy (DeadlinePolicy): timeouts to apply
+
+    Yields:
+        Deadline: deadline of the turn
+    """
+    deadline = Deadline(
+        asyncio.get_running_loop().time() + policy.turn_timeout, policy.stage_timeout, policy.translation_target
+    )
+    token = current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        current_deadline.reset(token)
+
+
+async def run_stage(name: str, stage: Awaitable[T]) -> T:
+    """Run a stage of the current turn under its sub-deadline.
+
+    Without a turn deadline, e.g. in the CLI, the stage runs without a timeout.
+    Time spent in the stage is recorded in the turn trace.
+
+    Args:
+        name (str): stage name, used in metrics and errors
+        stage (Awaitable[T]): stage to run
+
+    Returns:
+        T: result of the stage
+
+    Raises:
+        CblitTimeoutError: The stage has not finished in time
+    """
+    deadline = current_deadline.get()
+    start_time = time.monotonic()
+    try:
+        if deadline is None:
+            return await stage
+        try:
+            return await asyncio.wait_for(stage, min(deadline.stage_timeout, deadline.remaining()))
+        except TimeoutError as error:
+            metrics.increment("deadlines.timed_out_stages")
+            metrics.increment(f"deadlines.timed_out_stages.{name}")
+            raise CblitTimeoutError(f"'{name}' stage has not finished in time") from error
+    finally:
+        get_turn_trace().record_stage(name, time.monotonic() - start_time)
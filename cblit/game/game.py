@@ -1,19 +1,76 @@
 """Game session module."""
+import asyncio
 import dataclasses
 import random
-from typing import Self, cast
+from typing import Self
 
 from dataclasses_json import DataClassJsonMixin
 from loguru import logger
+from pydantic import BaseModel
 
 from cblit.errors.errors import CblitArgumentError
+from cblit.game.deadline import run_stage
+from cblit.game.generation_graph import GenerationGraph
+from cblit.game.trace import get_turn_trace
+from cblit.llm.concurrency import get_generation_budget, limiting_llm_calls
+from cblit.metrics import metrics
 from cblit.session.country import ConstructedCountrySession, Country
 from cblit.session.immigrant.immigrant import Immigrant
+from cblit.session.immigrant.quenta import Quenta, QuentaSession
+from cblit.session.language.detector import DetectedLanguage
 from cblit.session.language.phrasebook import Phrasebook
-from cblit.session.language.translator import ConlangEntry, TranslatorSession
-from cblit.session.officer import LanguageUnderstanding, OfficerSession
+from cblit.session.language.translator import ApproximateConlangEntry, ConlangEntry, TranslatorSession
+from cblit.session.officer import SUCCESS_MARKER, LanguageUnderstanding, OfficerSession, OfficerTurn
 
 NORMAL_DIFFICULTY_CHANCE = 0.5
+OPENING_SAYING = "Hi!"
+APPROXIMATE_TRANSLATION_NOTE = "[The interpreter is busy, the translation is approximate]"
+# How well the officer understands the player, by the language the player has written in
+LANGUAGE_UNDERSTANDING = {
+    DetectedLanguage.CONLANG: LanguageUnderstanding.NATIVE_CLEAR,
+    DetectedLanguage.ENGLISH: LanguageUnderstanding.NON_NATIVE,
+    DetectedLanguage.GIBBERISH: LanguageUnderstanding.NATIVE_GIBBERISH,
+}
+
+
+class OpeningExchange(BaseModel):
+    """Opening exchange with the officer, which is the same for every game started from the same content."""
+    # The visitor's greeting and the officer's reply in English, as seeded in the officer's memory
+    turn: OfficerTurn
+    # The officer's reply in Conlang
+    conlang: str
+
+
+async def new_translator_session(country: Country) -> TranslatorSession:
+    """Create translator of a country's language, knowing its example sentence.
+
+    Args:
+        country (Country): constructed country
+
+    Returns:
+        TranslatorSession: translator
+    """
+    return TranslatorSession(
+        country.language_name,
+        ConlangEntry(
+            english=country.example_sentence_translation,
+            conlang=country.example_sentence,
+        ),
+    )
+
+
+async def new_quenta(country: Country) -> Quenta:
+    """Generate quenta of an immigrant, who has just moved to a country from its neighbour.
+
+    Args:
+        country (Country): constructed country
+
+    Returns:
+        Quenta: generated quenta
+    """
+    quenta: Quenta = await QuentaSession.instance().new_quenta(country.neighbour_country_name, country.country_name)
+    return quenta
+
 
 @dataclasses.dataclass
 class Game(DataClassJsonMixin):
@@ -26,65 +83,127 @@ class Game(DataClassJsonMixin):
     phrasebook: Phrasebook
     started: bool
     won: bool
+    pregenerated_game_id: str | None = None
+    opening: OpeningExchange | None = None
 
     @classmethod
-    async def generate(cls) -> Self:
+    async def generate(cls, country: Country | None = None, quenta: Quenta | None = None) -> Self:
         """Generate game session.
 
+        Args:
+            country (Country | None): already generated country, a new one is generated if not set
+            quenta (Quenta | None): already generated immigrant's quenta, a new one is generated if not set
+
         Returns:
             Game:
         """
-        country_session = ConstructedCountrySession.instance()
-        country = await country_session.new_country()
-        translator_session = TranslatorSession(
-            country.language_name,
-            ConlangEntry(
-                english=country.example_sentence_translation,
-                conlang=country.example_sentence,
-            ),
-        )
-        phrasebook = await Phrasebook.from_translator_session(translator_session)
-        officer_session = OfficerSession()
-        immigrant = await Immigrant.get_new(country, translator_session)
+        graph = GenerationGraph(get_generation_budget())
+        graph.add("country", ConstructedCountrySession.instance().new_country)
+        graph.add("translator", new_translator_session, "country")
+        graph.add("phrasebook", Phrasebook.from_translator_session, "translator")
+        graph.add("quenta", new_quenta, "country")
+        graph.add("immigrant", Immigrant.get_new, "country", "translator", "quenta")
+        known = {name: value for name, value in [("country", country), ("quenta", quenta)] if value is not None}
+        results = await graph.run(known)
+        # Translations made during generation are part of the game content, not learned during play
+        results["translator"].learned.clear()
         return cls(
-            country_session=country_session,
-            country=country,
-            translator_session=translator_session,
-            officer_session=officer_session,
-            immigrant=immigrant,
-            phrasebook=phrasebook,
+            country_session=ConstructedCountrySession.instance(),
+            country=results["country"],
+            translator_session=results["translator"],
+            officer_session=OfficerSession(),
+            immigrant=results["immigrant"],
+            phrasebook=results["phrasebook"],
             started=False,
             won=False
         )
 
+    @classmethod
+    async def generate_many(cls, count: int) -> list[Self]:
+        """Generate game sessions, with their countries and quentas generated in batches.
+
+        Args:
+            count (int): number of games
+
+        Returns:
+            list[Game]: games
+        """
+        with limiting_llm_calls(get_generation_budget()):
+            countries = await ConstructedCountrySession.instance().new_countries(count)
+            quentas = await QuentaSession.instance().new_quentas(
+                [(country.neighbour_country_name, country.country_name) for country in countries]
+            )
+        return list(await asyncio.gather(*(
+            cls.generate(country, quenta) for country, quenta in zip(countries, quentas, strict=True)
+        )))
+
     async def start(self) -> str:
         """Start session, by saying initial phrase to the officer.
 
+        If the opening exchange is already known, it is replayed without calling the LLM.
+
         Returns:
             str: initial reply from the officer
         """
         self.started = True
-        reply = await self.officer_session.say("Hi!", LanguageUnderstanding.NATIVE_CLEAR)
-        return cast(str, await self.translator_session.translate_to_conlang(reply))
+        if self.opening is not None:
+            self.officer_session.restore_history([self.opening.turn])
+            return self.opening.conlang
+        reply = await run_stage("officer", self.officer_session.say(OPENING_SAYING, LanguageUnderstanding.NATIVE_CLEAR))
+        entry = await self._translate(reply, to_conlang=True)
+        trace = get_turn_trace()
+        trace.reply, trace.translation = reply, entry.conlang
+        if isinstance(entry, ApproximateConlangEntry):
+            # An approximate opening is not worth reusing
+            return f"{entry.conlang}\n{APPROXIMATE_TRANSLATION_NOTE}"
+        self.opening = OpeningExchange(turn=self.officer_session.history()[0], conlang=entry.conlang)
+        return entry.conlang
+
+    async def _translate(self, phrase: str, to_conlang: bool) -> ConlangEntry:
+        """Translate a phrase as a stage of the turn.
+
+        Args:
+            phrase (str): phrase to translate
+            to_conlang (bool): whether to translate from English to Conlang, or the other way around
+
+        Returns:
+            ConlangEntry: translation, `ApproximateConlangEntry` if the translator had to fall back
+        """
+        conlang_name = self.translator_session.conlang_name
+        if to_conlang:
+            return await run_stage(
+                "translate_to_conlang", self.translator_session.translate("English", conlang_name, phrase)
+            )
+        return await run_stage(
+            "translate_from_conlang", self.translator_session.translate(conlang_name, "English", phrase)
+        )
 
     async def process_officer(self, reply: str) -> str:
         """Process officer's reply.
 
-        Detect special sequences.
-        * %%SUCCESS%% -- Winning condition met
+        The winning condition is met once the registration tracked by the officer session is complete,
+        or once the officer says the success marker, if the tracker has not recognised the procedure's wording.
 
         Args:
             reply (str): raw reply
 
         Returns:
-            str: processed reply
+            str: processed reply, with a note if its translation is approximate
         """
-        if "%%SUCCESS%%" in reply:
+        registration = self.officer_session.registration
+        metrics.increment(f"registration.{registration.step.name.lower()}")
+        if SUCCESS_MARKER in reply and not registration.is_complete:
+            metrics.increment("registration.success_marker")
+        if (registration.is_complete or SUCCESS_MARKER in reply) and not self.won:
             logger.debug("Winning condition met")
             self.won = True
-        reply = reply.replace("%%SUCCESS%%", "")
-        translation = cast(str, await self.translator_session.translate_to_conlang(reply))
-        return translation
+        reply = reply.replace(SUCCESS_MARKER, "")
+        entry = await self._translate(reply, to_conlang=True)
+        trace = get_turn_trace()
+        trace.reply, trace.translation = reply, entry.conlang
+        if isinstance(entry, ApproximateConlangEntry):
+            return f"{entry.conlang}\n{APPROXIMATE_TRANSLATION_NOTE}"
+        return entry.conlang
 
     async def say_to_officer(self, sentence: str, difficulty: str) -> str:
         """Say a sentence to the officer.
@@ -96,19 +215,23 @@ class Game(DataClassJsonMixin):
         Returns:
             str: officer's reply
         """
-        # is_english = await self.country_session.is_english(sentence, FORGET_PRIORITY)
-        # is_national = await self.country_session.is_national(sentence, FORGET_PRIORITY)
-        # if is_national:
-        #     translation = await self.country_session.to_english(sentence, NORMAL_PRIORITY)
-        #     reply = await self.officer_session.say(translation, LanguageUnderstanding.NATIVE_CLEAR)
-        # elif is_english:
-        #     reply = await self.officer_session.say(sentence, LanguageUnderstanding.NON_NATIVE)
-        # else:
-        #     reply = await self.officer_session.say(sentence, LanguageUnderstanding.NATIVE_GIBBERISH)
-        translation = await self.translator_session.translate_from_conlang(sentence)
-        raw_reply = await self.officer_session.say(translation, LanguageUnderstanding.NATIVE_CLEAR)
-        # TODO
+        language = self.translator_session.detector.detect(sentence)
+        metrics.increment(f"detector.{language.value}")
+        entry: ConlangEntry | None = None
+        if language == DetectedLanguage.CONLANG:
+            entry = await self._translate(sentence, to_conlang=False)
+            translation = entry.english
+        else:
+            # English and gibberish are passed to the officer as they are, there is nothing to translate
+            translation = sentence
+        get_turn_trace().interpretation = translation
+        raw_reply = await run_stage(
+            "officer", self.officer_session.say(translation, LANGUAGE_UNDERSTANDING[language])
+        )
         reply = await self.process_officer(raw_reply)
+        if isinstance(entry, ApproximateConlangEntry) and APPROXIMATE_TRANSLATION_NOTE not in reply:
+            # The officer has only understood an approximate translation
+            reply = f"{reply}\n{APPROXIMATE_TRANSLATION_NOTE}"
         if difficulty == "hard":
             return reply
         elif difficulty == "normal":
@@ -136,7 +259,7 @@ class Game(DataClassJsonMixin):
         # raise NotImplementedError()
         if not (0 <= index < len(self.immigrant.documents)):
             raise CblitArgumentError(f"Document with {index} does not exist")
-        raw_reply = await self.officer_session.give_document(self.immigrant.documents[index])
+        raw_reply = await run_stage("officer", self.officer_session.give_document(self.immigrant.documents[index]))
         reply =  await self.process_officer(raw_reply)
         if difficulty == "hard":
             return reply
@@ -10,9 +10,14 @@ import typer
 from rich import print
 
 from cblit.cli.session_wrapper import SessionMethodWrapper, SessionWrapper
+from cblit.file_io import read_text, write_text
 from cblit.game.game import Game
+from cblit.game.pregenerated_game import PREGENERATED_GAMES_DIRECTORY, PregeneratedGame
+from cblit.game.snapshot import GameSnapshot
 
 LOG_DIRECTORY = os.path.join(os.getcwd(), os.pardir, "gpt-logs")
+# Content of the games generated in the CLI, kept apart from the corpus the server draws games from
+LOCAL_GAMES_DIRECTORY = os.path.join(LOG_DIRECTORY, "games")
 
 GameMethod: TypeAlias = Callable[[], None] | Callable[[], Coroutine[Any, Any, None]]
 
@@ -55,10 +60,18 @@ class GameCliWrapper:
             })
 
     async def generate(self) -> None:
+        reply = await self.new_game()
+        print(f"<: {reply}")
+
+    async def new_game(self) -> str:
+        """Generate and start a new game.
+
+        Returns:
+            str: officer's opening reply
+        """
         self._game = await Game.generate()
         self.detect_modes()
-        reply: str = await self.game.start()
-        print(f"<: {reply}")
+        return await self.game.start()
 
     def print(self) -> None:
         print(self.game)
@@ -81,46 +94,59 @@ class GameCliWrapper:
         for phrase in self.game.phrasebook.phrases:
             print(f"{phrase.english} -> {phrase.conlang}")
 
-    def give_document(self) -> None:
+    async def give_document(self) -> None:
         try:
             print("Select document to give:")
             for i, document in enumerate(self.game.immigrant.documents):
                 print(i, document.player_representation, "\n")
             choice_labels = [str(x) for x in range(len(self.game.immigrant.documents))]
             choice = typer.prompt("> ", type=click.Choice(choice_labels))
-            reply = self.game.give_document(int(choice), "hard")
+            reply = await self.game.give_document(int(choice), "hard")
             print(f"<: {reply}")
         except click.exceptions.Abort:
             print("[yellow]Done[/yellow]")
             return
 
-    def save(self) -> None:
+    async def save(self) -> None:
         filename = f"Game-{datetime.datetime.now().isoformat()}.json"
         filename = typer.prompt("Enter filename to save the log file", default=filename)
-        self._save(os.path.join(LOG_DIRECTORY, filename))
+        await self.save_game(os.path.join(LOG_DIRECTORY, filename))
         print(f"[green]Game file is saved: {filename}[/green]")
 
-    def _save(self, destination: str) -> None:
-        if self.game is None:
-            raise ValueError("Game has not been started, cannot save")
-        game_json = self.game.to_json(indent=2)
-        with open(destination, "w") as f:
-            f.write(game_json)
+    async def save_game(self, destination: str) -> None:
+        """Save the game snapshot.
+
+        Snapshots reference the game content by its ID, so the content of a newly generated game is saved
+        into the local games directory, not into the pregenerated corpus.
 
-    def load(self) -> None:
+        Args:
+            destination (str): snapshot file path
+        """
+        if self.game.pregenerated_game_id is None:
+            os.makedirs(LOCAL_GAMES_DIRECTORY, exist_ok=True)
+            self.game.pregenerated_game_id = await PregeneratedGame.from_game(self.game).asave(LOCAL_GAMES_DIRECTORY)
+        await write_text(destination, GameSnapshot.from_game(self.game).dumps())
+
+    async def load(self) -> None:
         print("Select file to load:")
         paths = glob.glob(os.path.join(LOG_DIRECTORY, "*.json"))
         for i, path in enumerate(paths):
             print(f"  {i}) {os.path.basename(path)}")
         choice = typer.prompt("File index", type=click.Choice([str(i) for i in range(len(paths))]))
         source = paths[int(choice)]
-        self._load(source)
-        self.detect_modes()
+        await self.load_game(source)
         print(f"[green]Game file is loaded: {os.path.basename(source)}[/green]")
 
-    def _load(self, source: str) -> None:
-        with open(source) as f:
-            self._game = Game.from_json(f.read())
+    async def load_game(self, source: str) -> None:
+        """Load a game snapshot, built on either a locally generated game or a pregenerated one.
+
+        Args:
+            source (str): snapshot file path
+        """
+        snapshot = GameSnapshot.loads(await read_text(source))
+        local = os.path.exists(os.path.join(LOCAL_GAMES_DIRECTORY, f"{snapshot.pregenerated_game_id}.json"))
+        self._game = await snapshot.ato_game(LOCAL_GAMES_DIRECTORY if local else PREGENERATED_GAMES_DIRECTORY)
+        self.detect_modes()
 
     async def run(self) -> None:
         while True:
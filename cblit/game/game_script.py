@@ -0,0 +1,172 @@
+"""Scripted play module.
+
+Plays games unattended from script files, one action per line, for profiling whole sessions:
+
+    # Comments and empty lines are skipped
+    new
+    say Hello!
+    give 0
+    save game.json
+
+`load <path>` starts from a saved game instead of generating a new one.
+"""
+import asyncio
+import time
+
+from pydantic import BaseModel
+
+from cblit.errors.errors import CblitArgumentError
+from cblit.file_io import read_text
+from cblit.game.game_cli_wrapper import GameCliWrapper
+from cblit.llm.call_counts import counting_calls
+
+# Actions, mapped to whether they take an argument
+SCRIPT_ACTIONS = {
+    "new": False,
+    "load": True,
+    "say": True,
+    "give": True,
+    "save": True,
+}
+# Difficulty does not add random hints, so that replies are repeatable
+SCRIPT_DIFFICULTY = "hard"
+
+
+class ScriptAction(BaseModel):
+    """Action of a game script."""
+    name: str
+    argument: str | None = None
+
+
+class ActionReport(BaseModel):
+    """Timing report of a script action."""
+    action: ScriptAction
+    seconds: float
+    llm_calls: int
+    embeddings_calls: int
+    tokens: int
+    reply: str | None = None
+    # Error the action has failed with, the rest of the script is skipped
+    error: str | None = None
+
+
+class ScriptReport(BaseModel):
+    """Timing report of a script."""
+    script: str
+    seconds: float
+    actions: list[ActionReport]
+
+
+class PlayReport(BaseModel):
+    """Timing report of scripts played concurrently."""
+    seconds: float
+    scripts: list[ScriptReport]
+
+
+def parse_script(text: str) -> list[ScriptAction]:
+    """Parse a game script.
+
+    Args:
+        text (str): script, one action per line
+
+    Returns:
+        list[ScriptAction]: actions
+
+    Raises:
+        CblitArgumentError: The script has an unknown action, or an action without its argument
+    """
+    actions = []
+    for number, raw_line in enumerate(text.splitlines(), start=1):
+        line = raw_line.strip()
+        if not line or line.startswith("#"):
+            continue
+        name, _, argument = line.partition(" ")
+        if name not in SCRIPT_ACTIONS:
+            raise CblitArgumentError(f"Unknown action {name} on line {number}")
+        argument = argument.strip()
+        if SCRIPT_ACTIONS[name] and not argument:
+            raise CblitArgumentError(f"Action {name} on line {number} needs an argument")
+        actions.append(ScriptAction(name=name, argument=argument or None))
+    return actions
+
+
+async def play_action(wrapper: GameCliWrapper, action: ScriptAction) -> str | None:
+    """Play an action of a game script.
+
+    Args:
+        wrapper (GameCliWrapper): game wrapper
+        action (ScriptAction): action to play
+
+    Returns:
+        str | None: officer's reply, None if the action has none
+
+    Raises:
+        CblitArgumentError: The action is unknown
+    """
+    argument = action.argument or ""
+    match action.name:
+        case "new":
+            return await wrapper.new_game()
+        case "load":
+            await wrapper.load_game(argument)
+            return None
+        case "say":
+            return await wrapper.game.say_to_officer(argument, SCRIPT_DIFFICULTY)
+        case "give":
+            return await wrapper.game.give_document(int(argument), SCRIPT_DIFFICULTY)
+        case "save":
+            await wrapper.save_game(argument)
+            return None
+    raise CblitArgumentError(f"Unknown action {action.name}")
+
+
+async def run_script(path: str) -> ScriptReport:
+    """Play a game script, timing each action.
+
+    Args:
+        path (str): script file path
+
+    Returns:
+        ScriptReport: timing report
+    """
+    actions = parse_script(await read_text(path))
+    wrapper = GameCliWrapper()
+    reports = []
+    start_time = time.perf_counter()
+    for action in actions:
+        action_start_time = time.perf_counter()
+        reply, error = None, None
+        with counting_calls() as counts:
+            try:
+                reply = await play_action(wrapper, action)
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+        reports.append(ActionReport(
+            action=action,
+            seconds=time.perf_counter() - action_start_time,
+            llm_calls=counts.llm,
+            embeddings_calls=counts.embeddings,
+            tokens=counts.tokens,
+            reply=reply,
+            error=error,
+        ))
+        if error is not None:
+            break
+    return ScriptReport(script=path, seconds=time.perf_counter() - start_time, actions=reports)
+
+
+async def run_scripts(paths: list[str]) -> PlayReport:
+    """Play game scripts concurrently.
+
+    Each script is played in its own task, so its calls are counted separately.
+
+    Args:
+        paths (list[str]): script file paths
+
+    Returns:
+        PlayReport: timing report
+    """
+    start_time = time.perf_counter()
+    scripts = await asyncio.gather(*(run_script(path) for path in paths))
+    return PlayReport(seconds=time.perf_counter() - start_time, scripts=scripts)
+
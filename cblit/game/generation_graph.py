@@ -0,0 +1,116 @@
+"""Generation graph module.
+
+Game generation is declared as a graph of stages and the stages they take their inputs from,
+so that independent stages run concurrently, e.g. the phrasebook and the immigrant, which both
+only need the country and its translator.
+"""
+import asyncio
+import contextlib
+import dataclasses
+import graphlib
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from loguru import logger
+
+from cblit.errors.errors import CblitArgumentError
+from cblit.llm.concurrency import limiting_llm_calls
+from cblit.metrics import metrics
+
+Stage = Callable[..., Awaitable[Any]]
+
+
+@dataclasses.dataclass
+class GenerationStage:
+    """Stage of generation."""
+    name: str
+    # Function creating the stage's coroutine, taking the inputs' results as positional arguments
+    run: Stage
+    # Stages the inputs are taken from, in the order of the arguments
+    inputs: tuple[str, ...]
+
+
+class GenerationGraph:
+    """Graph of generation stages."""
+    stages: dict[str, GenerationStage]
+    # Budget of concurrent LLM calls shared with other generations, if any
+    budget: asyncio.Semaphore | None
+
+    def __init__(self, budget: asyncio.Semaphore | None = None) -> None:
+        """Initialise an empty graph.
+
+        Args:
+            budget (asyncio.Semaphore | None): budget of concurrent LLM calls, unlimited if not set
+        """
+        self.stages = {}
+        self.budget = budget
+
+    def add(self, name: str, run: Stage, *inputs: str) -> None:
+        """Declare a stage.
+
+        Args:
+            name (str): stage name
+            run (Stage): function creating the stage's coroutine, taking the inputs' results as arguments
+            inputs (str): stages the inputs are taken from
+        """
+        self.stages[name] = GenerationStage(name, run, inputs)
+
+    def order(self, known: set[str]) -> list[str]:
+        """Get stages to run, in an order where every stage comes after its inputs.
+
+        Args:
+            known (set[str]): stages, which results are already known
+
+        Returns:
+            list[str]: stage names
+
+        Raises:
+            CblitArgumentError: A stage takes an undeclared input, or the stages form a cycle
+        """
+        for stage in self.stages.values():
+            missing = [name for name in stage.inputs if name not in self.stages and name not in known]
+            if missing:
+                raise CblitArgumentError(f"Stage {stage.name} takes undeclared inputs: {', '.join(missing)}")
+        sorter = graphlib.TopologicalSorter({stage.name: stage.inputs for stage in self.stages.values()})
+        try:
+            return [name for name in sorter.static_order() if name not in known]
+        except graphlib.CycleError as error:
+            raise CblitArgumentError(f"Generation stages form a cycle: {error.args[1]}") from error
+
+    async def run(self, known: dict[str, Any] | None = None) -> dict[str, Any]:
+        """Run all stages, each as soon as its inputs are ready.
+
+        If any stage fails, the rest are cancelled.
+
+        Args:
+            known (dict[str, Any] | None): already known results by stage name, these stages are not run
+
+        Returns:
+            dict[str, Any]: results by stage name
+        """
+        results = dict(known or {})
+        tasks: dict[str, asyncio.Task[Any]] = {}
+
+        async def run_stage(stage: GenerationStage) -> Any:
+            arguments = [results[name] if name in results else await tasks[name] for name in stage.inputs]
+            start_time = time.perf_counter()
+            result = await stage.run(*arguments)
+            seconds = time.perf_counter() - start_time
+            metrics.observe(f"generation.{stage.name}_seconds", seconds)
+            logger.bind(stage="generation").debug(f"Generation stage {stage.name} took {seconds:.3f} seconds")
+            return result
+
+        with limiting_llm_calls(self.budget) if self.budget is not None else contextlib.nullcontext():
+            for name in self.order(set(results)):
+                tasks[name] = asyncio.get_running_loop().create_task(run_stage(self.stages[name]))
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            # Errors of the stages waiting for the failed one are not worth reporting
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+        results.update((name, task.result()) for name, task in tasks.items())
+        return results
@@ -0,0 +1,296 @@
+"""Session journal module.
+
+Turns of every session are appended to a JSON lines journal, to analyse slow sessions offline.
+Entries are buffered and written in batches from a worker thread, so that turns never wait for the disk.
+"""
+import asyncio
+import contextlib
+import dataclasses
+import enum
+import glob
+import os
+import time
+from collections.abc import Iterator
+
+from loguru import logger
+from pydantic import BaseModel
+
+from cblit.errors.errors import CblitArgumentError
+from cblit.file_io import run_file_io
+from cblit.game.game import Game
+from cblit.game.pregenerated_game import PregeneratedGame
+from cblit.game.snapshot import GameSnapshot
+from cblit.game.trace import tracing_turn
+from cblit.llm.call_counts import counting_calls
+from cblit.metrics import metrics
+
+JOURNAL_FILENAME = "journal-{pid}.jsonl"
+ROTATED_JOURNAL_FILENAME = "journal-{pid}-{time_ns}.jsonl"
+
+
+class JournalEntryKind(str, enum.Enum):
+    """Kind of a journal entry."""
+    # A new game has been started
+    START = "start"
+    # A session has been resumed from its snapshot
+    RESUME = "resume"
+    SAY = "say"
+    GIVE_DOCUMENT = "give_document"
+
+
+class JournalEntry(BaseModel):
+    """Journal entry of a turn."""
+    session_id: str
+    kind: JournalEntryKind
+    # Wall clock time of the turn start
+    time: float
+    # Player's sentence, or given document index
+    input: str | None = None
+    difficulty: str | None = None
+    pregenerated_game_id: str | None = None
+    # Snapshot of a resumed session, to replay the rest of it from
+    snapshot: str | None = None
+    # Player's sentence, as understood in English
+    interpretation: str | None = None
+    # Officer's reply in English
+    reply: str | None = None
+    # Officer's reply in Conlang
+    translation: str | None = None
+    won: bool = False
+    seconds: float = 0.0
+    stage_seconds: dict[str, float] = {}
+    llm_calls: int = 0
+    embeddings_calls: int = 0
+    tokens: int = 0
+    # Error the turn has failed with, if any
+    error: str | None = None
+
+
+@contextlib.contextmanager
+def recording_turn(entry: JournalEntry) -> Iterator[JournalEntry]:
+    """Record timings, LLM usage and the trace of a turn run within the context into its entry.
+
+    Args:
+        entry (JournalEntry): entry of the turn
+
+    Raises:
+        BaseException: Error the turn has failed with, after recording it
+
+    Yields:
+        JournalEntry: the entry, filled in once the context exits
+    """
+    start_time = time.monotonic()
+    with tracing_turn() as trace, counting_calls() as counts:
+        try:
+            yield entry
+        except BaseException as error:
+            entry.error = f"{type(error).__name__}: {error}"
+            raise
+        finally:
+            entry.seconds = time.monotonic() - start_time
+            entry.interpretation = trace.interpretation
+            entry.reply = trace.reply
+            entry.translation = trace.translation
+            entry.stage_seconds = trace.stage_seconds
+            entry.llm_calls = counts.llm
+            entry.embeddings_calls = counts.embeddings
+            entry.tokens = counts.tokens
+
+
+@dataclasses.dataclass
+class JournalPolicy:
+    """Batching, durability and rotation of the journal."""
+    # Time between writes of buffered entries, in seconds
+    flush_interval: float = 1.0
+    # Time between syncs of written entries to the disk, in seconds
+    fsync_interval: float = 10.0
+    # Size of a journal file, after which it is rotated, in bytes
+    max_bytes: int = 64 * 1024 * 1024
+    # Maximum number of buffered entries, the rest are dropped while the disk is behind
+    max_pending: int = 10000
+
+
+class JournalWriter:
+    """Journal writer, which appends buffered entries from the file I/O thread pool in the background.
+
+    Each process writes its own journal file, so that server workers do not interleave their writes.
+    """
+    directory: str
+    policy: JournalPolicy
+    # Serialised entries waiting to be written
+    pending: list[str]
+    task: asyncio.Task[None] | None
+    # Only one batch is written at a time
+    write_lock: asyncio.Lock
+    last_fsync: float
+
+    def __init__(self, directory: str, policy: JournalPolicy | None = None) -> None:
+        """Initialise a writer.
+
+        Args:
+            directory (str): directory of the journal files
+            policy (JournalPolicy | None): batching, durability and rotation, the default ones if not set
+        """
+        self.directory = directory
+        self.policy = policy if policy is not None else JournalPolicy()
+        self.pending = []
+        self.task = None
+        self.write_lock = asyncio.Lock()
+        self.last_fsync = time.monotonic()
+
+    def append(self, entry: JournalEntry) -> None:
+        """Buffer an entry to be written with the next batch.
+
+        Args:
+            entry (JournalEntry): entry to append
+        """
+        if len(self.pending) >= self.policy.max_pending:
+            metrics.increment("journal.dropped")
+            return
+        self.pending.append(entry.json(separators=(",", ":")) + "\n")
+        metrics.increment("journal.entries")
+
+    def start(self) -> None:
+        """Start writing buffered entries in the background."""
+        if self.task is None:
+            self.task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self) -> None:
+        """Write buffered entries periodically."""
+        while True:
+            await asyncio.sleep(self.policy.flush_interval)
+            try:
+                await self.flush()
+            except OSError as error:
+                logger.error(f"Could not write the journal: {error}")
+
+    async def flush(self, sync: bool = False) -> None:
+        """Write buffered entries.
+
+        Args:
+            sync (bool): whether to sync the journal to the disk, regardless of the sync interval
+        """
+        async with self.write_lock:
+            lines, self.pending = self.pending, []
+            if lines or sync:
+                start_time = time.perf_counter()
+                await run_file_io(self._write, lines, sync)
+                metrics.observe("journal.flush_seconds", time.perf_counter() - start_time)
+
+    async def close(self) -> None:
+        """Stop the background writes, write the buffered entries, and sync the journal to the disk."""
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+        await self.flush(sync=True)
+
+    def _write(self, lines: list[str], sync: bool) -> None:
+        """Append lines to the journal file, rotating it if it is full.
+
+        Args:
+            lines (list[str]): serialised entries
+            sync (bool): whether to sync the journal to the disk, regardless of the sync interval
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path()
+        if not lines and not os.path.exists(path):
+            return
+        with open(path, "a") as f:
+            f.write("".join(lines))
+            size = f.tell()
+            # A rotated file is never written again, so it is synced before it is renamed
+            rotate = size >= self.policy.max_bytes
+            if sync or rotate or time.monotonic() - self.last_fsync >= self.policy.fsync_interval:
+                f.flush()
+                os.fsync(f.fileno())
+                self.last_fsync = time.monotonic()
+        if rotate:
+            rotated = ROTATED_JOURNAL_FILENAME.format(pid=os.getpid(), time_ns=time.time_ns())
+            os.rename(path, os.path.join(self.directory, rotated))
+            metrics.increment("journal.rotations")
+
+    def _path(self) -> str:
+        """Get path of the journal file of this process.
+
+        Returns:
+            str: path
+        """
+        return os.path.join(self.directory, JOURNAL_FILENAME.format(pid=os.getpid()))
+
+
+def read_journal(directory: str, session_id: str) -> list[JournalEntry]:
+    """Read entries of a session from the journal, including the rotated files.
+
+    Args:
+        directory (str): directory of the journal files
+        session_id (str): session ID
+
+    Returns:
+        list[JournalEntry]: entries of the session, in the order the turns have started
+    """
+    entries = []
+    for path in glob.glob(os.path.join(directory, "journal-*.jsonl")):
+        with open(path) as f:
+            for line in f:
+                # The line is only parsed if it can belong to the session
+                if session_id in line:
+                    entry = JournalEntry.parse_raw(line)
+                    if entry.session_id == session_id:
+                        entries.append(entry)
+    return sorted(entries, key=lambda entry: entry.time)
+
+
+async def restore_game(entry: JournalEntry) -> Game:
+    """Restore the game a session has started with.
+
+    Args:
+        entry (JournalEntry): first entry of the session
+
+    Returns:
+        Game: game as it was at the start of the session
+
+    Raises:
+        CblitArgumentError: The entry does not start a session
+    """
+    if entry.kind == JournalEntryKind.RESUME and entry.snapshot is not None:
+        return await GameSnapshot.loads(entry.snapshot).ato_game()
+    if entry.kind == JournalEntryKind.START and entry.pregenerated_game_id is not None:
+        return (await PregeneratedGame.aget_by_id(entry.pregenerated_game_id)).to_game()
+    raise CblitArgumentError(f"Session {entry.session_id} does not start with a started or resumed game")
+
+
+async def replay_session(entries: list[JournalEntry]) -> list[JournalEntry]:
+    """Replay turns of a session, recording them anew.
+
+    Args:
+        entries (list[JournalEntry]): entries of the session, starting with its start or resume
+
+    Returns:
+        list[JournalEntry]: entries of the replayed turns, the ones failed are recorded with their errors
+
+    Raises:
+        CblitArgumentError: There are no entries to replay
+    """
+    if not entries:
+        raise CblitArgumentError("There are no turns to replay")
+    game = await restore_game(entries[0])
+    replayed = []
+    for original in entries:
+        entry = JournalEntry(
+            session_id=original.session_id,
+            kind=original.kind,
+            time=time.time(),
+            input=original.input,
+            difficulty=original.difficulty,
+            pregenerated_game_id=game.pregenerated_game_id,
+        )
+        with contextlib.suppress(Exception), recording_turn(entry):
+            if original.kind == JournalEntryKind.START:
+                await game.start()
+            elif original.kind == JournalEntryKind.SAY:
+                await game.say_to_officer(original.input or "", original.difficulty or "hard")
+            elif original.kind == JournalEntryKind.GIVE_DOCUMENT:
+                await game.give_document(int(original.input or 0), original.difficulty or "hard")
+        entry.won = game.won
+        replayed.append(entry)
+    return replayed
@@ -1,12 +1,14 @@
 """Pregenerated Game."""
 import os
 import random
-from typing import Self, cast
+import time
+from typing import Self
 
-import pydantic
 from pydantic import BaseModel
 
-from cblit.game.game import Game
+from cblit.errors.errors import CblitArgumentError
+from cblit.file_io import create_text_atomically, load_json, run_file_io, write_text_atomically
+from cblit.game.game import Game, OpeningExchange
 from cblit.session.country import ConstructedCountrySession, Country
 from cblit.session.immigrant.document import Document
 from cblit.session.immigrant.immigrant import Immigrant
@@ -15,6 +17,23 @@ from cblit.session.language.phrasebook import Phrasebook
 from cblit.session.language.translator import ConlangEntry, TranslatorSession
 from cblit.session.officer import OfficerSession
 
+PREGENERATED_GAMES_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(__file__)), "pregenerated_games")
+GAME_FILE_EXTENSION = ".json"
+
+
+def get_game_ids(filenames: list[str]) -> list[str]:
+    """Get IDs of the games in a directory listing, leaving out other files, e.g. ones being written.
+
+    Args:
+        filenames (list[str]): names of the directory entries
+
+    Returns:
+        list[str]: game IDs
+    """
+    return [
+        filename.removesuffix(GAME_FILE_EXTENSION) for filename in filenames if filename.endswith(GAME_FILE_EXTENSION)
+    ]
+
 
 class PregeneratedGame(BaseModel):
     """Pregenerated Game."""
@@ -22,6 +41,10 @@ class PregeneratedGame(BaseModel):
     quenta: Quenta
     documents: list[Document]
     phrasebook: Phrasebook
+    # Precomputed opening exchange with the officer, if the game has been started
+    opening: OpeningExchange | None = None
+    # ID of the game in the pregenerated corpus, i.e. its filename without extension
+    game_id: str | None = None
 
     @classmethod
     def from_game(cls, game: Game) -> Self:
@@ -37,9 +60,46 @@ class PregeneratedGame(BaseModel):
             country=game.country,
             quenta=game.immigrant.quenta,
             documents=game.immigrant.documents,
-            phrasebook=game.phrasebook
+            phrasebook=game.phrasebook,
+            opening=game.opening
         )
 
+    def save(self, directory: str = PREGENERATED_GAMES_DIRECTORY) -> str:
+        """Save the game into the pregenerated corpus, assigning it an ID if it does not have one yet.
+
+        Args:
+            directory (str): corpus directory
+
+        Returns:
+            str: ID of the game in the corpus
+        """
+        data = self.json(indent=2, exclude={"game_id"})
+        if self.game_id is not None:
+            write_text_atomically(os.path.join(directory, f"{self.game_id}.json"), data)
+            return self.game_id
+        # The ID is claimed by creating its file, so that concurrent saves from other workers never take the same one
+        timestamp = int(time.time())
+        while True:
+            game_id = f"pregen_{timestamp}"
+            try:
+                create_text_atomically(os.path.join(directory, f"{game_id}.json"), data)
+            except FileExistsError:
+                timestamp += 1
+                continue
+            self.game_id = game_id
+            return game_id
+
+    async def asave(self, directory: str = PREGENERATED_GAMES_DIRECTORY) -> str:
+        """Save the game into the pregenerated corpus without blocking the event loop.
+
+        Args:
+            directory (str): corpus directory
+
+        Returns:
+            str: ID of the game in the corpus
+        """
+        return await run_file_io(self.save, directory)
+
     @classmethod
     def get_random(cls) -> Self:
         """Get random previously generated game.
@@ -47,9 +107,41 @@ class PregeneratedGame(BaseModel):
         Returns:
             PregeneratedGame:
         """
-        filenames = os.listdir("pregenerated_games/")
-        filename = os.path.join("pregenerated_games", random.choice(filenames))
-        return cast(Self, pydantic.parse_file_as(path=filename, type_=PregeneratedGame))
+        return cls.get_by_id(random.choice(get_game_ids(os.listdir(PREGENERATED_GAMES_DIRECTORY))))
+
+    @classmethod
+    def get_by_id(cls, game_id: str, directory: str = PREGENERATED_GAMES_DIRECTORY) -> Self:
+        """Get previously generated game by its ID.
+
+        Args:
+            game_id (str): ID of the game in the pregenerated corpus
+            directory (str): corpus directory
+
+        Returns:
+            PregeneratedGame:
+
+        Raises:
+            CblitArgumentError: Pregenerated game with the ID does not exist
+        """
+        filename = os.path.join(directory, f"{game_id}.json")
+        if os.path.basename(game_id) != game_id or not os.path.isfile(filename):
+            raise CblitArgumentError(f"Pregenerated game {game_id} does not exist")
+        game = cls.parse_obj(load_json(filename))
+        game.game_id = game_id
+        return game
+
+    @classmethod
+    async def aget_by_id(cls, game_id: str, directory: str = PREGENERATED_GAMES_DIRECTORY) -> Self:
+        """Get previously generated game by its ID without blocking the event loop.
+
+        Args:
+            game_id (str): ID of the game in the pregenerated corpus
+            directory (str): corpus directory
+
+        Returns:
+            PregeneratedGame:
+        """
+        return await run_file_io(cls.get_by_id, game_id, directory)
 
     def to_game(self) -> Game:
         """Turn pregenerated game into a Game instance.
@@ -68,15 +160,14 @@ class PregeneratedGame(BaseModel):
             country.language_name,
             initial_conlang_entry,
         )
-        for entry in self.phrasebook.phrases:
-            translator_session.save_translation(entry)
-        for document in self.documents[1:]:
-            translator_session.save_translation(
-                ConlangEntry(english=document.officer_representation, conlang=document.player_representation)
-            )
+        known_entries = self.phrasebook.phrases + [
+            entry for document in self.documents[1:] for entry in document.to_entries()
+        ]
+        if self.opening is not None:
+            known_entries.append(ConlangEntry(english=self.opening.turn.officer, conlang=self.opening.conlang))
+        translator_session.save_translations(known_entries)
 
-        phrasebook = self.phrasebook
-        self.phrasebook.phrases += [initial_conlang_entry]
+        phrasebook = Phrasebook(phrases=self.phrasebook.phrases + [initial_conlang_entry])
 
         officer_session = OfficerSession()
 
@@ -90,5 +181,7 @@ class PregeneratedGame(BaseModel):
             immigrant=immigrant,
             phrasebook=phrasebook,
             started=False,
-            won=False
+            won=False,
+            pregenerated_game_id=self.game_id,
+            opening=self.opening
         )
@@ -0,0 +1,116 @@
+"""Game snapshot module.
+
+A snapshot references the pregenerated game by its ID and stores only what has changed since,
+so it stays small, and restoring it does not need any LLM calls.
+"""
+from typing import Self
+
+from pydantic import BaseModel, ValidationError
+
+from cblit.errors.errors import CblitArgumentError
+from cblit.game.game import Game
+from cblit.game.pregenerated_game import PREGENERATED_GAMES_DIRECTORY, PregeneratedGame
+from cblit.session.language.translator import ConlangEntry
+from cblit.session.officer import OfficerTurn
+
+SNAPSHOT_SCHEMA_VERSION = 1
+
+
+class GameSnapshot(BaseModel):
+    """Mutable state of a game, built on top of a pregenerated game."""
+    schema_version: int = SNAPSHOT_SCHEMA_VERSION
+    pregenerated_game_id: str
+    officer_turns: list[OfficerTurn]
+    translations: list[ConlangEntry]
+    started: bool
+    won: bool
+
+    @classmethod
+    def from_game(cls, game: Game) -> Self:
+        """Take a snapshot of a game.
+
+        Args:
+            game (Game): game to take a snapshot of
+
+        Returns:
+            GameSnapshot:
+
+        Raises:
+            CblitArgumentError: The game is not built from a pregenerated game
+        """
+        if game.pregenerated_game_id is None:
+            raise CblitArgumentError("Only games built from pregenerated games can be snapshotted")
+        return cls(
+            pregenerated_game_id=game.pregenerated_game_id,
+            officer_turns=game.officer_session.history(),
+            translations=game.translator_session.learned,
+            started=game.started,
+            won=game.won
+        )
+
+    def dumps(self) -> str:
+        """Serialise the snapshot.
+
+        Returns:
+            str: compact JSON
+        """
+        return self.json(separators=(",", ":"))
+
+    @classmethod
+    def loads(cls, data: str | bytes) -> Self:
+        """Deserialise a snapshot.
+
+        Args:
+            data (str | bytes): serialised snapshot
+
+        Returns:
+            GameSnapshot:
+
+        Raises:
+            CblitArgumentError: The data is not a snapshot of a supported schema version
+        """
+        try:
+            snapshot = cls.parse_raw(data)
+        except ValidationError as error:
+            raise CblitArgumentError(f"Not a valid game snapshot: {error}") from error
+        if snapshot.schema_version != SNAPSHOT_SCHEMA_VERSION:
+            raise CblitArgumentError(f"Unsupported game snapshot schema version: {snapshot.schema_version}")
+        return snapshot
+
+    def to_game(self, directory: str = PREGENERATED_GAMES_DIRECTORY) -> Game:
+        """Restore the game from the snapshot.
+
+        Args:
+            directory (str): directory with the pregenerated game
+
+        Returns:
+            Game: restored game
+        """
+        return self._restore(PregeneratedGame.get_by_id(self.pregenerated_game_id, directory))
+
+    async def ato_game(self, directory: str = PREGENERATED_GAMES_DIRECTORY) -> Game:
+        """Restore the game from the snapshot, reading the pregenerated game without blocking the event loop.
+
+        Args:
+            directory (str): directory with the pregenerated game
+
+        Returns:
+            Game: restored game
+        """
+        return self._restore(await PregeneratedGame.aget_by_id(self.pregenerated_game_id, directory))
+
+    def _restore(self, pregenerated_game: PregeneratedGame) -> Game:
+        """Restore the game on top of its pregenerated game.
+
+        Args:
+            pregenerated_game (PregeneratedGame): pregenerated game the snapshot is built on
+
+        Returns:
+            Game: restored game
+        """
+        game = pregenerated_game.to_game()
+        game.officer_session.restore_history(self.officer_turns)
+        game.translator_session.restore_learned(self.translations)
+        game.started = self.started
+        game.won = self.won
+        return game
@@ -0,0 +1,310 @@
+"""Session state backend module.
+
+Game sessions are persisted as snapshots in a key-value store, so that any server worker can serve any session.
+"""
+import abc
+import asyncio
+import contextlib
+import os
+import sqlite3
+from urllib.parse import urlparse
+
+from cblit.errors.errors import CblitArgumentError
+from cblit.file_io import read_text_file, run_file_io, write_text_atomically
+from cblit.game.snapshot import GameSnapshot
+
+
+class SessionStateBackend(abc.ABC):
+    """Base session state backend.
+
+    Subclasses only need to implement a string key-value store, e.g. a Redis-like store.
+    """
+
+    @abc.abstractmethod
+    async def get(self, key: str) -> str | None:
+        """Get a raw value.
+
+        Args:
+            key (str): key
+
+        Returns:
+            str | None: stored value, if any
+        """
+
+    @abc.abstractmethod
+    async def set(self, key: str, value: str) -> None:
+        """Set a raw value.
+
+        Args:
+            key (str): key
+            value (str): value to store
+        """
+
+    @abc.abstractmethod
+    async def delete(self, key: str) -> None:
+        """Delete a value, if it exists.
+
+        Args:
+            key (str): key
+        """
+
+    async def load(self, session_id: str) -> GameSnapshot | None:
+        """Load a game snapshot.
+
+        Args:
+            session_id (str): session ID
+
+        Returns:
+            GameSnapshot | None: stored snapshot, if any
+        """
+        value = await self.get(session_id)
+        if value is None:
+            return None
+        return GameSnapshot.loads(value)
+
+    async def save(self, session_id: str, snapshot: GameSnapshot) -> None:
+        """Save a game snapshot.
+
+        Args:
+            session_id (str): session ID
+            snapshot (GameSnapshot): snapshot to save
+        """
+        await self.set(session_id, snapshot.dumps())
+
+
+class InMemorySessionStateBackend(SessionStateBackend):
+    """Process-local session state backend, suitable for a single worker only."""
+    values: dict[str, str]
+
+    def __init__(self) -> None:
+        """Initialise in-memory backend."""
+        self.values = {}
+
+    async def get(self, key: str) -> str | None:
+        """Get a raw value.
+
+        Args:
+            key (str): key
+
+        Returns:
+            str | None: stored value, if any
+        """
+        return self.values.get(key)
+
+    async def set(self, key: str, value: str) -> None:
+        """Set a raw value.
+
+        Args:
+            key (str): key
+            value (str): value to store
+        """
+        self.values[key] = value
+
+    async def delete(self, key: str) -> None:
+        """Delete a value, if it exists.
+
+        Args:
+            key (str): key
+        """
+        self.values.pop(key, None)
+
+
+class SqliteSessionStateBackend(SessionStateBackend):
+    """Session state backend storing snapshots in a local SQLite database shared by all workers."""
+    path: str
+
+    def __init__(self, path: str) -> None:
+        """Initialise SQLite backend.
+
+        Args:
+            path (str): database file path
+        """
+        self.path = path
+        with contextlib.closing(self._connect()) as connection, connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("CREATE TABLE IF NOT EXISTS sessions (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection to the database.
+
+        Returns:
+            sqlite3.Connection: connection
+        """
+        return sqlite3.connect(self.path, timeout=30)
+
+    def _get(self, key: str) -> str | None:
+        """Get a raw value, blocking.
+
+        Args:
+            key (str): key
+
+        Returns:
+            str | None: stored value, if any
+        """
+        with contextlib.closing(self._connect()) as connection, connection:
+            row = connection.execute("SELECT value FROM sessions WHERE key = ?", (key,)).fetchone()
+        return None if row is None else str(row[0])
+
+    def _set(self, key: str, value: str) -> None:
+        """Set a raw value, blocking.
+
+        Args:
+            key (str): key
+            value (str): value to store
+        """
+        with contextlib.closing(self._connect()) as connection, connection:
+            connection.execute("INSERT OR REPLACE INTO sessions (key, value) VALUES (?, ?)", (key, value))
+
+    def _delete(self, key: str) -> None:
+        """Delete a value, blocking.
+
+        Args:
+            key (str): key
+        """
+        with contextlib.closing(self._connect()) as connection, connection:
+            connection.execute("DELETE FROM sessions WHERE key = ?", (key,))
+
+    async def get(self, key: str) -> str | None:
+        """Get a raw value.
+
+        Args:
+            key (str): key
+
+        Returns:
+            str | None: stored value, if any
+        """
+        return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key: str, value: str) -> None:
+        """Set a raw value.
+
+        Args:
+            key (str): key
+            value (str): value to store
+        """
+        await asyncio.to_thread(self._set, key, value)
+
+    async def delete(self, key: str) -> None:
+        """Delete a value, if it exists.
+
+        Args:
+            key (str): key
+        """
+        await asyncio.to_thread(self._delete, key)
+
+
+class FileSessionStateBackend(SessionStateBackend):
+    """Session state backend storing each snapshot as a file in a shared directory."""
+    directory: str
+
+    def __init__(self, directory: str) -> None:
+        """Initialise file backend.
+
+        Args:
+            directory (str): directory to store snapshots in
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        """Get a snapshot file path.
+
+        Args:
+            key (str): key
+
+        Returns:
+            str: file path
+
+        Raises:
+            CblitArgumentError: The key is not a valid filename
+        """
+        if os.path.basename(key) != key:
+            raise CblitArgumentError(f"Invalid session state key: {key}")
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _get(self, key: str) -> str | None:
+        """Get a raw value, blocking.
+
+        Args:
+            key (str): key
+
+        Returns:
+            str | None: stored value, if any
+        """
+        try:
+            return read_text_file(self._path(key))
+        except FileNotFoundError:
+            return None
+
+    def _set(self, key: str, value: str) -> None:
+        """Set a raw value, blocking.
+
+        Args:
+            key (str): key
+            value (str): value to store
+        """
+        # Other workers never read a partially written snapshot
+        write_text_atomically(self._path(key), value)
+
+    def _delete(self, key: str) -> None:
+        """Delete a value, blocking.
+
+        Args:
+            key (str): key
+        """
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self._path(key))
+
+    async def get(self, key: str) -> str | None:
+        """Get a raw value.
+
+        Args:
+            key (str): key
+
+        Returns:
+            str | None: stored value, if any
+        """
+        return await run_file_io(self._get, key)
+
+    async def set(self, key: str, value: str) -> None:
+        """Set a raw value.
+
+        Args:
+            key (str): key
+            value (str): value to store
+        """
+        await run_file_io(self._set, key, value)
+
+    async def delete(self, key: str) -> None:
+        """Delete a value, if it exists.
+
+        Args:
+            key (str): key
+        """
+        await run_file_io(self._delete, key)
+
+
+def get_state_backend(url: str | None) -> SessionStateBackend:
+    """Build a session state backend from a URL.
+
+    Supported URLs are `memory://`, `sqlite:///path/to/database.db` and `file:///path/to/directory`.
+
+    Args:
+        url (str | None): backend URL, in-memory backend is used if not set
+
+    Returns:
+        SessionStateBackend: session state backend
+
+    Raises:
+        CblitArgumentError: Unsupported backend URL
+    """
+    if url is None:
+        return InMemorySessionStateBackend()
+    parsed = urlparse(url)
+    if parsed.scheme == "memory":
+        return InMemorySessionStateBackend()
+    elif parsed.scheme == "sqlite":
+        return SqliteSessionStateBackend(parsed.path)
+    elif parsed.scheme == "file":
+        return FileSessionStateBackend(parsed.path)
+    raise CblitArgumentError(f"Unsupported session state backend: {url}")
@@ -0,0 +1,61 @@
+"""Turn trace module.
+
+Collects what happens within a turn, beyond the reply sent to the player, without passing it through every stage.
+"""
+import contextlib
+import contextvars
+import dataclasses
+from collections.abc import Iterator
+
+
+@dataclasses.dataclass
+class TurnTrace:
+    """What has happened within a turn."""
+    # Player's sentence, as understood in English
+    interpretation: str | None = None
+    # Officer's reply in English
+    reply: str | None = None
+    # Officer's reply in Conlang
+    translation: str | None = None
+    # Time spent in each stage, in seconds
+    stage_seconds: dict[str, float] = dataclasses.field(default_factory=dict)
+
+    def record_stage(self, name: str, seconds: float) -> None:
+        """Record time spent in a stage, adding up stages run more than once.
+
+        Args:
+            name (str): stage name
+            seconds (float): time spent
+        """
+        self.stage_seconds[name] = self.stage_seconds.get(name, 0.0) + seconds
+
+
+# Trace of the current turn, None outside of a traced turn
+current_turn_trace: contextvars.ContextVar[TurnTrace | None] = contextvars.ContextVar(
+    "current_turn_trace", default=None
+)
+
+
+def get_turn_trace() -> TurnTrace:
+    """Get trace of the current turn.
+
+    Returns:
+        TurnTrace: trace of the current turn, a discarded one outside of a traced turn
+    """
+    trace = current_turn_trace.get()
+    return trace if trace is not None else TurnTrace()
+
+
+@contextlib.contextmanager
+def tracing_turn() -> Iterator[TurnTrace]:
+    """Trace a turn within the context.
+
+    Yields:
+        TurnTrace: trace, filled in as the turn goes
+    """
+    trace = TurnTrace()
+    token = current_turn_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        current_turn_trace.reset(token)
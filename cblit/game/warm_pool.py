@@ -0,0 +1,145 @@
+"""Warm pool of ready-to-play games."""
+import asyncio
+import collections
+import dataclasses
+import time
+from collections.abc import Callable, Coroutine
+from typing import Any
+
+from loguru import logger
+
+from cblit.game.corpus import PregeneratedCorpus
+from cblit.game.game import Game
+from cblit.metrics import metrics
+
+# Pause between building pool games, so that refilling yields to players' turns
+REFILL_INTERVAL = 1.0
+# Size of a single float in the translator's FAISS index
+FLOAT_SIZE = 4
+
+
+@dataclasses.dataclass
+class WarmGame:
+    """Game, which has already been built and started."""
+    game: Game
+    opening_line: str
+    # Estimated memory taken by the game, in bytes
+    memory_cost: int
+
+
+def estimate_memory_cost(game: Game) -> int:
+    """Estimate memory taken by a game.
+
+    The estimate covers the translator's vector index and the texts held by the game,
+    which dominate the size of a game.
+
+    Args:
+        game (Game): game to estimate
+
+    Returns:
+        int: estimated size in bytes
+    """
+    vectorstore = game.translator_session.memory.retriever.vectorstore
+    index = vectorstore.index  # type: ignore [attr-defined]
+    docstore = vectorstore.docstore._dict  # type: ignore [attr-defined]
+    texts = [document.page_content for document in docstore.values()]
+    texts += [turn.visitor + turn.officer for turn in game.officer_session.history()]
+    texts += [document.officer_representation + document.player_representation
+              for document in game.immigrant.documents]
+    return int(index.ntotal * index.d * FLOAT_SIZE + sum(len(text.encode()) for text in texts))
+
+
+class WarmGamePool:
+    """Pool of games built from pregenerated ones and started in the background."""
+    target_size: int
+    corpus: PregeneratedCorpus
+    is_idle: Callable[[], bool]
+    spawn: Callable[[Coroutine[Any, Any, None]], asyncio.Task[None]]
+    games: collections.deque[WarmGame]
+    _refill_task: asyncio.Task[None] | None
+
+    def __init__(
+            self,
+            target_size: int,
+            corpus: PregeneratedCorpus,
+            is_idle: Callable[[], bool],
+            spawn: Callable[[Coroutine[Any, Any, None]], asyncio.Task[None]]
+    ) -> None:
+        """Initialise an empty pool.
+
+        Args:
+            target_size (int): number of games to keep ready
+            corpus (PregeneratedCorpus): corpus to draw games from
+            is_idle (Callable[[], bool]): whether the server has spare capacity for building games
+            spawn (Callable[[Coroutine[Any, Any, None]], asyncio.Task[None]]): runner of the refill in the background
+        """
+        self.target_size = target_size
+        self.corpus = corpus
+        self.is_idle = is_idle
+        self.spawn = spawn
+        self.games = collections.deque()
+        self._refill_task = None
+
+    def pop(self) -> WarmGame | None:
+        """Take a ready game out of the pool, and schedule a refill.
+
+        Returns:
+            WarmGame | None: ready game, None if the pool is empty
+        """
+        metrics.increment("warm_pool.requests")
+        warm_game = self.games.popleft() if self.games else None
+        if warm_game is not None:
+            metrics.increment("warm_pool.hits")
+        metrics.set_gauge("warm_pool.hit_rate", metrics.ratio("warm_pool.hits", "warm_pool.requests"))
+        self._report_size()
+        self.schedule_refill()
+        return warm_game
+
+    def schedule_refill(self) -> None:
+        """Start refilling the pool in the background, unless it is full or is being refilled already."""
+        if len(self.games) >= self.target_size or (self._refill_task is not None and not self._refill_task.done()):
+            return
+        self._refill_task = self.spawn(self._refill())
+
+    def stop(self) -> None:
+        """Stop refilling the pool."""
+        if self._refill_task is not None:
+            self._refill_task.cancel()
+            self._refill_task = None
+
+    async def _refill(self) -> None:
+        """Build games one at a time until the pool is full, while the server is idle."""
+        while len(self.games) < self.target_size:
+            if not self.is_idle():
+                metrics.increment("warm_pool.refill_deferrals")
+                await asyncio.sleep(REFILL_INTERVAL)
+                continue
+            start_time = time.monotonic()
+            try:
+                warm_game = await self._build()
+            except Exception as error:
+                metrics.increment("warm_pool.refill_errors")
+                logger.error(f"Could not build a game for the warm pool: {error}")
+                await asyncio.sleep(REFILL_INTERVAL)
+                continue
+            metrics.observe("warm_pool.refill_seconds", time.monotonic() - start_time)
+            self.games.append(warm_game)
+            self._report_size()
+            await asyncio.sleep(REFILL_INTERVAL)
+
+    async def _build(self) -> WarmGame:
+        """Build and start a game.
+
+        Returns:
+            WarmGame: ready game
+        """
+        # Building the translator's index calls embeddings synchronously, keep it off the event loop
+        pregenerated_game = await self.corpus.pick()
+        game = await asyncio.to_thread(pregenerated_game.to_game)
+        opening_line = await game.start()
+        return WarmGame(game=game, opening_line=opening_line, memory_cost=estimate_memory_cost(game))
+
+    def _report_size(self) -> None:
+        """Report pool size and memory cost."""
+        metrics.set_gauge("warm_pool.size", len(self.games))
+        metrics.set_gauge("warm_pool.memory_bytes", sum(warm_game.memory_cost for warm_game in self.games))
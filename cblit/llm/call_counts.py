@@ -0,0 +1,67 @@
+"""LLM call counting module.
+
+Counts the LLM and embeddings calls, and the tokens, used by the current task, e.g. a scripted game,
+without passing a counter through every session.
+"""
+import contextlib
+import contextvars
+import dataclasses
+from collections.abc import Iterator
+
+from langchain.schema import LLMResult
+
+
+@dataclasses.dataclass
+class CallCounts:
+    """Numbers of LLM and embeddings calls."""
+    llm: int = 0
+    embeddings: int = 0
+    # Tokens used by the LLM calls, as reported by the backend
+    tokens: int = 0
+
+
+# Counts of the current context, None if calls are not counted
+current_call_counts: contextvars.ContextVar[CallCounts | None] = contextvars.ContextVar(
+    "current_call_counts", default=None
+)
+
+
+def count_llm_call() -> None:
+    """Count an LLM call in the current context."""
+    counts = current_call_counts.get()
+    if counts is not None:
+        counts.llm += 1
+
+
+def count_tokens(result: LLMResult) -> None:
+    """Count tokens used by an LLM call in the current context.
+
+    Args:
+        result (LLMResult): result of the call, with the backend's token usage if reported
+    """
+    counts = current_call_counts.get()
+    if counts is not None:
+        usage = (result.llm_output or {}).get("token_usage", {})
+        counts.tokens += int(usage.get("total_tokens", 0))
+
+
+def count_embeddings_call() -> None:
+    """Count an embeddings call in the current context."""
+    counts = current_call_counts.get()
+    if counts is not None:
+        counts.embeddings += 1
+
+
+@contextlib.contextmanager
+def counting_calls() -> Iterator[CallCounts]:
+    """Count LLM and embeddings calls made within the context.
+
+    Yields:
+        CallCounts: counts, updated as the calls are made
+    """
+    counts = CallCounts()
+    token = current_call_counts.set(counts)
+    try:
+        yield counts
+    finally:
+        current_call_counts.reset(token)
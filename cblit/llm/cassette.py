@@ -0,0 +1,304 @@
+"""LLM record and replay module.
+
+In record mode every LLM and embeddings call is stored with its response and latency in a cassette,
+in replay mode the responses are served from the cassette instead, so that runs are repeatable and offline.
+"""
+import asyncio
+import collections
+import enum
+import functools
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any
+
+from langchain.callbacks.manager import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain.embeddings.base import Embeddings
+from langchain.llms.base import BaseLLM
+from langchain.schema import LLMResult
+from pydantic import BaseModel
+
+from cblit.errors.errors import CblitArgumentError
+from cblit.file_io import run_file_io
+from cblit.llm.call_counts import count_embeddings_call, count_llm_call, count_tokens
+from cblit.llm.concurrency import llm_call_slot
+
+
+class CassetteMode(str, enum.Enum):
+    """Cassette mode."""
+    RECORD = "record"
+    REPLAY = "replay"
+
+
+class CassetteEntry(BaseModel):
+    """Recorded call."""
+    key: str
+    response: Any
+    # Observed latency of the call, in seconds
+    latency: float
+
+
+class Cassette:
+    """Cassette of recorded calls, stored as gzipped JSON lines.
+
+    Calls are matched by a hash of their kind, parameters and inputs. Identical calls are replayed
+    in the order they were recorded, the last response is repeated once they run out.
+    """
+    path: str
+    mode: CassetteMode
+    # Whether replayed calls take as long as the recorded ones
+    simulate_latency: bool
+    entries: dict[str, collections.deque[CassetteEntry]]
+    # Calls are made both from the event loop and from worker threads
+    lock: threading.Lock
+
+    def __init__(self, path: str, mode: CassetteMode, simulate_latency: bool = False) -> None:
+        """Open a cassette.
+
+        Args:
+            path (str): cassette file path
+            mode (CassetteMode): whether to record or to replay calls
+            simulate_latency (bool): whether replayed calls take as long as the recorded ones
+        """
+        self.path = path
+        self.mode = mode
+        self.simulate_latency = simulate_latency
+        self.entries = collections.defaultdict(collections.deque)
+        self.lock = threading.Lock()
+        if mode == CassetteMode.REPLAY:
+            with gzip.open(path, "rt") as f:
+                for line in f:
+                    entry = CassetteEntry.parse_raw(line)
+                    self.entries[entry.key].append(entry)
+
+    @staticmethod
+    def key(kind: str, params: dict[str, Any], inputs: Any) -> str:
+        """Get key of a call.
+
+        Args:
+            kind (str): kind of the call
+            params (dict[str, Any]): parameters of the model
+            inputs (Any): JSON serialisable inputs of the call
+
+        Returns:
+            str: key
+        """
+        data = json.dumps([kind, params, inputs], sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(data.encode()).hexdigest()
+
+    def record(self, key: str, response: Any, latency: float) -> None:
+        """Record a call.
+
+        Args:
+            key (str): key of the call
+            response (Any): JSON serialisable response
+            latency (float): observed latency, in seconds
+        """
+        entry = CassetteEntry(key=key, response=response, latency=latency)
+        with self.lock, gzip.open(self.path, "at") as f:
+            f.write(entry.json(separators=(",", ":")) + "\n")
+
+    def replay(self, key: str) -> CassetteEntry:
+        """Replay a call.
+
+        Args:
+            key (str): key of the call
+
+        Returns:
+            CassetteEntry: recorded call
+
+        Raises:
+            CblitArgumentError: The call has not been recorded
+        """
+        with self.lock:
+            entries = self.entries.get(key)
+            if not entries:
+                raise CblitArgumentError(f"Call {key} is not in the cassette {self.path}")
+            return entries.popleft() if len(entries) > 1 else entries[0]
+
+
+class CassetteLLM(BaseLLM):
+    """LLM, which records calls to the wrapped LLM, or replays them without it."""
+    # Wrapped LLM, not needed in replay mode
+    llm: BaseLLM | None
+    # Parameters identifying the model in the cassette
+    params: dict[str, Any]
+    cassette: Cassette
+
+    class Config:
+        """Pydantic config."""
+        arbitrary_types_allowed = True
+
+    def _generate(
+            self,
+            prompts: list[str],
+            stop: list[str] | None = None,
+            run_manager: CallbackManagerForLLMRun | None = None
+    ) -> LLMResult:
+        """Run the LLM on the given prompts.
+
+        Args:
+            prompts (list[str]): prompts
+            stop (list[str] | None): stop words
+            run_manager (CallbackManagerForLLMRun | None): callback manager of the run
+
+        Returns:
+            LLMResult: recorded or replayed result
+        """
+        key = Cassette.key("llm", self.params, [prompts, stop])
+        if self.cassette.mode == CassetteMode.REPLAY:
+            # Recorded calls are counted by the wrapped LLM
+            count_llm_call()
+            entry = self.cassette.replay(key)
+            if self.cassette.simulate_latency:
+                time.sleep(entry.latency)
+            result = LLMResult.parse_obj(entry.response)
+            count_tokens(result)
+            return result
+        start_time = time.monotonic()
+        result = self._wrapped()._generate(prompts, stop, run_manager)
+        self.cassette.record(key, result.dict(), time.monotonic() - start_time)
+        return result
+
+    async def _agenerate(
+            self,
+            prompts: list[str],
+            stop: list[str] | None = None,
+            run_manager: AsyncCallbackManagerForLLMRun | None = None
+    ) -> LLMResult:
+        """Run the LLM on the given prompts asynchronously.
+
+        Args:
+            prompts (list[str]): prompts
+            stop (list[str] | None): stop words
+            run_manager (AsyncCallbackManagerForLLMRun | None): callback manager of the run
+
+        Returns:
+            LLMResult: recorded or replayed result
+        """
+        key = Cassette.key("llm", self.params, [prompts, stop])
+        if self.cassette.mode == CassetteMode.REPLAY:
+            count_llm_call()
+            entry = self.cassette.replay(key)
+            if self.cassette.simulate_latency:
+                async with llm_call_slot():
+                    await asyncio.sleep(entry.latency)
+            result = LLMResult.parse_obj(entry.response)
+            count_tokens(result)
+            return result
+        start_time = time.monotonic()
+        result = await self._wrapped()._agenerate(prompts, stop, run_manager)
+        await run_file_io(self.cassette.record, key, result.dict(), time.monotonic() - start_time)
+        return result
+
+    def _wrapped(self) -> BaseLLM:
+        """Get the wrapped LLM.
+
+        Returns:
+            BaseLLM: wrapped LLM
+
+        Raises:
+            CblitArgumentError: There is no LLM to record
+        """
+        if self.llm is None:
+            raise CblitArgumentError("Recording needs an LLM to record")
+        return self.llm
+
+    @property
+    def _llm_type(self) -> str:
+        """Get type of the LLM.
+
+        Returns:
+            str: type of the LLM
+        """
+        return "cassette"
+
+
+class CassetteEmbeddings(Embeddings):
+    """Embeddings, which record calls to the wrapped embeddings, or replay them without it."""
+    # Wrapped embeddings, not needed in replay mode
+    embeddings: Embeddings | None
+    cassette: Cassette
+
+    def __init__(self, embeddings: Embeddings | None, cassette: Cassette) -> None:
+        """Wrap embeddings with a cassette.
+
+        Args:
+            embeddings (Embeddings | None): embeddings to record, not needed in replay mode
+            cassette (Cassette): cassette to record to or to replay from
+        """
+        self.embeddings = embeddings
+        self.cassette = cassette
+
+    def _call(self, kind: str, inputs: Any) -> Any:
+        """Record or replay a call.
+
+        Args:
+            kind (str): name of the embeddings method
+            inputs (Any): texts to embed
+
+        Returns:
+            Any: embeddings
+
+        Raises:
+            CblitArgumentError: There are no embeddings to record
+        """
+        key = Cassette.key(kind, {}, inputs)
+        if self.cassette.mode == CassetteMode.REPLAY:
+            # Recorded calls are counted by the wrapped embeddings
+            count_embeddings_call()
+            entry = self.cassette.replay(key)
+            if self.cassette.simulate_latency:
+                time.sleep(entry.latency)
+            return entry.response
+        if self.embeddings is None:
+            raise CblitArgumentError("Recording needs embeddings to record")
+        start_time = time.monotonic()
+        response = getattr(self.embeddings, kind)(inputs)
+        self.cassette.record(key, response, time.monotonic() - start_time)
+        return response
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        """Embed texts.
+
+        Args:
+            texts (list[str]): texts to embed
+
+        Returns:
+            list[list[float]]: embeddings
+        """
+        return list(self._call("embed_documents", texts))
+
+    def embed_query(self, text: str) -> list[float]:
+        """Embed a text.
+
+        Args:
+            text (str): text to embed
+
+        Returns:
+            list[float]: embedding
+        """
+        return list(self._call("embed_query", text))
+
+
+@functools.cache
+def get_cassette() -> Cassette | None:
+    """Get the cassette configured by the environment.
+
+    `CBLIT_CASSETTE` is the cassette path, `CBLIT_CASSETTE_MODE` is `record` or `replay`,
+    and `CBLIT_CASSETTE_LATENCY=1` makes replayed calls take as long as the recorded ones.
+
+    Returns:
+        Cassette | None: cassette, None if not configured
+    """
+    path = os.getenv("CBLIT_CASSETTE")
+    if path is None:
+        return None
+    return Cassette(
+        path,
+        CassetteMode(os.getenv("CBLIT_CASSETTE_MODE", CassetteMode.REPLAY.value)),
+        os.getenv("CBLIT_CASSETTE_LATENCY") == "1"
+    )
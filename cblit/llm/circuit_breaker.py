@@ -0,0 +1,208 @@
+"""Circuit breaker of the LLM backend.
+
+While the backend keeps failing, calls fail fast instead of each waiting for its own HTTP failure.
+"""
+import collections
+import contextlib
+import dataclasses
+import enum
+import threading
+import time
+from collections.abc import Iterator
+
+import openai.error
+
+from cblit.errors.errors import CblitModelUnavailableError
+from cblit.metrics import metrics
+
+# Upstream errors, which mean the backend is unavailable, rather than that the request is wrong
+UNAVAILABILITY_ERRORS = (
+    openai.error.APIConnectionError,
+    openai.error.APIError,
+    openai.error.RateLimitError,
+    openai.error.ServiceUnavailableError,
+    openai.error.Timeout,
+    openai.error.TryAgain,
+    # The call's own timeout, e.g. of the HTTP request, as opposed to the caller giving up on it
+    TimeoutError,
+)
+
+
+def is_unavailability(error: Exception) -> bool:
+    """Check whether an error means that the backend is unavailable.
+
+    Args:
+        error (Exception): error raised by an LLM or embeddings call
+
+    Returns:
+        bool: whether the error is an unavailability
+    """
+    # Some gateway failures only surface as a ValueError of a malformed response
+    return isinstance(error, UNAVAILABILITY_ERRORS) or (isinstance(error, ValueError) and "BadGateway" in str(error))
+
+
+class CircuitState(str, enum.Enum):
+    """Circuit breaker state."""
+    # Calls go through
+    CLOSED = "closed"
+    # Calls fail fast
+    OPEN = "open"
+    # A single probe call goes through, the rest fail fast
+    HALF_OPEN = "half_open"
+
+
+@dataclasses.dataclass
+class CircuitBreakerPolicy:
+    """Thresholds of opening and closing the circuit."""
+    # Window of observed call outcomes, in seconds
+    window: float = 60.0
+    # Failure rate within the window, which opens the circuit
+    failure_rate_threshold: float = 0.5
+    # Minimum number of calls within the window to judge the failure rate on
+    minimum_calls: int = 5
+    # Time the circuit stays open before probing, in seconds
+    open_duration: float = 30.0
+
+
+class CircuitBreaker:
+    """Circuit breaker, which opens when the failure rate within a time window is too high.
+
+    After the open duration, a single probe call is let through. The circuit closes if it succeeds,
+    and opens again otherwise.
+    """
+    # Name used in metrics
+    name: str
+    policy: CircuitBreakerPolicy
+    state: CircuitState
+    # Monotonic times and outcomes of calls within the window
+    outcomes: collections.deque[tuple[float, bool]]
+    opened_at: float
+    probing: bool
+    # LLM calls are made both from the event loop and from worker threads
+    lock: threading.Lock
+
+    def __init__(self, name: str, policy: CircuitBreakerPolicy | None = None) -> None:
+        """Initialise a closed circuit breaker.
+
+        Args:
+            name (str): name used in metrics
+            policy (CircuitBreakerPolicy | None): thresholds, the default ones if not set
+        """
+        self.name = name
+        self.policy = policy if policy is not None else CircuitBreakerPolicy()
+        self.state = CircuitState.CLOSED
+        self.outcomes = collections.deque()
+        self.opened_at = 0.0
+        self.probing = False
+        self.lock = threading.Lock()
+
+    def is_open(self) -> bool:
+        """Check whether calls are failing fast at the moment.
+
+        Returns:
+            bool: whether the circuit is open, and it is not time to probe yet
+        """
+        with self.lock:
+            return self.state == CircuitState.OPEN and time.monotonic() - self.opened_at < self.policy.open_duration
+
+    def before_call(self) -> None:
+        """Check that a call may go through.
+
+        Raises:
+            CblitModelUnavailableError: The circuit is open
+        """
+        with self.lock:
+            if self.state == CircuitState.OPEN and time.monotonic() - self.opened_at >= self.policy.open_duration:
+                self._set_state(CircuitState.HALF_OPEN)
+            if self.state == CircuitState.CLOSED:
+                return
+            if self.state == CircuitState.HALF_OPEN and not self.probing:
+                self.probing = True
+                return
+        metrics.increment(f"circuit_breaker.{self.name}.fast_failures")
+        raise CblitModelUnavailableError("The language model is unavailable")
+
+    def record(self, success: bool) -> None:
+        """Record outcome of a call, which has gone through.
+
+        Args:
+            success (bool): whether the call has succeeded, or has failed for a reason other than unavailability
+        """
+        now = time.monotonic()
+        with self.lock:
+            if self.state == CircuitState.HALF_OPEN and self.probing:
+                self.probing = False
+                self.outcomes.clear()
+                if success:
+                    self._set_state(CircuitState.CLOSED)
+                else:
+                    self._open(now)
+                return
+            self.outcomes.append((now, success))
+            while self.outcomes and self.outcomes[0][0] < now - self.policy.window:
+                self.outcomes.popleft()
+            failures = sum(1 for _, outcome in self.outcomes if not outcome)
+            if (
+                self.state == CircuitState.CLOSED
+                and len(self.outcomes) >= self.policy.minimum_calls
+                and failures / len(self.outcomes) >= self.policy.failure_rate_threshold
+            ):
+                self.outcomes.clear()
+                self._open(now)
+
+    @contextlib.contextmanager
+    def guard(self) -> Iterator[None]:
+        """Guard a call within the context, failing fast while the circuit is open.
+
+        Only backend errors and the call's own timeouts count as failures. A cancelled call, e.g. by a disconnected
+        client or a caller's deadline, says nothing of the backend, and is forgotten.
+
+        Raises:
+            CblitModelUnavailableError: The circuit is open, or the call has failed because the backend is unavailable
+
+        Yields:
+            None: once the call may go through
+        """
+        self.before_call()
+        try:
+            yield
+        except Exception as error:
+            unavailable = is_unavailability(error)
+            self.record(not unavailable)
+            if unavailable:
+                raise CblitModelUnavailableError(f"The language model is unavailable: {error}") from error
+            raise
+        except BaseException:
+            self.abandon_call()
+            raise
+        self.record(True)
+
+    def abandon_call(self) -> None:
+        """Forget a call, which has gone through but has been interrupted before its outcome was known."""
+        with self.lock:
+            if self.state == CircuitState.HALF_OPEN:
+                self.probing = False
+
+    def _open(self, now: float) -> None:
+        """Open the circuit.
+
+        Args:
+            now (float): monotonic time of opening
+        """
+        self.opened_at = now
+        metrics.increment(f"circuit_breaker.{self.name}.opened")
+        self._set_state(CircuitState.OPEN)
+
+    def _set_state(self, state: CircuitState) -> None:
+        """Set and report the circuit state.
+
+        Args:
+            state (CircuitState): new state
+        """
+        self.state = state
+        metrics.set_gauge(f"circuit_breaker.{self.name}.open", 0 if state == CircuitState.CLOSED else 1)
+
+
+# Completions and embeddings are separate endpoints, successful embeddings must not hide failing completions
+llm_circuit_breaker = CircuitBreaker("llm")
+embeddings_circuit_breaker = CircuitBreaker("embeddings")
@@ -0,0 +1,65 @@
+"""LLM concurrency budget module.
+
+Background work, e.g. game generation, runs its LLM calls within a budget shared by everything in flight,
+so that many games generated at once do not flood the LLM backend. Calls outside a budget, e.g. player turns,
+are never held back.
+"""
+import asyncio
+import contextlib
+import contextvars
+import os
+import time
+import weakref
+from collections.abc import AsyncIterator, Iterator
+
+from cblit.metrics import metrics
+
+# Budget of the current context, None if calls are not limited
+current_llm_budget: contextvars.ContextVar[asyncio.Semaphore | None] = contextvars.ContextVar(
+    "current_llm_budget", default=None
+)
+# Generation budgets by event loop, as a semaphore can only be waited on within a single loop
+_generation_budgets: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore] = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_generation_budget() -> asyncio.Semaphore:
+    """Get the LLM concurrency budget shared by all game generations of the running event loop.
+
+    Its size is set by `CBLIT_GENERATION_LLM_CONCURRENCY`.
+
+    Returns:
+        asyncio.Semaphore: budget
+    """
+    loop = asyncio.get_running_loop()
+    if loop not in _generation_budgets:
+        _generation_budgets[loop] = asyncio.Semaphore(int(os.getenv("CBLIT_GENERATION_LLM_CONCURRENCY", "8")))
+    return _generation_budgets[loop]
+
+
+@contextlib.contextmanager
+def limiting_llm_calls(budget: asyncio.Semaphore) -> Iterator[None]:
+    """Limit LLM calls made within the context, including the tasks it starts, by a budget.
+
+    Args:
+        budget (asyncio.Semaphore): budget of concurrent calls
+    """
+    token = current_llm_budget.set(budget)
+    try:
+        yield
+    finally:
+        current_llm_budget.reset(token)
+
+
+@contextlib.asynccontextmanager
+async def llm_call_slot() -> AsyncIterator[None]:
+    """Hold a slot of the current budget for the duration of an LLM call, if calls are limited."""
+    budget = current_llm_budget.get()
+    if budget is None:
+        yield
+        return
+    start_time = time.perf_counter()
+    async with budget:
+        metrics.observe("llm_budget.wait_seconds", time.perf_counter() - start_time)
+        yield
@@ -1,15 +1,235 @@
 """LLM."""
+import functools
+import threading
+from collections import OrderedDict
+from typing import Any
+
 from langchain import OpenAI
+from langchain.callbacks.manager import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain.embeddings import OpenAIEmbeddings
+from langchain.embeddings.base import Embeddings
 from langchain.llms.base import BaseLLM
+from langchain.schema import LLMResult
+
+from cblit.llm.call_counts import count_embeddings_call, count_llm_call, count_tokens
+from cblit.llm.cassette import CassetteEmbeddings, CassetteLLM, CassetteMode, get_cassette
+from cblit.llm.circuit_breaker import embeddings_circuit_breaker, llm_circuit_breaker
+from cblit.llm.concurrency import llm_call_slot
+from cblit.logs import DEFAULT_STAGE, get_llm_callbacks
+
+EMBEDDING_CACHE_SIZE = 16384
+# Retries of a failed request within a call, few, so that the circuit breaker sees an outage quickly
+BACKEND_MAX_RETRIES = 1
+# Timeout of a single request to the backend, in seconds, shorter than a stage's deadline
+BACKEND_REQUEST_TIMEOUT = 30.0
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings with a process-wide LRU cache.
+
+    Games built from the same pregenerated game index the same phrasebook and documents,
+    so restoring or rebuilding a game does not need to embed them again.
+    """
+    embeddings: Embeddings
+    cache: OrderedDict[str, list[float]]
+    max_size: int
+    # Games may be built in worker threads, e.g. by the warm pool
+    lock: threading.Lock
+
+    def __init__(self, embeddings: Embeddings, max_size: int = EMBEDDING_CACHE_SIZE) -> None:
+        """Wrap embeddings with a cache.
+
+        Args:
+            embeddings (Embeddings): embeddings to wrap
+            max_size (int): maximum number of cached texts
+        """
+        self.embeddings = embeddings
+        self.cache = OrderedDict()
+        self.max_size = max_size
+        self.lock = threading.Lock()
+
+    def _remember(self, text: str, embedding: list[float]) -> None:
+        """Put an embedding into the cache, evicting the least recently used one if full.
+
+        Args:
+            text (str): embedded text
+            embedding (list[float]): its embedding
+        """
+        with self.lock:
+            self.cache[text] = embedding
+            if len(self.cache) > self.max_size:
+                self.cache.popitem(last=False)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        """Embed texts, only calling the wrapped embeddings for the ones not in the cache.
+
+        Args:
+            texts (list[str]): texts to embed
+
+        Returns:
+            list[list[float]]: embeddings
+        """
+        missing = list(dict.fromkeys(text for text in texts if text not in self.cache))
+        if missing:
+            for text, embedding in zip(missing, self.embeddings.embed_documents(missing), strict=True):
+                self._remember(text, embedding)
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        """Embed a text.
+
+        Args:
+            text (str): text to embed
+
+        Returns:
+            list[float]: embedding
+        """
+        with self.lock:
+            if text in self.cache:
+                self.cache.move_to_end(text)
+                return self.cache[text]
+        embedding = self.embeddings.embed_query(text)
+        self._remember(text, embedding)
+        return embedding
+
+
+class GuardedLLM(BaseLLM):
+    """LLM, which fails fast while the circuit breaker is open."""
+    llm: BaseLLM
+
+    def _generate(
+            self,
+            prompts: list[str],
+            stop: list[str] | None = None,
+            run_manager: CallbackManagerForLLMRun | None = None
+    ) -> LLMResult:
+        """Run the wrapped LLM on the given prompts.
+
+        Args:
+            prompts (list[str]): prompts
+            stop (list[str] | None): stop words
+            run_manager (CallbackManagerForLLMRun | None): callback manager of the run
 
+        Returns:
+            LLMResult: result of the wrapped LLM
+        """
+        count_llm_call()
+        with llm_circuit_breaker.guard():
+            result = self.llm._generate(prompts, stop, run_manager)
+        count_tokens(result)
+        return result
 
-def get_llm(temperature: float = 0) -> BaseLLM:
+    async def _agenerate(
+            self,
+            prompts: list[str],
+            stop: list[str] | None = None,
+            run_manager: AsyncCallbackManagerForLLMRun | None = None
+    ) -> LLMResult:
+        """Run the wrapped LLM on the given prompts asynchronously.
+
+        Args:
+            prompts (list[str]): prompts
+            stop (list[str] | None): stop words
+            run_manager (AsyncCallbackManagerForLLMRun | None): callback manager of the run
+
+        Returns:
+            LLMResult: result of the wrapped LLM
+        """
+        count_llm_call()
+        async with llm_call_slot():
+            with llm_circuit_breaker.guard():
+                result = await self.llm._agenerate(prompts, stop, run_manager)
+        count_tokens(result)
+        return result
+
+    @property
+    def _llm_type(self) -> str:
+        """Get type of the LLM.
+
+        Returns:
+            str: type of the wrapped LLM
+        """
+        return self.llm._llm_type
+
+
+class GuardedEmbeddings(Embeddings):
+    """Embeddings, which fail fast while the circuit breaker is open."""
+    embeddings: Embeddings
+
+    def __init__(self, embeddings: Embeddings) -> None:
+        """Wrap embeddings with the circuit breaker.
+
+        Args:
+            embeddings (Embeddings): embeddings to wrap
+        """
+        self.embeddings = embeddings
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        """Embed texts.
+
+        Args:
+            texts (list[str]): texts to embed
+
+        Returns:
+            list[list[float]]: embeddings
+        """
+        count_embeddings_call()
+        with embeddings_circuit_breaker.guard():
+            return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        """Embed a text.
+
+        Args:
+            text (str): text to embed
+
+        Returns:
+            list[float]: embedding
+        """
+        count_embeddings_call()
+        with embeddings_circuit_breaker.guard():
+            return self.embeddings.embed_query(text)
+
+
+def get_llm(temperature: float = 0, stage: str = DEFAULT_STAGE, max_tokens: int | None = None) -> BaseLLM:
     """Get LLM to use in Langchain sessions.
 
     Args:
         temperature (float): temperature
+        stage (str): stage name to log prompts and responses under
+        max_tokens (int | None): maximum completion length in tokens, the default if not set
 
     Returns:
         BaseLLM: Langchain compatible LLM
     """
-    return OpenAI(temperature=temperature)  # type: ignore [call-arg]
+    cassette = get_cassette()
+    params: dict[str, Any] = {"temperature": temperature}
+    if max_tokens is not None:
+        params["max_tokens"] = max_tokens
+    callbacks = get_llm_callbacks(stage)
+    if cassette is not None and cassette.mode == CassetteMode.REPLAY:
+        return CassetteLLM(llm=None, params=params, cassette=cassette, callbacks=callbacks)
+    llm = GuardedLLM(llm=OpenAI(**params, max_retries=BACKEND_MAX_RETRIES, request_timeout=BACKEND_REQUEST_TIMEOUT))
+    if cassette is not None:
+        return CassetteLLM(llm=llm, params=params, cassette=cassette, callbacks=callbacks)
+    llm.callbacks = callbacks
+    return llm
+
+
+@functools.cache
+def get_embeddings() -> Embeddings:
+    """Get embeddings to use in Langchain vector stores.
+
+    Returns:
+        Embeddings: Langchain compatible embeddings, shared by all sessions
+    """
+    cassette = get_cassette()
+    if cassette is not None and cassette.mode == CassetteMode.REPLAY:
+        return CachedEmbeddings(CassetteEmbeddings(None, cassette))
+    embeddings: Embeddings = GuardedEmbeddings(OpenAIEmbeddings(  # type: ignore [call-arg]
+        max_retries=BACKEND_MAX_RETRIES, request_timeout=BACKEND_REQUEST_TIMEOUT
+    ))
+    if cassette is not None:
+        embeddings = CassetteEmbeddings(embeddings, cassette)
+    # Cached embeddings do not need the backend, so they are served even while the circuit is open
+    return CachedEmbeddings(embeddings)
@@ -0,0 +1,32 @@
+"""Token counting module.
+
+Texts are counted with the model's tokenizer.
+"""
+import functools
+
+import tiktoken
+
+# Model the tokenizer is taken from, the default model of the OpenAI LLM
+TOKENIZER_MODEL = "text-davinci-003"
+
+
+@functools.cache
+def get_encoding() -> tiktoken.Encoding:
+    """Get tokenizer of the model.
+
+    Returns:
+        tiktoken.Encoding: encoding of the model
+    """
+    return tiktoken.encoding_for_model(TOKENIZER_MODEL)
+
+
+def count_text_tokens(text: str) -> int:
+    """Count tokens of a text.
+
+    Args:
+        text (str): text to count
+
+    Returns:
+        int: number of tokens
+    """
+    return len(get_encoding().encode(text))
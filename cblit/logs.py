@@ -0,0 +1,229 @@
+"""Logging module.
+
+Log records are written by a background thread, so that the event loop does not wait for the sinks.
+Prompts and responses of LLM calls are sampled and truncated, unless verbose mode is on,
+which logs all of them and can be toggled at runtime.
+"""
+import dataclasses
+import os
+import random
+import sys
+from typing import TYPE_CHECKING, Any
+from uuid import UUID
+
+from langchain.callbacks.base import AsyncCallbackHandler, BaseCallbackHandler
+from langchain.schema import LLMResult
+from loguru import logger
+
+from cblit.errors.errors import CblitArgumentError
+
+if TYPE_CHECKING:
+    from loguru import Record
+
+# Stage of records not bound to a stage
+DEFAULT_STAGE = "default"
+
+
+@dataclasses.dataclass
+class LoggingPolicy:
+    """Levels, sampling and truncation of logs."""
+    level: str = "INFO"
+    # Levels of specific stages, e.g. officer or translator, overriding the default level
+    stage_levels: dict[str, str] = dataclasses.field(default_factory=dict)
+    # Shares of LLM prompts and responses logged, at info level
+    prompt_sample_rate: float = 0.0
+    response_sample_rate: float = 0.0
+    # Maximum length of a logged prompt or response, in characters
+    max_length: int = 2000
+    # Log all prompts and responses, and records of every level and stage
+    verbose: bool = False
+    # Write records as JSON lines
+    serialize: bool = False
+    # Write records from a background thread, rather than in the logging one
+    enqueue: bool = True
+
+    @classmethod
+    def from_env(cls) -> "LoggingPolicy":
+        """Get policy configured by the environment.
+
+        `CBLIT_LOG_STAGE_LEVELS` is a comma separated list of `stage=LEVEL` pairs.
+
+        Returns:
+            LoggingPolicy: policy
+
+        Raises:
+            CblitArgumentError: Malformed stage levels
+        """
+        stage_levels = {}
+        for pair in filter(None, os.getenv("CBLIT_LOG_STAGE_LEVELS", "").split(",")):
+            stage, separator, level = pair.partition("=")
+            if not separator:
+                raise CblitArgumentError(f"Malformed stage log level: {pair}")
+            stage_levels[stage.strip()] = level.strip().upper()
+        return cls(
+            level=os.getenv("CBLIT_LOG_LEVEL", "INFO").upper(),
+            stage_levels=stage_levels,
+            prompt_sample_rate=float(os.getenv("CBLIT_LOG_PROMPT_SAMPLE_RATE", "0")),
+            response_sample_rate=float(os.getenv("CBLIT_LOG_RESPONSE_SAMPLE_RATE", "0")),
+            max_length=int(os.getenv("CBLIT_LOG_MAX_LENGTH", "2000")),
+            verbose=os.getenv("CBLIT_VERBOSE") == "1",
+            serialize=os.getenv("CBLIT_LOG_JSON") == "1",
+        )
+
+
+# Policy in effect, read by the sink filter and the LLM callbacks on every record, so that changes apply at once
+policy = LoggingPolicy()
+
+
+def truncate(text: str) -> str:
+    """Truncate text to the maximum logged length.
+
+    Args:
+        text (str): text to log
+
+    Returns:
+        str: text, cut short with the number of omitted characters if too long
+    """
+    if len(text) <= policy.max_length:
+        return text
+    return f"{text[:policy.max_length]}... [{len(text) - policy.max_length} more characters]"
+
+
+def is_enabled(record: "Record") -> bool:
+    """Check whether a record passes the level of its stage.
+
+    Args:
+        record (Record): loguru record
+
+    Returns:
+        bool: whether to write the record
+    """
+    if policy.verbose:
+        return True
+    level = policy.stage_levels.get(record["extra"].get("stage", DEFAULT_STAGE), policy.level)
+    return record["level"].no >= logger.level(level).no
+
+
+def configure_logging(new_policy: LoggingPolicy | None = None) -> None:
+    """Replace the default sink with a background one filtered by the policy.
+
+    Args:
+        new_policy (LoggingPolicy | None): policy to use, configured by the environment if not set
+    """
+    set_policy(new_policy if new_policy is not None else LoggingPolicy.from_env())
+    logger.remove()
+    logger.configure(extra={"stage": DEFAULT_STAGE})
+    logger.add(sys.stderr, level=0, filter=is_enabled, enqueue=policy.enqueue, serialize=policy.serialize)
+
+
+def set_policy(new_policy: LoggingPolicy) -> None:
+    """Set the policy in effect, in place, so that its readers see the change.
+
+    Args:
+        new_policy (LoggingPolicy): policy to use
+    """
+    for field in dataclasses.fields(LoggingPolicy):
+        setattr(policy, field.name, getattr(new_policy, field.name))
+
+
+def set_verbose(verbose: bool) -> None:
+    """Toggle verbose mode at runtime.
+
+    Args:
+        verbose (bool): whether to log all prompts and responses, and records of every level
+    """
+    policy.verbose = verbose
+    logger.info(f"Verbose logging is {'on' if verbose else 'off'}")
+
+
+def toggle_verbose() -> None:
+    """Toggle verbose mode at runtime, e.g. on a signal."""
+    set_verbose(not policy.verbose)
+
+
+class LLMLoggingHandler(AsyncCallbackHandler):
+    """Langchain callback handler, which logs sampled prompts and responses of a stage."""
+    stage: str
+
+    def __init__(self, stage: str) -> None:
+        """Initialise a handler.
+
+        Args:
+            stage (str): stage bound to the records, e.g. officer or translator
+        """
+        self.stage = stage
+
+    @property
+    def ignore_llm(self) -> bool:
+        """Check whether LLM events are skipped, so that Langchain does not call the handler at all.
+
+        Returns:
+            bool: whether nothing is sampled
+        """
+        return not policy.verbose and policy.prompt_sample_rate <= 0 and policy.response_sample_rate <= 0
+
+    async def on_llm_start(
+            self,
+            serialized: dict[str, Any],
+            prompts: list[str],
+            *,
+            run_id: UUID,
+            parent_run_id: UUID | None = None,
+            **kwargs: Any
+    ) -> None:
+        """Log sampled prompts of an LLM call.
+
+        Args:
+            serialized (dict[str, Any]): unused
+            prompts (list[str]): prompts
+            run_id (UUID): ID of the call
+            parent_run_id (UUID | None): unused
+            kwargs (Any): unused
+        """
+        self._log("prompt", prompts, policy.prompt_sample_rate, run_id)
+
+    async def on_llm_end(
+            self,
+            response: LLMResult,
+            *,
+            run_id: UUID,
+            parent_run_id: UUID | None = None,
+            **kwargs: Any
+    ) -> None:
+        """Log sampled responses of an LLM call.
+
+        Args:
+            response (LLMResult): responses
+            run_id (UUID): ID of the call
+            parent_run_id (UUID | None): unused
+            kwargs (Any): unused
+        """
+        texts = [generation.text for generations in response.generations for generation in generations]
+        self._log("response", texts, policy.response_sample_rate, run_id)
+
+    def _log(self, kind: str, texts: list[str], sample_rate: float, run_id: UUID) -> None:
+        """Log texts of an LLM call, if sampled.
+
+        Args:
+            kind (str): prompt or response
+            texts (list[str]): texts to log
+            sample_rate (float): share of calls logged outside verbose mode
+            run_id (UUID): ID of the call
+        """
+        if not policy.verbose and random.random() >= sample_rate:
+            return
+        bound = logger.bind(stage=self.stage, kind=kind, run_id=str(run_id))
+        for text in texts:
+            bound.info(f"LLM {kind}:\n{truncate(text)}")
+
+
+def get_llm_callbacks(stage: str) -> list[BaseCallbackHandler]:
+    """Get Langchain callbacks to log LLM calls of a stage.
+
+    Args:
+        stage (str): stage name, e.g. officer or translator
+
+    Returns:
+        list[BaseCallbackHandler]: callbacks to pass to an LLM, chain callbacks are not passed down to it
+    """
+    return [LLMLoggingHandler(stage)]
@@ -0,0 +1,46 @@
+"""Event loop lag monitor module.
+
+Measures how late the event loop wakes up a sleeping task, which is how long blocking work holds the loop up.
+"""
+import asyncio
+
+from cblit.metrics import metrics
+
+# Time between lag measurements, in seconds
+LOOP_LAG_INTERVAL = 0.1
+
+
+class LoopLagMonitor:
+    """Event loop lag monitor, reporting the lag as a statistic and a gauge of the latest measurement."""
+    interval: float
+    task: asyncio.Task[None] | None
+
+    def __init__(self, interval: float = LOOP_LAG_INTERVAL) -> None:
+        """Initialise a stopped monitor.
+
+        Args:
+            interval (float): time between measurements, in seconds
+        """
+        self.interval = interval
+        self.task = None
+
+    def start(self) -> None:
+        """Start measuring the lag of the running event loop."""
+        if self.task is None:
+            self.task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self) -> None:
+        """Stop measuring."""
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    async def _run(self) -> None:
+        """Measure the lag periodically."""
+        loop = asyncio.get_running_loop()
+        while True:
+            start_time = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - start_time - self.interval)
+            metrics.observe("event_loop.lag_seconds", lag)
+            metrics.set_gauge("event_loop.lag", lag)
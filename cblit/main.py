@@ -1,14 +1,19 @@
 import typer
 from asyncio import run as aiorun
 from cblit.game.game_cli_wrapper import GameCliWrapper
+from cblit.game.game_script import run_scripts
+from cblit.game.journal import read_journal, replay_session
+from cblit.logs import configure_logging, set_verbose
 
 app = typer.Typer(pretty_exceptions_show_locals=False)
 
 
 @app.callback()
-def cli() -> None:
+def cli(verbose: bool = typer.Option(False, help="Log all LLM prompts and responses")) -> None:
     """Cosmic Bureaucracy: Lost in Translation"""
-    pass
+    configure_logging()
+    if verbose:
+        set_verbose(True)
 
 
 @app.command()
@@ -20,5 +25,36 @@ def start() -> None:
     aiorun(_start())
 
 
+@app.command()
+def play(
+        scripts: list[str] = typer.Argument(..., help="Game script files, played concurrently"),
+        report: str = typer.Option("play-report.json", help="Timing report file")
+) -> None:
+    """Play game scripts unattended, and write a timing report."""
+    play_report = aiorun(run_scripts(scripts))
+    with open(report, "w") as f:
+        f.write(play_report.json(indent=2))
+    for script in play_report.scripts:
+        errors = [action.error for action in script.actions if action.error is not None]
+        status = f"failed: {errors[0]}" if errors else "done"
+        print(f"{script.script}: {len(script.actions)} actions in {script.seconds:.3f} seconds, {status}")
+
+
+@app.command()
+def replay(
+        journal: str = typer.Argument(..., help="Journal directory"),
+        session_id: str = typer.Argument(..., help="Session ID to replay")
+) -> None:
+    """Replay a session from the journal, and compare the timings of its turns."""
+    entries = read_journal(journal, session_id)
+    replayed = aiorun(replay_session(entries))
+    for original, entry in zip(entries, replayed, strict=True):
+        print(
+            f"{original.kind.value}: {original.seconds:.3f} -> {entry.seconds:.3f} seconds, "
+            f"{original.llm_calls} -> {entry.llm_calls} LLM calls, {original.tokens} -> {entry.tokens} tokens"
+            + (f", failed: {entry.error}" if entry.error is not None else "")
+        )
+
+
 if __name__ == "__main__":
     app()
@@ -0,0 +1,114 @@
+"""Metrics module.
+
+Process-wide counters, gauges and statistics, reported by the server's metrics endpoint.
+"""
+import dataclasses
+import math
+from typing import Any
+
+
+@dataclasses.dataclass
+class Statistic:
+    """Running statistic of observed values."""
+    count: int = 0
+    total: float = 0
+    minimum: float = math.inf
+    maximum: float = -math.inf
+
+    def observe(self, value: float) -> None:
+        """Observe a value.
+
+        Args:
+            value (float): observed value
+        """
+        self.count += 1
+        self.total += value
+        self.minimum = min(self.minimum, value)
+        self.maximum = max(self.maximum, value)
+
+    @property
+    def mean(self) -> float:
+        """Get mean of the observed values.
+
+        Returns:
+            float: mean, 0 if nothing has been observed
+        """
+        return self.total / self.count if self.count else 0
+
+    def report(self) -> dict[str, float]:
+        """Report the statistic.
+
+        Returns:
+            dict[str, float]: count, mean, min and max
+        """
+        if not self.count:
+            return {"count": 0}
+        return {"count": self.count, "mean": self.mean, "min": self.minimum, "max": self.maximum}
+
+
+class Metrics:
+    """Metrics registry."""
+    counters: dict[str, int]
+    gauges: dict[str, float]
+    statistics: dict[str, Statistic]
+
+    def __init__(self) -> None:
+        """Initialise empty registry."""
+        self.counters = {}
+        self.gauges = {}
+        self.statistics = {}
+
+    def increment(self, name: str, value: int = 1) -> None:
+        """Increment a counter.
+
+        Args:
+            name (str): counter name
+            value (int): value to increment by
+        """
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def set_gauge(self, name: str, value: float) -> None:
+        """Set a gauge.
+
+        Args:
+            name (str): gauge name
+            value (float): current value
+        """
+        self.gauges[name] = value
+
+    def observe(self, name: str, value: float) -> None:
+        """Observe a value of a statistic.
+
+        Args:
+            name (str): statistic name
+            value (float): observed value
+        """
+        self.statistics.setdefault(name, Statistic()).observe(value)
+
+    def ratio(self, numerator: str, denominator: str) -> float:
+        """Get a ratio of two counters.
+
+        Args:
+            numerator (str): numerator counter name
+            denominator (str): denominator counter name
+
+        Returns:
+            float: ratio, 0 if the denominator is 0
+        """
+        total = self.counters.get(denominator, 0)
+        return self.counters.get(numerator, 0) / total if total else 0
+
+    def report(self) -> dict[str, Any]:
+        """Report all metrics.
+
+        Returns:
+            dict[str, Any]: JSON serialisable report
+        """
+        return {
+            "counters": dict(self.counters),
+            "gauges": dict(self.gauges),
+            "statistics": {name: statistic.report() for name, statistic in self.statistics.items()},
+        }
+
+
+metrics = Metrics()
@@ -1,37 +1,97 @@
 """Script to pregenerate games."""
 import asyncio
+import os
+import sys
 import time
 
 from loguru import logger
 
 from cblit.game.game import Game
-from cblit.game.pregenerated_game import PregeneratedGame
+from cblit.game.pregenerated_game import PREGENERATED_GAMES_DIRECTORY, PregeneratedGame, get_game_ids
+from cblit.llm.concurrency import get_generation_budget, limiting_llm_calls
+from cblit.logs import configure_logging
+
+# Number of games pregenerated at once, with their countries and quentas generated in single completions
+PREGENERATE_BATCH_SIZE = int(os.getenv("CBLIT_PREGENERATE_BATCH_SIZE", "5"))
+# Number of games pregenerated by the script
+PREGENERATE_GAMES = 1000
 
 
 async def pregenerate_game() -> None:
     """Pregenerate a game."""
     start_time = time.time()
-    filename = f"pregen_{int(start_time)}.json"
-    logger.info(f"Pregenerating {filename}")
+    logger.info("Pregenerating a game")
 
     try:
         game = await Game.generate()
+        # Starting the game precomputes the officer's opening exchange
+        await game.start()
         pregenerated_game = PregeneratedGame.from_game(game)
-        game_json = pregenerated_game.json(indent=2)
-
-        with open(filename, "w") as f:
-            f.write(game_json)
+        game_id = await pregenerated_game.asave()
 
         finish_time = time.time()
-        logger.info(f"Finished generation in {finish_time - start_time} seconds")
+        logger.info(f"Finished generation of {game_id} in {finish_time - start_time} seconds")
+    except Exception as e:
+        logger.error(f"Error occured: {e}")
+
+
+async def pregenerate_games(count: int) -> None:
+    """Pregenerate a batch of games.
+
+    Args:
+        count (int): number of games
+    """
+    start_time = time.time()
+    logger.info(f"Pregenerating {count} games")
+
+    try:
+        games = await Game.generate_many(count)
+        # Starting the games precomputes the officers' opening exchanges, within the same LLM budget
+        with limiting_llm_calls(get_generation_budget()):
+            await asyncio.gather(*(game.start() for game in games))
+        game_ids = await asyncio.gather(*(PregeneratedGame.from_game(game).asave() for game in games))
+
+        seconds = time.time() - start_time
+        logger.info(
+            f"Finished generation of {', '.join(game_ids)} in {seconds} seconds, "
+            f"{len(game_ids) * 60 / seconds:.2f} games per minute"
+        )
+    except Exception as e:
+        logger.error(f"Error occured: {e}")
+
+
+async def backfill_opening(game_id: str) -> None:
+    """Precompute the officer's opening exchange for a previously pregenerated game.
+
+    Args:
+        game_id (str): ID of the game in the pregenerated corpus
+    """
+    pregenerated_game = await PregeneratedGame.aget_by_id(game_id)
+    if pregenerated_game.opening is not None:
+        return
+    logger.info(f"Precomputing opening for {game_id}")
+    try:
+        game = pregenerated_game.to_game()
+        await game.start()
+        pregenerated_game.opening = game.opening
+        await pregenerated_game.asave()
     except Exception as e:
         logger.error(f"Error occured: {e}")
 
 
 if __name__ == "__main__":
+    configure_logging()
     loop = asyncio.get_event_loop()
-    for i in range(1000):
-        logger.info(f"Pregenerating #{i}")
-        loop.run_until_complete(pregenerate_game())
+    if sys.argv[1:] == ["backfill"]:
+        for game_id in sorted(get_game_ids(os.listdir(PREGENERATED_GAMES_DIRECTORY))):
+            loop.run_until_complete(backfill_opening(game_id))
+    elif PREGENERATE_BATCH_SIZE > 1:
+        for i in range(0, PREGENERATE_GAMES, PREGENERATE_BATCH_SIZE):
+            logger.info(f"Pregenerating #{i}")
+            loop.run_until_complete(pregenerate_games(min(PREGENERATE_BATCH_SIZE, PREGENERATE_GAMES - i)))
+    else:
+        for i in range(PREGENERATE_GAMES):
+            logger.info(f"Pregenerating #{i}")
+            loop.run_until_complete(pregenerate_game())
 
     logger.info("Done")
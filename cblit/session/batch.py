@@ -0,0 +1,105 @@
+"""Batch generation module.
+
+Many items are generated in a single structured completion, so that the prompt and its schema are sent
+once per batch rather than once per item. Items are validated one by one, and only the invalid ones are
+requested again.
+"""
+import asyncio
+import contextlib
+import json
+import re
+from collections.abc import Awaitable, Callable
+from typing import Generic, TypeVar
+
+from langchain.output_parsers.format_instructions import PYDANTIC_FORMAT_INSTRUCTIONS
+from pydantic import BaseModel, ValidationError
+
+from cblit.metrics import metrics
+
+T = TypeVar("T", bound=BaseModel)
+R = TypeVar("R")
+
+# Maximum number of items requested in a single completion, so that the reply fits the completion length
+BATCH_SIZE = 5
+# Number of completions requesting an item, before it is left to single-item generation
+BATCH_TRIES = 3
+# Completion length of a batch, in tokens, which leaves room for the prompt within the model context
+BATCH_MAX_TOKENS = 2500
+
+
+class BatchOutputParser(Generic[T]):
+    """Parser of a batch of items, which are validated one by one."""
+    item_type: type[T]
+
+    def __init__(self, item_type: type[T]) -> None:
+        """Initialise a parser.
+
+        Args:
+            item_type (type[T]): pydantic model of an item
+        """
+        self.item_type = item_type
+
+    def get_format_instructions(self) -> str:
+        """Get instructions to format a batch as a JSON object with a list of items.
+
+        Returns:
+            str: format instructions
+        """
+        item_schema = self.item_type.schema()
+        item_schema.pop("title", None)
+        schema = {"properties": {"items": {"type": "array", "items": item_schema}}, "required": ["items"]}
+        return PYDANTIC_FORMAT_INSTRUCTIONS.format(schema=json.dumps(schema))
+
+    def parse(self, text: str, count: int) -> list[T | None]:
+        """Parse a batch, leaving out the invalid items.
+
+        Args:
+            text (str): completion
+            count (int): number of requested items
+
+        Returns:
+            list[T | None]: items in the requested order, None in place of the missing or invalid ones
+        """
+        items: list[T | None] = [None] * count
+        match = re.search(r"\{.*\}", text.strip(), re.MULTILINE | re.DOTALL)
+        try:
+            raw_items = json.loads(match.group() if match else "", strict=False)["items"]
+        except (json.JSONDecodeError, KeyError, TypeError):
+            metrics.increment("batch.invalid_items", count)
+            return items
+        for i, raw_item in enumerate(raw_items[:count] if isinstance(raw_items, list) else []):
+            with contextlib.suppress(ValidationError):
+                items[i] = self.item_type.parse_obj(raw_item)
+        metrics.increment("batch.invalid_items", items.count(None))
+        return items
+
+
+async def generate_batch(
+        generate: Callable[[list[R]], Awaitable[list[T | None]]],
+        requests: list[R],
+        tries: int = BATCH_TRIES
+) -> list[T | None]:
+    """Generate an item for every request in batches, requesting the invalid items again.
+
+    Args:
+        generate (Callable[[list[R]], Awaitable[list[T | None]]]): generation of a single batch
+        requests (list[R]): requested items, e.g. the countries to generate quentas for
+        tries (int): number of completions requesting an item
+
+    Returns:
+        list[T | None]: items in the requested order, None in place of the ones not generated in the given tries
+    """
+    items: list[T | None] = [None] * len(requests)
+    for attempt in range(tries):
+        pending = [i for i, item in enumerate(items) if item is None]
+        if not pending:
+            break
+        if attempt > 0:
+            metrics.increment("batch.retried_items", len(pending))
+        chunks = [pending[start:start + BATCH_SIZE] for start in range(0, len(pending), BATCH_SIZE)]
+        batches = await asyncio.gather(*(generate([requests[i] for i in chunk]) for chunk in chunks))
+        for chunk, batch in zip(chunks, batches, strict=True):
+            for i, item in zip(chunk, batch, strict=True):
+                items[i] = item
+    metrics.increment("batch.items", len(requests))
+    return items
@@ -9,6 +9,7 @@ from pydantic import BaseModel, Field
 from retry import retry
 
 from cblit.llm.llm import get_llm
+from cblit.session.batch import BATCH_MAX_TOKENS, BatchOutputParser, generate_batch
 from cblit.session.singleton_session import SingletonBaseSession
 
 WRITER_PROMPT = (
@@ -53,22 +54,55 @@ def get_country_prompt_template(parser: PydanticOutputParser[Country]) -> Prompt
     )
 
 
+def get_country_batch_prompt_template(parser: BatchOutputParser[Country]) -> PromptTemplate:
+    """Build a langchain prompt of a batch of countries.
+
+    Args:
+        parser (BatchOutputParser): parser for the generated countries
+
+    Returns:
+        PromptTemplate: resulting prompt template
+    """
+    template = "\n".join([
+        WRITER_PROMPT,
+        "{format_instructions}",
+        (
+            "Make up {count} different constructed non-existing countries on other planets, "
+            "where they speak non-English languages"
+        ),
+    ])
+    return PromptTemplate(
+        template=template,
+        input_variables=["count"],
+        partial_variables={"format_instructions": parser.get_format_instructions()}
+    )
+
+
 class ConstructedCountrySession(SingletonBaseSession):
     """Constructed country session."""
     llm: BaseLLM
     country_parser: PydanticOutputParser[Country]
     country_chain: Chain
+    # LLM with the completion length of a whole batch
+    batch_llm: BaseLLM
+    batch_parser: BatchOutputParser[Country]
+    batch_chain: Chain
 
     def _initialise(self) -> None:
         """Initialise country generation session."""
-        self.llm = get_llm(temperature=0.7)
+        self.llm = get_llm(temperature=0.7, stage="country")
         self.country_parser = PydanticOutputParser(pydantic_object=Country)
         prompt = get_country_prompt_template(self.country_parser)
         self.country_chain = LLMChain(
             llm=self.llm,
-            verbose=True,
             prompt=prompt,
         )
+        self.batch_llm = get_llm(temperature=0.7, stage="country", max_tokens=BATCH_MAX_TOKENS)
+        self.batch_parser = BatchOutputParser(Country)
+        self.batch_chain = LLMChain(
+            llm=self.batch_llm,
+            prompt=get_country_batch_prompt_template(self.batch_parser),
+        )
 
     @retry(exceptions=OutputParserException, tries=5)
     async def new_country(self) -> Country:
@@ -78,3 +112,28 @@ class ConstructedCountrySession(SingletonBaseSession):
             Country: a constructed country
         """
         return self.country_parser.parse(await self.country_chain.arun(dummy=""))
+
+    async def new_countries(self, count: int) -> list[Country]:
+        """Get new countries, generated in batches.
+
+        Countries, which have not been generated in batches, are generated one by one.
+
+        Args:
+            count (int): number of countries
+
+        Returns:
+            list[Country]: constructed countries
+        """
+        countries = await generate_batch(self._generate_countries, list(range(count)))
+        return [country if country is not None else await self.new_country() for country in countries]
+
+    async def _generate_countries(self, requests: list[int]) -> list[Country | None]:
+        """Generate a batch of countries in a single completion.
+
+        Args:
+            requests (list[int]): indices of the requested countries
+
+        Returns:
+            list[Country | None]: countries, None in place of the invalid ones
+        """
+        return self.batch_parser.parse(await self.batch_chain.arun(count=len(requests)), len(requests))
@@ -5,7 +5,7 @@ from typing import Self
 from pydantic import BaseModel
 
 from cblit.session.immigrant.quenta import Quenta
-from cblit.session.language.translator import TranslatorSession
+from cblit.session.language.translator import ConlangEntry, TranslatorSession
 
 
 class Document(BaseModel):
@@ -51,6 +51,24 @@ class Document(BaseModel):
 
         return cls(officer_representation=officer_representation, player_representation=player_representation)
 
+    def to_entries(self) -> list[ConlangEntry]:
+        """Split the document into line-level translations, so that only its relevant lines are retrieved.
+
+        Title underlines and blank lines are skipped. If the representations do not line up,
+        the whole document is a single entry.
+
+        Returns:
+            list[ConlangEntry]: translations of the document's lines
+        """
+        officer_lines = [line for line in self.officer_representation.splitlines() if line.strip("= ")]
+        player_lines = [line for line in self.player_representation.splitlines() if line.strip("= ")]
+        if len(officer_lines) != len(player_lines):
+            return [ConlangEntry(english=self.officer_representation, conlang=self.player_representation)]
+        return [
+            ConlangEntry(english=english, conlang=conlang)
+            for english, conlang in zip(officer_lines, player_lines, strict=True)
+        ]
+
 
 class Passport(Document):
     """Passport."""
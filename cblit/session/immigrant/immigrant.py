@@ -18,17 +18,19 @@ class Immigrant(DataClassJsonMixin):
     documents: list[Document]
 
     @classmethod
-    async def get_new(cls, country: Country, translator: TranslatorSession) -> Self:
+    async def get_new(cls, country: Country, translator: TranslatorSession, quenta: Quenta | None = None) -> Self:
         """Generate new immigrant player.
 
         Args:
             country (Country): constructed country to use
             translator (TranslatorSession): translator to translate from English to Conlang
+            quenta (Quenta | None): already generated quenta, a new one is generated if not set
 
         Returns:
              Immigrant: immigrant-player instance
         """
-        quenta = await QuentaSession.instance().new_quenta(country.neighbour_country_name, country.country_name)
+        if quenta is None:
+            quenta = await QuentaSession.instance().new_quenta(country.neighbour_country_name, country.country_name)
         documents = list(await asyncio.gather(
             Passport.from_quenta(quenta),
             WorkPermit.from_quenta(quenta, translator),
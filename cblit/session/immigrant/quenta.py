@@ -8,6 +8,7 @@ from pydantic import BaseModel, Field
 from retry import retry
 
 from cblit.llm.llm import get_llm
+from cblit.session.batch import BATCH_MAX_TOKENS, BatchOutputParser, generate_batch
 from cblit.session.country import WRITER_PROMPT
 from cblit.session.singleton_session import SingletonBaseSession
 
@@ -36,14 +37,26 @@ class QuentaSession(SingletonBaseSession):
             "for an immigrant who has just moved from {from_country} to {to_country}."
         )
     ])
+    batch_template: str = "\n".join([
+        WRITER_PROMPT,
+        "{format_instructions}",
+        (
+            "Make up immigrant-player quentas following the schema above, one for each of the following immigrants, "
+            "in the same order:\n{immigrants}"
+        )
+    ])
     llm: BaseLLM
     quenta_parser: PydanticOutputParser[Quenta]
     prompt: PromptTemplate
     chain: LLMChain
+    # LLM with the completion length of a whole batch
+    batch_llm: BaseLLM
+    batch_parser: BatchOutputParser[Quenta]
+    batch_chain: LLMChain
 
     def _initialise(self) -> None:
         """Initialise quenta generation session."""
-        self.llm = get_llm(temperature=0.7)
+        self.llm = get_llm(temperature=0.7, stage="quenta")
         self.quenta_parser = PydanticOutputParser(pydantic_object=Quenta)
         self.prompt = PromptTemplate(
             template=self.template,
@@ -52,9 +65,18 @@ class QuentaSession(SingletonBaseSession):
         )
         self.quenta_chain = LLMChain(
             llm=self.llm,
-            verbose=True,
             prompt=self.prompt
         )
+        self.batch_llm = get_llm(temperature=0.7, stage="quenta", max_tokens=BATCH_MAX_TOKENS)
+        self.batch_parser = BatchOutputParser(Quenta)
+        self.batch_chain = LLMChain(
+            llm=self.batch_llm,
+            prompt=PromptTemplate(
+                template=self.batch_template,
+                input_variables=["immigrants"],
+                partial_variables={"format_instructions": self.batch_parser.get_format_instructions()}
+            )
+        )
 
     @retry(exceptions=OutputParserException, tries=5)
     async def new_quenta(self, from_country: str, to_country: str) -> Quenta:
@@ -68,3 +90,35 @@ class QuentaSession(SingletonBaseSession):
             Quenta: generated quenta
         """
         return self.quenta_parser.parse(await self.quenta_chain.arun(from_country=from_country, to_country=to_country))
+
+    async def new_quentas(self, moves: list[tuple[str, str]]) -> list[Quenta]:
+        """Generate new quentas in batches.
+
+        Quentas, which have not been generated in batches, are generated one by one.
+
+        Args:
+            moves (list[tuple[str, str]]): countries moved from and to, of every immigrant
+
+        Returns:
+            list[Quenta]: generated quentas, in the order of the moves
+        """
+        quentas = await generate_batch(self._generate_quentas, moves)
+        return [
+            quenta if quenta is not None else await self.new_quenta(from_country, to_country)
+            for quenta, (from_country, to_country) in zip(quentas, moves, strict=True)
+        ]
+
+    async def _generate_quentas(self, moves: list[tuple[str, str]]) -> list[Quenta | None]:
+        """Generate a batch of quentas in a single completion.
+
+        Args:
+            moves (list[tuple[str, str]]): countries moved from and to, of every immigrant
+
+        Returns:
+            list[Quenta | None]: quentas, None in place of the invalid ones
+        """
+        immigrants = "\n".join(
+            f"{i}. An immigrant who has just moved from {from_country} to {to_country}"
+            for i, (from_country, to_country) in enumerate(moves, start=1)
+        )
+        return self.batch_parser.parse(await self.batch_chain.arun(immigrants=immigrants), len(moves))
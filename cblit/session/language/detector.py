@@ -0,0 +1,95 @@
+"""Language detector module.
+
+Tells whether the player has written in Conlang, in English, or in neither, without calling the LLM.
+It is a character n-gram naive Bayes classifier, trained on the known translations of a session.
+"""
+import collections
+import enum
+import math
+import re
+
+# Sizes of the character n-grams the classifier looks at
+NGRAM_SIZES = (1, 2, 3)
+# Minimum share of a text's trigrams seen in either language, below which the text is gibberish
+MIN_COVERAGE = 0.4
+
+WORD_PATTERN = re.compile(r"[^\W\d_]+")
+
+
+class DetectedLanguage(str, enum.Enum):
+    """Language of the player's sentence."""
+    CONLANG = "conlang"
+    ENGLISH = "english"
+    GIBBERISH = "gibberish"
+
+
+def get_ngrams(text: str, size: int) -> list[str]:
+    """Split text into character n-grams of its words, lowercase, with word boundaries as spaces.
+
+    Args:
+        text (str): text to split
+        size (int): n-gram size
+
+    Returns:
+        list[str]: n-grams
+    """
+    padded = f" {' '.join(WORD_PATTERN.findall(text.lower()))} "
+    return [padded[i:i + size] for i in range(len(padded) - size + 1)] if padded.strip() else []
+
+
+class LanguageDetector:
+    """Naive Bayes classifier of English and Conlang by character n-grams."""
+    counts: dict[DetectedLanguage, collections.Counter[str]]
+    totals: collections.Counter[DetectedLanguage]
+    # N-grams seen in either language
+    vocabulary: set[str]
+
+    def __init__(self) -> None:
+        """Initialise a detector, which knows nothing yet."""
+        self.counts = {DetectedLanguage.ENGLISH: collections.Counter(), DetectedLanguage.CONLANG: collections.Counter()}
+        self.totals = collections.Counter()
+        self.vocabulary = set()
+
+    def add(self, english: str, conlang: str) -> None:
+        """Learn from a known translation.
+
+        Untranslated texts, e.g. of the passport, are the same in both languages, and are skipped.
+
+        Args:
+            english (str): text in English
+            conlang (str): the same text in Conlang
+        """
+        if english == conlang:
+            return
+        for language, text in ((DetectedLanguage.ENGLISH, english), (DetectedLanguage.CONLANG, conlang)):
+            for size in NGRAM_SIZES:
+                ngrams = get_ngrams(text, size)
+                self.counts[language].update(ngrams)
+                self.totals[language] += len(ngrams)
+                self.vocabulary.update(ngrams)
+
+    def detect(self, text: str) -> DetectedLanguage:
+        """Detect the language of a text.
+
+        Until the detector has learned both languages, every text is taken for Conlang.
+
+        Args:
+            text (str): text to classify
+
+        Returns:
+            DetectedLanguage: most likely language, gibberish if the text resembles neither
+        """
+        if not self.totals[DetectedLanguage.ENGLISH] or not self.totals[DetectedLanguage.CONLANG]:
+            return DetectedLanguage.CONLANG
+        trigrams = get_ngrams(text, NGRAM_SIZES[-1])
+        if not trigrams:
+            return DetectedLanguage.GIBBERISH
+        if sum(1 for ngram in trigrams if ngram in self.vocabulary) < MIN_COVERAGE * len(trigrams):
+            return DetectedLanguage.GIBBERISH
+        ngrams = [ngram for size in NGRAM_SIZES for ngram in get_ngrams(text, size)]
+        return max(
+            (DetectedLanguage.CONLANG, DetectedLanguage.ENGLISH),
+            # Log-likelihood with add-one smoothing, the shared denominator is taken out of the sum
+            key=lambda language: sum(math.log(self.counts[language].get(ngram, 0) + 1) for ngram in ngrams)
+            - len(ngrams) * math.log(self.totals[language] + len(self.vocabulary))
+        )
@@ -0,0 +1,151 @@
+"""Fallback translator module.
+
+Composes approximate translations locally from the known translations of a session,
+for when the LLM is too slow or unavailable.
+"""
+import collections
+import re
+
+# Longest phrase, in words, looked up as a whole
+MAX_PHRASE_LENGTH = 8
+# Minimum Dice coefficient of a word alignment to be trusted
+MIN_ALIGNMENT_SCORE = 0.3
+
+TOKEN_PATTERN = re.compile(r"[\w'-]+|[^\w\s]")
+
+
+def tokenise(text: str) -> list[str]:
+    """Split text into lowercase words and punctuation.
+
+    Args:
+        text (str): text to split
+
+    Returns:
+        list[str]: tokens
+    """
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def detokenise(tokens: list[str]) -> str:
+    """Join tokens back into text.
+
+    Args:
+        tokens (list[str]): tokens
+
+    Returns:
+        str: text, with no space before punctuation
+    """
+    return re.sub(r" ([^\w\s'-])", r"\1", " ".join(tokens))
+
+
+class WordAlignment:
+    """Word alignment of one language to another, learned from co-occurrences in translated pairs."""
+    # Number of pairs each pair of words has occurred in together
+    cooccurrences: collections.defaultdict[str, collections.Counter[str]]
+    source_counts: collections.Counter[str]
+    target_counts: collections.Counter[str]
+
+    def __init__(self) -> None:
+        """Initialise an empty alignment."""
+        self.cooccurrences = collections.defaultdict(collections.Counter)
+        self.source_counts = collections.Counter()
+        self.target_counts = collections.Counter()
+
+    def add(self, source: list[str], target: list[str]) -> None:
+        """Learn from a translated pair.
+
+        Args:
+            source (list[str]): tokens in the source language
+            target (list[str]): tokens in the target language
+        """
+        source_words = {token for token in source if token[0].isalnum()}
+        target_words = {token for token in target if token[0].isalnum()}
+        self.source_counts.update(source_words)
+        self.target_counts.update(target_words)
+        for word in source_words:
+            self.cooccurrences[word].update(target_words)
+
+    def translate(self, word: str) -> str | None:
+        """Get the best aligned word.
+
+        Args:
+            word (str): word in the source language
+
+        Returns:
+            str | None: word in the target language, None if no alignment is good enough
+        """
+        best_word, best_score = None, MIN_ALIGNMENT_SCORE
+        for target, count in self.cooccurrences.get(word, {}).items():
+            score = 2 * count / (self.source_counts[word] + self.target_counts[target])
+            if score > best_score:
+                best_word, best_score = target, score
+        return best_word
+
+
+class PhraseTranslator:
+    """Translator of one language to another by the longest known phrases, and aligned words otherwise."""
+    phrases: dict[tuple[str, ...], list[str]]
+    alignment: WordAlignment
+
+    def __init__(self) -> None:
+        """Initialise an empty translator."""
+        self.phrases = {}
+        self.alignment = WordAlignment()
+
+    def add(self, source: str, target: str) -> None:
+        """Learn from a translated pair.
+
+        Args:
+            source (str): text in the source language
+            target (str): text in the target language
+        """
+        source_tokens, target_tokens = tokenise(source), tokenise(target)
+        if 0 < len(source_tokens) <= MAX_PHRASE_LENGTH:
+            self.phrases[tuple(source_tokens)] = target_tokens
+        self.alignment.add(source_tokens, target_tokens)
+
+    def translate(self, text: str) -> str:
+        """Translate text, keeping words without a translation, e.g. names, as they are.
+
+        Args:
+            text (str): text in the source language
+
+        Returns:
+            str: approximate text in the target language
+        """
+        tokens = tokenise(text)
+        translation: list[str] = []
+        position = 0
+        while position < len(tokens):
+            for length in range(min(MAX_PHRASE_LENGTH, len(tokens) - position), 0, -1):
+                phrase = self.phrases.get(tuple(tokens[position:position + length]))
+                if phrase is not None:
+                    translation += phrase
+                    position += length
+                    break
+            else:
+                token = tokens[position]
+                translation.append(self.alignment.translate(token) or token)
+                position += 1
+        return detokenise(translation)
+
+
+class FallbackTranslator:
+    """Local translator between English and Conlang, built from the known translations of a session."""
+    to_conlang: PhraseTranslator
+    from_conlang: PhraseTranslator
+
+    def __init__(self) -> None:
+        """Initialise a translator, which knows nothing yet."""
+        self.to_conlang = PhraseTranslator()
+        self.from_conlang = PhraseTranslator()
+
+    def add(self, english: str, conlang: str) -> None:
+        """Learn a known translation.
+
+        Args:
+            english (str): text in English
+            conlang (str): the same text in Conlang
+        """
+        self.to_conlang.add(english, conlang)
+        self.from_conlang.add(conlang, english)
@@ -1,6 +1,7 @@
 """Phrasebook module."""
 from typing import Self
 
+from loguru import logger
 from pydantic import BaseModel, Field
 
 from cblit.session.language.translator import ConlangEntry, TranslatorSession
@@ -47,5 +48,5 @@ class Phrasebook(BaseModel):
 
         phrases = [await translator_session.translate("English", translator_session.conlang_name, phrase)
                    for phrase in phrases_to_translate]
-        print(phrases)
+        logger.bind(stage="phrasebook").debug(f"Translated {len(phrases)} phrasebook phrases")
         return cls(phrases=phrases)
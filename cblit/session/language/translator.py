@@ -1,10 +1,12 @@
 """Langchain conlang translator module."""
+import asyncio
+import dataclasses
 import json
-from typing import Self, cast
+import os
+from typing import Any, ClassVar, Self, cast
 
 import faiss
 from langchain import FAISS, InMemoryDocstore, LLMChain, PromptTemplate
-from langchain.embeddings import OpenAIEmbeddings
 from langchain.llms.base import BaseLLM
 from langchain.memory import VectorStoreRetrieverMemory
 from langchain.output_parsers import PydanticOutputParser
@@ -13,7 +15,14 @@ from pydantic import BaseModel, Field
 from retry import retry
 
 from cblit.cli.session_wrapper import wrap_session_method
-from cblit.llm.llm import get_llm
+from cblit.errors.errors import CblitModelUnavailableError
+from cblit.game.deadline import current_deadline
+from cblit.llm.circuit_breaker import llm_circuit_breaker
+from cblit.llm.llm import get_embeddings, get_llm
+from cblit.llm.tokens import count_text_tokens
+from cblit.metrics import metrics
+from cblit.session.language.detector import LanguageDetector
+from cblit.session.language.fallback import FallbackTranslator
 from cblit.session.session import BaseSession
 
 TRANSLATION_TEMPLATE = """
@@ -29,6 +38,8 @@ Relevant already known translations are provided here:
 
 Translate from {from_language} to {to_language}: "{phrase}"
 """.strip()
+# Time left for a translation, below which the LLM is not even tried, in seconds
+MINIMUM_TRANSLATION_BUDGET = 0.5
 
 
 class ConlangEntry(BaseModel):
@@ -45,20 +56,72 @@ class ConlangEntry(BaseModel):
         return cast(dict[str, str], json.loads(self.json()))
 
 
+class ApproximateConlangEntry(ConlangEntry):
+    """Entry composed locally by the fallback translator, rather than translated by the LLM."""
+
+
+@dataclasses.dataclass
+class RetrievalPolicy:
+    """Size of the phrasebook retrieved into a translation prompt."""
+    # Number of nearest entries considered
+    max_entries: int = 8
+    # Cosine similarity to the phrase, below which an entry is not retrieved
+    min_similarity: float = 0.8
+    # Maximum number of tokens of the retrieved entries, the nearest entry is always retrieved
+    token_budget: int = 150
+
+    @classmethod
+    def from_env(cls) -> "RetrievalPolicy":
+        """Get policy configured by the environment.
+
+        Returns:
+            RetrievalPolicy: policy
+        """
+        return cls(
+            max_entries=int(os.getenv("CBLIT_PHRASEBOOK_MAX_ENTRIES", "8")),
+            min_similarity=float(os.getenv("CBLIT_PHRASEBOOK_MIN_SIMILARITY", "0.8")),
+            token_budget=int(os.getenv("CBLIT_PHRASEBOOK_TOKEN_BUDGET", "150")),
+        )
+
+
 class TranslatorMemory(VectorStoreRetrieverMemory):
-    """Translator memory."""
+    """Translator memory, which retrieves the entries similar to a phrase, within a token budget."""
+    policy: ClassVar[RetrievalPolicy] = RetrievalPolicy.from_env()
+
     def __init__(self) -> None:
         """Initialise translator's memory."""
         embedding_size = 1536  # Dimensions of the OpenAIEmbeddings
         index = faiss.IndexFlatL2(embedding_size)
-        embedding_fn = OpenAIEmbeddings().embed_query  # type: ignore [call-arg]
+        embedding_fn = get_embeddings().embed_query
         vectorstore = FAISS(embedding_fn, index, InMemoryDocstore({}), {})
-
-        # In actual usage, you would set `k` to be a higher value, but we use k=1 to show that
-        # the vector lookup still returns the semantically relevant information
-        retriever = vectorstore.as_retriever(search_kwargs={"k": 3})
+        retriever = vectorstore.as_retriever(search_kwargs={"k": self.policy.max_entries})
         super().__init__(retriever=retriever, memory_key="phrasebook")
 
+    def load_memory_variables(self, inputs: dict[str, Any]) -> dict[str, list[Document] | str]:
+        """Retrieve the nearest entries to the phrase, which are similar enough and fit the token budget.
+
+        Args:
+            inputs (dict[str, Any]): phrase by its language
+
+        Returns:
+            dict[str, list[Document] | str]: retrieved entries, one per line pair
+        """
+        vectorstore = cast(FAISS, self.retriever.vectorstore)
+        query = inputs[self._get_prompt_input_key(inputs)]
+        texts: list[str] = []
+        tokens = 0
+        for document, distance in vectorstore.similarity_search_with_score(query, k=self.policy.max_entries):
+            # OpenAI embeddings are unit-normed, so the squared L2 distance maps onto the cosine similarity
+            similarity = 1.0 - distance / 2
+            entry_tokens = count_text_tokens(document.page_content)
+            if texts and (similarity < self.policy.min_similarity or tokens + entry_tokens > self.policy.token_budget):
+                break
+            texts.append(document.page_content)
+            tokens += entry_tokens
+        metrics.observe("translator.phrasebook_entries", len(texts))
+        metrics.observe("translator.phrasebook_tokens", tokens)
+        return {self.memory_key: "\n".join(texts)}
+
     def save_entry(self, entry: ConlangEntry) -> None:
         """Save conlang entry to the memory.
 
@@ -67,6 +130,18 @@ class TranslatorMemory(VectorStoreRetrieverMemory):
         """
         self.save_context(entry.dict(), {})
 
+    def save_entries(self, entries: list[ConlangEntry]) -> None:
+        """Save many conlang entries to the memory at once, embedding them in a single batch.
+
+        Args:
+            entries (list[ConlangEntry]): entries to save
+        """
+        if not entries:
+            return
+        texts = [document.page_content for entry in entries for document in self._form_documents(entry.dict(), {})]
+        vectorstore = cast(FAISS, self.retriever.vectorstore)
+        vectorstore.add_embeddings(zip(texts, get_embeddings().embed_documents(texts), strict=True))
+
     def get_entries(self, language: str, phrase: str) -> dict[str, list[Document] | str]:
         """Get entries that are relevant.
 
@@ -85,6 +160,11 @@ class TranslatorSession(BaseSession):
     conlang_name: str
     llm: BaseLLM
     memory: TranslatorMemory
+    learned: list[ConlangEntry]
+    # Local translator, learning every known translation, for when the LLM is too slow or unavailable
+    fallback: FallbackTranslator
+    # Local detector of the player's language, learning every known translation
+    detector: LanguageDetector
     translation_parser: PydanticOutputParser[ConlangEntry]
     translator_chain: LLMChain
 
@@ -98,7 +178,11 @@ class TranslatorSession(BaseSession):
         self.conlang_name = conlang_name
         self.memory = TranslatorMemory()
         self.memory.save_context({}, initial_entry.to_dict())
-        self.llm = get_llm(temperature=0.7)
+        self.learned = []
+        self.fallback = FallbackTranslator()
+        self.detector = LanguageDetector()
+        self._learn(initial_entry)
+        self.llm = get_llm(temperature=0.7, stage="translator")
         self.translation_parser = PydanticOutputParser(pydantic_object=ConlangEntry)
         prompt = PromptTemplate(
             template=TRANSLATION_TEMPLATE,
@@ -115,7 +199,6 @@ class TranslatorSession(BaseSession):
         )
         self.translator_chain = LLMChain(
             llm=self.llm,
-            verbose=True,
             prompt=prompt,
         )
 
@@ -126,6 +209,35 @@ class TranslatorSession(BaseSession):
             entry (ConlangEntry): entry to save
         """
         self.memory.save_context({}, entry.to_dict())
+        self._learn(entry)
+
+    def save_translations(self, entries: list[ConlangEntry]) -> None:
+        """Save many known translations at once.
+
+        Args:
+            entries (list[ConlangEntry]): entries to save
+        """
+        self.memory.save_entries(entries)
+        for entry in entries:
+            self._learn(entry)
+
+    def restore_learned(self, entries: list[ConlangEntry]) -> None:
+        """Restore translations learned during a previous session.
+
+        Args:
+            entries (list[ConlangEntry]): learned entries, in the order they were learned
+        """
+        self.save_translations(entries)
+        self.learned.extend(entries)
+
+    def _learn(self, entry: ConlangEntry) -> None:
+        """Teach the local translator and language detector a known translation.
+
+        Args:
+            entry (ConlangEntry): known translation
+        """
+        self.fallback.add(entry.english, entry.conlang)
+        self.detector.add(entry.english, entry.conlang)
 
     async def generate(self) -> Self:
         """Nothing to explicitly generate."""
@@ -136,6 +248,32 @@ class TranslatorSession(BaseSession):
     async def translate(self, from_language: str, to_language: str, phrase: str) -> ConlangEntry:
         """Translate phrases from one language to another.
 
+        Within a turn, if the LLM is unavailable or does not translate within the translation target,
+        an approximate translation is composed locally instead.
+
+        Args:
+            from_language (str): language to translate from
+            to_language (str): language to translate to
+            phrase (str): phrase to translate
+
+        Returns:
+            ConlangEntry: entry in conlang dictionary with the phrase in English and Conlang,
+                `ApproximateConlangEntry` if it has been composed locally
+        """
+        deadline = current_deadline.get()
+        if deadline is None:
+            return await self._translate_with_llm(from_language, to_language, phrase)
+        budget = min(deadline.translation_target, deadline.remaining())
+        if budget < MINIMUM_TRANSLATION_BUDGET or llm_circuit_breaker.is_open():
+            return self._translate_locally(from_language, phrase)
+        try:
+            return await asyncio.wait_for(self._translate_with_llm(from_language, to_language, phrase), budget)
+        except (TimeoutError, CblitModelUnavailableError):
+            return self._translate_locally(from_language, phrase)
+
+    async def _translate_with_llm(self, from_language: str, to_language: str, phrase: str) -> ConlangEntry:
+        """Translate phrases from one language to another with the LLM, and remember the translation.
+
         Args:
             from_language (str): language to translate from
             to_language (str): language to translate to
@@ -152,9 +290,26 @@ class TranslatorSession(BaseSession):
             phrase=phrase
         ))
         self.memory.save_entry(entry)
+        self.learned.append(entry)
+        self._learn(entry)
 
         return entry
 
+    def _translate_locally(self, from_language: str, phrase: str) -> ApproximateConlangEntry:
+        """Compose an approximate translation from the known ones, which is not remembered.
+
+        Args:
+            from_language (str): language to translate from
+            phrase (str): phrase to translate
+
+        Returns:
+            ApproximateConlangEntry: approximate entry
+        """
+        metrics.increment("translator.approximate_translations")
+        if from_language == "English":
+            return ApproximateConlangEntry(english=phrase, conlang=self.fallback.to_conlang.translate(phrase))
+        return ApproximateConlangEntry(english=self.fallback.from_conlang.translate(phrase), conlang=phrase)
+
     @wrap_session_method()
     async def translate_to_conlang(self, phrase: str) -> str:
         """Translate a phrase from English to Conlang.
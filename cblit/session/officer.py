@@ -6,11 +6,13 @@ from typing import Self
 from langchain import ConversationChain, PromptTemplate
 from langchain.memory import ConversationBufferMemory
 from langchain.schema import OutputParserException
+from pydantic import BaseModel
 from retry import retry
 
 from cblit.cli.session_wrapper import wrap_session_method
 from cblit.llm.llm import get_llm
 from cblit.session.immigrant.document import Document
+from cblit.session.registration import RegistrationStep, RegistrationTracker
 from cblit.session.session import BaseSession
 
 OFFICER_PROMPT = (
@@ -20,21 +22,41 @@ OFFICER_PROMPT = (
 )
 IMMIGRANT_PROMPT = "Pretend that I, a recent migrant, walk in, and approach your window."
 REGISTRATION_PROCESS_PROMPT = "For an immigrant registration the procedure is as follows:"
-REGISTRATION_STEPS_PROMPTS = [
-    "Greeting and ask for what the purpose is. Confirm that this is for the registration.",
-    "Ask for the name and identity documents",
-    "If the identity documents are alright, scan them for filing",
-    "Ask for a reason to immigrate",
-    "If it is for work, ask for the work permit and employment contract",
-    "Ask for the postal address",
-    "Thank them and tell that they will receive the residence permit via post in 14 to 21 days",
-    'Say "%%SUCCESS%%" when finished'
-]
+REGISTRATION_STEPS_PROMPTS = {
+    RegistrationStep.PURPOSE: "Greeting and ask for what the purpose is. Confirm that this is for the registration.",
+    RegistrationStep.IDENTITY: "Ask for the name and identity documents",
+    RegistrationStep.SCAN: "If the identity documents are alright, scan them for filing",
+    RegistrationStep.REASON: "Ask for a reason to immigrate",
+    RegistrationStep.WORK_DOCUMENTS: "If it is for work, ask for the work permit and employment contract",
+    RegistrationStep.ADDRESS: "Ask for the postal address",
+    RegistrationStep.FAREWELL: (
+        "Thank them and tell that they will receive the residence permit via post in 14 to 21 days"
+    ),
+}
+EARLIER_STEPS_PROMPT = "The earlier steps are done."
+# Marker of the finished registration, a fallback for a farewell the registration tracker does not recognise
+SUCCESS_MARKER = "%%SUCCESS%%"
+SUCCESS_PROMPT = f'Say "{SUCCESS_MARKER}" when finished'
 DIALOG_PROMPT = "This will be a dialog. Reply one phrase at a time please."
+GIVE_DOCUMENT_PROMPT = "[I give the following document]"
+
+
+def get_registration_steps(step: RegistrationStep) -> str:
+    """Get the steps of the registration procedure at hand, the current one and the next one.
+
+    Args:
+        step (RegistrationStep): current step
+
+    Returns:
+        str: numbered steps
+    """
+    step = min(step, RegistrationStep.FAREWELL)
+    steps = [f"{shown + 1}. {prompt}" for shown, prompt in REGISTRATION_STEPS_PROMPTS.items() if 0 <= shown - step <= 1]
+    return "\n".join([EARLIER_STEPS_PROMPT, *steps] if step > RegistrationStep.PURPOSE else steps)
 
 
 class OfficerPromptTemplate(PromptTemplate):
-    """Langchain prompt template for the officer."""
+    """Langchain prompt template for the officer, with only the registration steps at hand."""
 
     @staticmethod
     def get_template() -> str:
@@ -43,18 +65,22 @@ class OfficerPromptTemplate(PromptTemplate):
         Returns:
             str: template string
         """
-        registration_steps = "\n".join([f"{i + 1}. {step}" for i, step in enumerate(REGISTRATION_STEPS_PROMPTS)])
         return "\n".join([
             OFFICER_PROMPT,
             IMMIGRANT_PROMPT,
             "",
             REGISTRATION_PROCESS_PROMPT,
-            registration_steps,
+            "{registration_steps}",
+            SUCCESS_PROMPT,
             DIALOG_PROMPT
         ])
 
-    def __init__(self) -> None:
-        """Initialise officer prompt template."""
+    def __init__(self, registration: RegistrationTracker) -> None:
+        """Initialise officer prompt template.
+
+        Args:
+            registration (RegistrationTracker): tracker of the registration step, read on every turn
+        """
         template = self.get_template() + """
 
 Current conversation:
@@ -62,7 +88,17 @@ Current conversation:
 Visitor: {input}
 Officer:
 """
-        super().__init__(input_variables=["history", "input"], template=template)
+        super().__init__(
+            input_variables=["history", "input"],
+            partial_variables={"registration_steps": lambda: get_registration_steps(registration.step)},
+            template=template
+        )
+
+
+class OfficerTurn(BaseModel):
+    """A single exchange between the visitor and the officer."""
+    visitor: str
+    officer: str
 
 
 class LanguageUnderstanding(Enum):
@@ -76,17 +112,20 @@ class LanguageUnderstanding(Enum):
 class OfficerSession(BaseSession):
     """Officer session."""
     conversation: ConversationChain
+    memory: ConversationBufferMemory
+    registration: RegistrationTracker
 
     def __init__(self) -> None:
         """Initialise officer session."""
+        self.registration = RegistrationTracker()
+        self.memory = ConversationBufferMemory(
+            human_prefix="Visitor",
+            ai_prefix="Officer"
+        )
         self.conversation = ConversationChain(
-            llm=get_llm(temperature=0),
-            verbose=True,
-            memory=ConversationBufferMemory(
-                human_prefix="Visitor",
-                ai_prefix="Officer"
-            ),
-            prompt=OfficerPromptTemplate(),
+            llm=get_llm(temperature=0, stage="officer"),
+            memory=self.memory,
+            prompt=OfficerPromptTemplate(self.registration),
         )
 
     async def generate(self) -> Self:
@@ -99,6 +138,41 @@ class OfficerSession(BaseSession):
         """
         return self
 
+    def history(self) -> list[OfficerTurn]:
+        """Get the conversation history with the officer.
+
+        Returns:
+            list[OfficerTurn]: exchanges in the order they happened
+        """
+        messages = self.memory.chat_memory.messages
+        return [
+            OfficerTurn(visitor=visitor.content, officer=officer.content)
+            for visitor, officer in zip(messages[::2], messages[1::2], strict=False)
+        ]
+
+    def restore_history(self, turns: list[OfficerTurn]) -> None:
+        """Restore the conversation history without calling the LLM.
+
+        Args:
+            turns (list[OfficerTurn]): exchanges to put into the officer's memory
+        """
+        chat_memory = self.memory.chat_memory
+        for turn in turns:
+            chat_memory.add_user_message(turn.visitor)
+            chat_memory.add_ai_message(turn.officer)
+            self._track(turn)
+
+    def _track(self, turn: OfficerTurn) -> None:
+        """Advance the registration by an exchange.
+
+        Args:
+            turn (OfficerTurn): exchange with the officer
+        """
+        if turn.visitor.startswith(GIVE_DOCUMENT_PROMPT):
+            # The document representation, which follows the prompt, starts with the document name
+            self.registration.give_document(turn.visitor.splitlines()[1])
+        self.registration.hear_officer(turn.officer)
+
     @wrap_session_method()
     @retry(exceptions=OutputParserException, tries=5)
     async def say(self, saying: str, language: LanguageUnderstanding) -> str:
@@ -119,7 +193,9 @@ class OfficerSession(BaseSession):
         elif language == LanguageUnderstanding.NON_NATIVE:
             understanding_prompt = "speaks not in your native language, you understand about 5% of what is said"
         prompt = f"<{understanding_prompt}> {saying}"
-        return await self.conversation.apredict(input=prompt)
+        reply = await self.conversation.apredict(input=prompt)
+        self._track(OfficerTurn(visitor=prompt, officer=reply))
+        return reply
 
     @retry(exceptions=OutputParserException, tries=5)
     async def give_document(self, document: Document) -> str:
@@ -131,6 +207,7 @@ class OfficerSession(BaseSession):
         Returns:
             str: officer's response
         """
-        prompt = f"[I give the following document]\n{document.officer_representation}"
-
-        return await self.conversation.apredict(input=prompt)
+        prompt = f"{GIVE_DOCUMENT_PROMPT}\n{document.officer_representation}"
+        reply = await self.conversation.apredict(input=prompt)
+        self._track(OfficerTurn(visitor=prompt, officer=reply))
+        return reply
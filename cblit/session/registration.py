@@ -0,0 +1,148 @@
+"""Registration module.
+
+Tracks the step of the registration procedure the player has reached, from the officer's replies and the documents
+given, without calling the LLM. The officer is only prompted with the steps at hand, and the registration is known
+to be complete without the officer having to mark it. Wording the tracker does not recognise never stalls the game:
+documents given and the number of replies at a step advance the procedure as well.
+"""
+import enum
+import re
+
+
+class RegistrationStep(enum.IntEnum):
+    """Step of the registration procedure, in order."""
+    PURPOSE = 0
+    IDENTITY = 1
+    SCAN = 2
+    REASON = 3
+    WORK_DOCUMENTS = 4
+    ADDRESS = 5
+    FAREWELL = 6
+    DONE = 7
+
+
+# Steps the officer carries out by saying something, recognised by what the officer says
+OFFICER_STEP_PATTERNS = {
+    RegistrationStep.PURPOSE: re.compile(r"regist", re.IGNORECASE),
+    RegistrationStep.IDENTITY: re.compile(r"\bname\b|passport|identi|\bID\b", re.IGNORECASE),
+    RegistrationStep.REASON: re.compile(r"\breason|\bwhy\b", re.IGNORECASE),
+    RegistrationStep.ADDRESS: re.compile(r"address", re.IGNORECASE),
+    RegistrationStep.FAREWELL: re.compile(r"residen(ce|t) permit|\b14\b.*\b21\b", re.IGNORECASE | re.DOTALL),
+}
+# Steps, which are only done once the player has given all of the documents
+REQUIRED_DOCUMENTS = {
+    RegistrationStep.SCAN: {"Passport"},
+    RegistrationStep.WORK_DOCUMENTS: {"Work Permit", "Employment Agreement"},
+}
+# Documents, which answer the officer's question of a step
+ANSWERING_DOCUMENTS = {
+    RegistrationStep.ADDRESS: {"Tenancy Agreement"},
+}
+# Officer's replies at a step, after which the step is taken for done in words the patterns do not recognise
+STALLED_REPLIES_LIMIT = 3
+
+
+class RegistrationTracker:
+    """State machine of the registration procedure.
+
+    The officer is only prompted with the current and the next steps, so a reply is taken to carry out either of
+    them, which implies the steps before. Mentions of further steps, e.g. of the residence permit in the greeting,
+    are ignored, and so is the farewell until it is the current step. Steps requiring documents are never skipped.
+
+    A document of the current or the next step means that the officer has asked for it, so the steps before are done.
+    An officer's step, which has not been recognised in `STALLED_REPLIES_LIMIT` replies, is taken for done,
+    except for the farewell, which the officer marks instead if it is worded differently.
+    """
+    # Furthest step the officer has been heard carrying out, if any
+    officer_step: RegistrationStep | None
+    # Names of the documents given
+    documents: set[str]
+    # Officer's replies since the current step has been reached
+    stalled_replies: int
+
+    def __init__(self) -> None:
+        """Initialise a tracker at the start of the procedure."""
+        self.officer_step = None
+        self.documents = set()
+        self.stalled_replies = 0
+
+    def give_document(self, name: str) -> None:
+        """Record a document given to the officer.
+
+        Args:
+            name (str): document name
+        """
+        current_step = self.step
+        self.documents.add(name)
+        for step, documents in (REQUIRED_DOCUMENTS | ANSWERING_DOCUMENTS).items():
+            if name in documents and step <= current_step + 1:
+                self._carry_out(RegistrationStep(step - 1))
+        if self.step != current_step:
+            self.stalled_replies = 0
+
+    def hear_officer(self, reply: str) -> None:
+        """Record the officer's reply.
+
+        Args:
+            reply (str): officer's reply in English
+        """
+        current_step = self.step
+        # Patterns are checked in order, so that a reply can carry out the current step and then the next one
+        for step, pattern in OFFICER_STEP_PATTERNS.items():
+            # The farewell completes the registration, so it is only taken once every other step is done
+            furthest = self.step if step == RegistrationStep.FAREWELL else self.step + 1
+            if pattern.search(reply) and step <= furthest:
+                self._carry_out(step)
+        if self.step != current_step:
+            self.stalled_replies = 0
+            return
+        self.stalled_replies += 1
+        if (
+            self.stalled_replies >= STALLED_REPLIES_LIMIT
+            and current_step in OFFICER_STEP_PATTERNS
+            and current_step != RegistrationStep.FAREWELL
+        ):
+            self._carry_out(current_step)
+            self.stalled_replies = 0
+
+    def _carry_out(self, step: RegistrationStep) -> None:
+        """Record that the officer has carried out a step, and so the steps before.
+
+        Args:
+            step (RegistrationStep): step carried out
+        """
+        if self.officer_step is None or step > self.officer_step:
+            self.officer_step = step
+
+    def is_done(self, step: RegistrationStep) -> bool:
+        """Check whether a step of the procedure is done.
+
+        Args:
+            step (RegistrationStep): step to check
+
+        Returns:
+            bool: whether the step is done
+        """
+        if step in REQUIRED_DOCUMENTS:
+            return REQUIRED_DOCUMENTS[step] <= self.documents
+        if step in ANSWERING_DOCUMENTS and ANSWERING_DOCUMENTS[step] <= self.documents:
+            return True
+        return self.officer_step is not None and step <= self.officer_step
+
+    @property
+    def step(self) -> RegistrationStep:
+        """Get the current step, the first one not done yet.
+
+        Returns:
+            RegistrationStep: current step, `RegistrationStep.DONE` if the procedure is complete
+        """
+        return next((step for step in RegistrationStep if not self.is_done(step)), RegistrationStep.DONE)
+
+    @property
+    def is_complete(self) -> bool:
+        """Check whether the registration is complete.
+
+        Returns:
+            bool: whether every step is done
+        """
+        return self.step == RegistrationStep.DONE
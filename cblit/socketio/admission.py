@@ -0,0 +1,132 @@
+"""Admission control module.
+
+New players are only admitted while the LLM backend keeps up, so that active players keep their latency target.
+The rest wait in a waiting room, in the order they have connected.
+"""
+import collections
+import dataclasses
+
+from cblit.metrics import metrics
+
+# Weight of the latest observation in the turn latency average
+LATENCY_SMOOTHING = 0.2
+
+
+@dataclasses.dataclass
+class AdmissionPolicy:
+    """Thresholds of admitting new players."""
+    # Maximum number of turns and game starts waiting for the LLM at the same time
+    max_turns_in_flight: int = 8
+    # Average turn latency above which no new players are admitted while turns are in flight, in seconds
+    latency_target: float = 20.0
+    # Maximum number of players in the waiting room, the rest are turned away
+    max_waiting: int = 100
+
+
+class AdmissionController:
+    """Admission controller, which keeps the waiting room of new players."""
+    policy: AdmissionPolicy
+    # Exponential moving average of turn latency, in seconds
+    latency: float | None
+    # Waiting session IDs, mapped to whether they use the batched protocol
+    waiting: collections.OrderedDict[str, bool]
+
+    def __init__(self, policy: AdmissionPolicy) -> None:
+        """Initialise with an empty waiting room.
+
+        Args:
+            policy (AdmissionPolicy): admission thresholds
+        """
+        self.policy = policy
+        self.latency = None
+        self.waiting = collections.OrderedDict()
+
+    def observe_latency(self, seconds: float) -> None:
+        """Observe latency of a finished turn.
+
+        Args:
+            seconds (float): turn duration
+        """
+        if self.latency is None:
+            self.latency = seconds
+        else:
+            self.latency += LATENCY_SMOOTHING * (seconds - self.latency)
+        metrics.set_gauge("admission.latency", self.latency)
+
+    def is_saturated(self, turns_in_flight: int) -> bool:
+        """Check whether the LLM backend is too busy to take a new player.
+
+        Args:
+            turns_in_flight (int): number of turns and game starts waiting for the LLM
+
+        Returns:
+            bool: whether new players should wait
+        """
+        if turns_in_flight >= self.policy.max_turns_in_flight:
+            return True
+        # Latency is only trusted while there is work in flight, otherwise nothing would ever update it
+        return turns_in_flight > 0 and self.latency is not None and self.latency > self.policy.latency_target
+
+    def enqueue(self, session_id: str, batched: bool) -> bool:
+        """Put a new player into the waiting room.
+
+        Args:
+            session_id (str): session ID of the player
+            batched (bool): whether the client uses the batched protocol
+
+        Returns:
+            bool: whether the player has been let in, False if the waiting room is full
+        """
+        if len(self.waiting) >= self.policy.max_waiting:
+            metrics.increment("admission.rejected")
+            return False
+        self.waiting[session_id] = batched
+        metrics.increment("admission.waited")
+        self._report()
+        return True
+
+    def leave(self, session_id: str) -> None:
+        """Take a player, who has disconnected, out of the waiting room.
+
+        Args:
+            session_id (str): session ID of the player
+        """
+        if self.waiting.pop(session_id, None) is not None:
+            metrics.increment("admission.abandoned")
+            self._report()
+
+    def admit(self, turns_in_flight: int) -> list[tuple[str, bool]]:
+        """Take players out of the waiting room, while the LLM backend has spare capacity.
+
+        Each admitted player is assumed to start a game, taking a turn in flight.
+
+        Args:
+            turns_in_flight (int): number of turns and game starts waiting for the LLM
+
+        Returns:
+            list[tuple[str, bool]]: admitted session IDs and whether they use the batched protocol
+        """
+        admitted: list[tuple[str, bool]] = []
+        while self.waiting and not self.is_saturated(turns_in_flight + len(admitted)):
+            admitted.append(self.waiting.popitem(last=False))
+        if admitted:
+            metrics.increment("admission.admitted", len(admitted))
+            self._report()
+        return admitted
+
+    def estimated_start(self, position: int) -> float:
+        """Estimate how long a player in the waiting room is going to wait.
+
+        Args:
+            position (int): zero-based position in the waiting room
+
+        Returns:
+            float: estimated wait, in seconds
+        """
+        latency = self.latency if self.latency is not None else self.policy.latency_target
+        # A turn slot is expected to free up every latency / max_turns_in_flight seconds
+        return (position + 1) * latency / self.policy.max_turns_in_flight
+
+    def _report(self) -> None:
+        """Report waiting room size."""
+        metrics.set_gauge("admission.waiting", len(self.waiting))
@@ -1,54 +1,152 @@
 """Game module."""
 import asyncio
-from collections.abc import Coroutine
+import contextlib
+import secrets
+import time
+from collections.abc import Coroutine, Iterator
 from typing import Any
 
 import socketio
+from loguru import logger
 
+from cblit.errors.errors import CblitModelUnavailableError, CblitTimeoutError
+from cblit.game.corpus import PregeneratedCorpus
+from cblit.game.deadline import DeadlinePolicy, turn_deadline
 from cblit.game.game import Game
-from cblit.game.pregenerated_game import PregeneratedGame
-from cblit.session.country import Country
+from cblit.game.journal import JournalEntry, JournalEntryKind, JournalWriter, recording_turn
+from cblit.game.snapshot import GameSnapshot
+from cblit.game.state_backend import InMemorySessionStateBackend, SessionStateBackend
+from cblit.game.warm_pool import WarmGamePool
+from cblit.metrics import metrics
+from cblit.socketio.admission import AdmissionController, AdmissionPolicy
 from cblit.socketio.messages import (
-    BriefPayload,
-    DocumentPayload,
-    DocumentsPayload,
+    NO_WAIT_PAYLOAD,
+    WAIT_PAYLOAD,
     ErrorPayload,
+    ResumePayload,
     SayPayload,
-    WaitPayload,
+    TurnPayload,
+    WaitingRoomPayload,
     WinPayload,
+    encode_init_payload,
+    encode_json,
+    get_static_payloads,
 )
+from cblit.socketio.task_registry import TaskRegistry
+from cblit.socketio.turn_queue import Turn, TurnPolicy, TurnQueue
 
 MODEL_NOT_AVAILABLE = (
     "The language model is currently unavailable. Try again later.\n"
     "If the model has not been used in a while, starting it up may take up to 10 minutes."
 )
-
-
-def aiorun(coroutine: Coroutine[Any, Any, Any]) -> None:
-    """Run a coroutine to completion.
-
-    Args:
-        coroutine (Coroutine): coroutine to run
-    """
-    asyncio.get_running_loop().create_task(coroutine)
+# Seconds a disconnected session is kept alive, waiting for the client to reconnect
+RESUME_GRACE_PERIOD = 300.0
+# The server is considered idle while no more than this many turns are in flight
+IDLE_TURNS_IN_FLIGHT = 1
+SERVER_FULL = "The server is full at the moment. Try again later."
+# Error code of a turn, which has not finished in time, the game can go on after it
+TIMEOUT_ERROR_CODE = 408
+# Error code of the language model being unavailable, the game can go on once it is back
+MODEL_NOT_AVAILABLE_CODE = 503
+SERVER_RESTARTING = "The server is restarting. Reconnect to go on with your game."
+# Error code of the server draining before a restart, the game can be resumed on reconnect
+SERVER_RESTARTING_CODE = 503
+# Time between checks for idle sessions to hibernate, in seconds
+HIBERNATION_CHECK_INTERVAL = 10.0
 
 
 class GameSession:
     """Game session."""
     session_id: str
+    # Secret token the client presents to resume the session after reconnecting
+    token: str
     _game: Game | None = None
-
-    def __init__(self, session_id: str) -> None:
+    # Scheduled expiry of a disconnected session
+    expiry: asyncio.TimerHandle | None = None
+    # Whether the client uses the batched protocol, with single 'init' and 'turn' events
+    batched: bool = False
+    # Turns of the session, run one at a time
+    turns: TurnQueue
+    # Monotonic time of the client's last event
+    last_active: float
+    # Snapshot of a hibernating game, which has been released from memory until the next event
+    hibernated: str | None = None
+    # Whether the game is still being initialised and started, outside the turn queue
+    creating: bool = False
+
+    def __init__(
+            self,
+            session_id: str,
+            game: Game | None = None,
+            token: str | None = None,
+            turns: TurnQueue | None = None
+    ) -> None:
         """Initialise session.
 
         Args:
             session_id (str): socket.io session ID
+            game (Game | None): already initialised game, if any
+            token (str | None): resume token of a restored session, a new one is issued if not set
+            turns (TurnQueue | None): queue to run the session's turns in, a serialising one if not set
         """
         self.session_id = session_id
+        self._game = game
+        self.token = token if token is not None else secrets.token_urlsafe(16)
+        self.turns = turns if turns is not None else TurnQueue()
+        self.last_active = time.monotonic()
+
+    async def initialise(self, corpus: PregeneratedCorpus) -> None:
+        """Asynchronously initialise.
+
+        Args:
+            corpus (PregeneratedCorpus): corpus to draw the game from
+        """
+        self._game = (await corpus.pick()).to_game()
+
+    @property
+    def is_initialised(self) -> bool:
+        """Check whether the game is initialised.
+
+        Returns:
+            bool: whether there is a game instance, a hibernating game is not
+        """
+        return self._game is not None
+
+    def can_hibernate(self, idle_time: float) -> bool:
+        """Check whether the session has been idle long enough to hibernate.
+
+        Only games built from pregenerated ones can hibernate, as they are restored from their snapshots.
+
+        Args:
+            idle_time (float): time since the last event, after which a session hibernates, in seconds
+
+        Returns:
+            bool: whether the session can hibernate now
+        """
+        return (
+            self._game is not None
+            and self._game.pregenerated_game_id is not None
+            and not self.creating
+            and self.turns.is_idle
+            and time.monotonic() - self.last_active >= idle_time
+        )
+
+    def hibernate(self) -> None:
+        """Release the game from memory, keeping only its snapshot."""
+        self.hibernated = GameSnapshot.from_game(self.game).dumps()
+        self._game = None
 
-    async def initialise(self) -> None:
-        """Asynchronously initialise."""
-        self._game = PregeneratedGame.get_random().to_game()
+    async def wake(self) -> None:
+        """Restore a hibernating game from its snapshot, if the session hibernates."""
+        if self.hibernated is None:
+            return
+        start_time = time.perf_counter()
+        game = await GameSnapshot.loads(self.hibernated).ato_game()
+        # Another event might have woken the session meanwhile
+        if self.hibernated is not None:
+            self._game, self.hibernated = game, None
+            metrics.increment("sessions.woken")
+            metrics.observe("sessions.wake_seconds", time.perf_counter() - start_time)
 
     @property
     def game(self) -> Game:
@@ -76,15 +174,59 @@ class GameSessionManager:
     Class that manages mapping between socket.io sessions and game sessions.
     """
     server: socketio.AsyncServer
-    sessions: dict[str, GameSession] = {}
-
-    def __init__(self, server: socketio.AsyncServer) -> None:
+    state_backend: SessionStateBackend
+    corpus: PregeneratedCorpus
+    warm_pool: WarmGamePool | None
+    # Policy of handling turns submitted while another turn of the same session is in flight
+    turn_policy: TurnPolicy = TurnPolicy.SERIALIZE
+    # Number of turns and game starts currently waiting for the LLM
+    turns_in_flight: int
+    # Admission control of new players, holding the waiting room
+    admission: AdmissionController
+    # Timeouts of turns and their LLM stages
+    deadline_policy: DeadlinePolicy = DeadlinePolicy()
+    # Journal to record turns of every session in, if any
+    journal: JournalWriter | None = None
+    # Time since the last event, after which a session hibernates, in seconds, sessions never hibernate if not set
+    hibernate_after: float | None = None
+    _hibernation_task: asyncio.Task[None] | None = None
+    # Background tasks, held until they finish
+    tasks: TaskRegistry
+    # Whether the server is stopping, new games and turns are turned away meanwhile
+    draining: bool
+    # Game creation tasks in progress, by socket.io session ID
+    creations: dict[str, asyncio.Task[None]]
+    # Connected sessions by socket.io session ID
+    sessions: dict[str, GameSession]
+    # Sessions held by this worker, both connected and waiting for a reconnect, by resume token
+    tokens: dict[str, GameSession]
+
+    def __init__(
+            self,
+            server: socketio.AsyncServer,
+            state_backend: SessionStateBackend | None = None,
+            corpus: PregeneratedCorpus | None = None,
+            warm_pool: WarmGamePool | None = None
+    ) -> None:
         """Initialise with socket.io server.
 
         Args:
             server (socketio.AsyncServer): server to use
+            state_backend (SessionStateBackend | None): backend to persist session state in, in-memory if not set
+            corpus (PregeneratedCorpus | None): corpus to draw new games from, the default one if not set
+            warm_pool (WarmGamePool | None): pool of ready games to take new games from, if any
         """
         self.server = server
+        self.state_backend = state_backend if state_backend is not None else InMemorySessionStateBackend()
+        self.corpus = corpus if corpus is not None else PregeneratedCorpus()
+        self.warm_pool = warm_pool
+        self.turns_in_flight = 0
+        self.admission = AdmissionController(AdmissionPolicy())
+        self.tasks = TaskRegistry()
+        self.draining = False
+        self.creations = {}
+        self.sessions = {}
+        self.tokens = {}
 
     def get_session(self, session_id: str) -> GameSession:
         """Get session by session ID.
@@ -102,6 +244,230 @@ class GameSessionManager:
             raise Exception(f"'{session_id}' game session does not exist")
         return self.sessions[session_id]
 
+    @contextlib.contextmanager
+    def track_turn(self) -> Iterator[None]:
+        """Track a turn in flight for the duration of the context.
+
+        When the turn finishes, waiting players are admitted if there is spare capacity now.
+        """
+        self.turns_in_flight += 1
+        start_time = time.monotonic()
+        try:
+            yield
+        finally:
+            self.turns_in_flight -= 1
+            self.admission.observe_latency(time.monotonic() - start_time)
+            self.admit_waiting()
+
+    @contextlib.contextmanager
+    def journal_turn(
+            self,
+            session: GameSession,
+            kind: JournalEntryKind,
+            turn_input: str | None,
+            difficulty: str | None
+    ) -> Iterator[None]:
+        """Record a turn within the context in the journal, if there is one.
+
+        Args:
+            session (GameSession): session of the turn
+            kind (JournalEntryKind): kind of the turn
+            turn_input (str | None): player's sentence, or given document index
+            difficulty (str | None): current difficulty
+        """
+        if self.journal is None:
+            yield
+            return
+        entry = JournalEntry(
+            session_id=session.session_id, kind=kind, time=time.time(), input=turn_input, difficulty=difficulty
+        )
+        try:
+            with recording_turn(entry):
+                yield
+        finally:
+            if session.is_initialised:
+                entry.pregenerated_game_id = session.game.pregenerated_game_id
+                entry.won = session.game.won
+            self.journal.append(entry)
+
+    def journal_resume(self, session: GameSession) -> None:
+        """Record a resumed session in the journal, if there is one, with the snapshot to replay its turns from.
+
+        Args:
+            session (GameSession): resumed session
+        """
+        if self.journal is None:
+            return
+        snapshot = GameSnapshot.from_game(session.game)
+        self.journal.append(JournalEntry(
+            session_id=session.session_id,
+            kind=JournalEntryKind.RESUME,
+            time=time.time(),
+            pregenerated_game_id=snapshot.pregenerated_game_id,
+            snapshot=snapshot.dumps(),
+            won=session.game.won,
+        ))
+
+    def admit_waiting(self) -> None:
+        """Start games of waiting players, while the LLM backend has spare capacity."""
+        if self.draining:
+            return
+        for session_id, batched in self.admission.admit(self.turns_in_flight):
+            self.run_creation(session_id, self._create_session(session_id, None, batched, admitted=True))
+        if self.admission.waiting:
+            self.tasks.spawn(self.send_waiting_positions())
+
+    async def enter_waiting_room(self, session_id: str, batched: bool) -> None:
+        """Put a new player into the waiting room, or turn them away if it is full.
+
+        Args:
+            session_id (str): session ID of the player
+            batched (bool): whether the client uses the batched protocol
+        """
+        if not self.admission.enqueue(session_id, batched):
+            await self.send_error(session_id, SERVER_FULL)
+            return
+        await self.send_waiting_position(session_id, len(self.admission.waiting) - 1)
+
+    async def send_waiting_position(self, session_id: str, position: int) -> None:
+        """Send a waiting player their position and estimated start time.
+
+        Args:
+            session_id (str): session ID of the player
+            position (int): zero-based position in the waiting room
+        """
+        await self.server.emit(
+            "wait",
+            encode_json(WaitingRoomPayload(
+                wait=True,
+                position=position + 1,
+                estimated_start=round(self.admission.estimated_start(position), 1)
+            )),
+            session_id
+        )
+
+    async def send_waiting_positions(self) -> None:
+        """Send all waiting players their updated positions."""
+        await asyncio.gather(*(
+            self.send_waiting_position(session_id, position)
+            for position, session_id in enumerate(self.admission.waiting)
+        ))
+
+    def is_idle(self) -> bool:
+        """Check whether the server has spare capacity for background LLM work.
+
+        Returns:
+            bool: whether the server is idle
+        """
+        return self.turns_in_flight <= IDLE_TURNS_IN_FLIGHT
+
+    def active_players(self) -> int:
+        """Get number of connected players.
+
+        Returns:
+            int: number of players
+        """
+        return len(self.sessions)
+
+    async def save_session(self, session_id: str) -> None:
+        """Persist session state to the state backend, so that it can be resumed by any worker.
+
+        Args:
+            session_id (str): session ID
+        """
+        session = self.get_session(session_id)
+        await self.state_backend.save(session.token, GameSnapshot.from_game(session.game))
+
+    async def try_save_session(self, session_id: str) -> None:
+        """Persist session state, logging a failure instead of raising it.
+
+        The game goes on in this worker if its state cannot be saved, it is only lost to the other workers
+        until the next save succeeds.
+
+        Args:
+            session_id (str): session ID
+        """
+        try:
+            await self.save_session(session_id)
+        except Exception as error:
+            metrics.increment("sessions.save_errors")
+            logger.error(f"Could not save session {session_id}: {error}")
+
+    async def resume_session(self, session_id: str, token: str) -> GameSession | None:
+        """Reattach a game session to a reconnected client.
+
+        The session is taken from this worker if it is still alive, or restored from its snapshot otherwise.
+
+        Args:
+            session_id (str): new session ID of the client
+            token (str): resume token presented by the client
+
+        Returns:
+            GameSession | None: resumed session, None if there is nothing to resume
+        """
+        session = self.tokens.get(token)
+        if session is None:
+            snapshot = await self.state_backend.load(token)
+            if snapshot is None:
+                return None
+            session = GameSession(session_id, await snapshot.ato_game(), token, self.new_turn_queue())
+            self.tokens[token] = session
+        session.last_active = time.monotonic()
+        await session.wake()
+        if session.expiry is not None:
+            session.expiry.cancel()
+            session.expiry = None
+        # The client might have reconnected before its previous connection was closed
+        if self.sessions.get(session.session_id) is session:
+            del self.sessions[session.session_id]
+        session.session_id = session_id
+        self.sessions[session_id] = session
+        return session
+
+    def detach_session(self, session_id: str) -> None:
+        """Detach game session of a disconnected client, keeping it alive for the grace period.
+
+        LLM work started for the client is cancelled, as nobody is waiting for its result anymore.
+
+        Args:
+            session_id (str): session ID of the disconnected client
+        """
+        creation = self.creations.pop(session_id, None)
+        if creation is not None:
+            creation.cancel()
+            metrics.increment("sessions.cancelled_creations")
+        session = self.sessions.pop(session_id, None)
+        if session is None:
+            self.admission.leave(session_id)
+            return
+        session.turns.cancel()
+        session.expiry = asyncio.get_running_loop().call_later(
+            RESUME_GRACE_PERIOD, self.expire_session, session.token
+        )
+
+    def expire_session(self, token: str) -> None:
+        """Forget a game session, which has not been resumed within the grace period.
+
+        Args:
+            token (str): resume token of the session
+        """
+        session = self.tokens.pop(token, None)
+        if session is not None:
+            session.turns.cancel()
+        self.tasks.spawn(self.state_backend.delete(token))
+
+    async def send_resume_token(self, session_id: str) -> None:
+        """Send the client the token to resume its session with after reconnecting.
+
+        Args:
+            session_id (str): session ID to send to
+        """
+        await self.server.emit(
+            "resume",
+            encode_json(ResumePayload(self.get_session(session_id).token)),
+            session_id
+        )
+
     async def reply(self, session_id: str, message: str) -> None:
         """Emit officer's reply.
 
@@ -112,21 +478,87 @@ class GameSessionManager:
         session = self.get_session(session_id)
         await self.server.emit(
             "say",
-            SayPayload(
+            encode_json(SayPayload(
                 who="officer",
                 message=message,
                 difficulty="",
-            ).to_json(),
+            )),
             session_id
         )
         await self.server.emit(
             "win",
-            WinPayload(
+            encode_json(WinPayload(
                 won=session.game.won
-            ).to_json(),
+            )),
+            session_id
+        )
+
+    def is_batched(self, session_id: str) -> bool:
+        """Check whether the client uses the batched protocol.
+
+        Args:
+            session_id (str): session ID
+
+        Returns:
+            bool: whether the protocol is batched
+        """
+        session = self.sessions.get(session_id)
+        return session is not None and session.batched
+
+    async def send_turn(self, session_id: str, message: str) -> None:
+        """Send the client the result of a turn.
+
+        Args:
+            session_id (str): session ID to send to
+            message (str): officer's reply message
+        """
+        if not self.is_batched(session_id):
+            await self.reply(session_id, message)
+            await self.tell_to_wait(session_id, False)
+            return
+        await self.server.emit(
+            "turn",
+            encode_json(TurnPayload(
+                say=SayPayload(who="officer", message=message, difficulty=""),
+                won=self.get_session(session_id).game.won,
+                wait=False
+            )),
             session_id
         )
 
+    async def send_init(self, session_id: str, opening_line: str | None) -> None:
+        """Send the client everything it needs to show a new or resumed game.
+
+        Args:
+            session_id (str): session ID to send to
+            opening_line (str | None): officer's opening line, None if the game is resumed
+        """
+        session = self.get_session(session_id)
+        if session.batched:
+            await self.server.emit(
+                "init",
+                encode_init_payload(session.token, get_static_payloads(session.game), opening_line, session.game.won),
+                session_id
+            )
+            return
+        if opening_line is not None:
+            await asyncio.gather(
+                self.send_resume_token(session_id),
+                self.reply(session_id, opening_line),
+                self.send_documents(session_id),
+                self.send_phrasebook(session_id),
+                self.send_brief(session_id)
+            )
+        else:
+            await asyncio.gather(
+                self.send_resume_token(session_id),
+                self.send_documents(session_id),
+                self.send_phrasebook(session_id),
+                self.send_brief(session_id),
+                self.server.emit("win", encode_json(WinPayload(won=session.game.won)), session_id)
+            )
+        await self.tell_to_wait(session_id, False)
+
     async def tell_to_wait(self, session_id: str, wait: bool) -> None:
         """Send the client the waiting status.
 
@@ -136,20 +568,21 @@ class GameSessionManager:
         """
         await self.server.emit(
             "wait",
-            WaitPayload(wait).to_json(),
+            WAIT_PAYLOAD if wait else NO_WAIT_PAYLOAD,
             session_id
         )
 
-    async def send_error(self, session_id: str, error_message: str) -> None:
+    async def send_error(self, session_id: str, error_message: str, code: int = -1) -> None:
         """Send error message to the client.
 
         Args:
             session_id (str): session ID
             error_message (str): message to send
+            code (int): error code
         """
         await self.server.emit(
             "error",
-            ErrorPayload(code=-1, message=error_message).to_json(),
+            encode_json(ErrorPayload(code=code, message=error_message)),
             session_id
         )
 
@@ -159,11 +592,9 @@ class GameSessionManager:
         Args:
             session_id (str): session ID to send to
         """
-        documents = self.get_session(session_id).game.immigrant.documents
-        payload = DocumentsPayload([DocumentPayload(document.player_representation) for document in documents])
         await self.server.emit(
             "documents",
-            payload.to_json(),
+            get_static_payloads(self.get_session(session_id).game).documents,
             session_id
         )
 
@@ -173,31 +604,44 @@ class GameSessionManager:
         Args:
             session_id (str): session ID to send to
         """
-        phrasebook = self.get_session(session_id).game.phrasebook
         await self.server.emit(
             "phrasebook",
-            phrasebook.json(),
+            get_static_payloads(self.get_session(session_id).game).phrasebook,
             session_id
         )
 
-    async def send_brief(self, session_id: str, country: Country) -> None:
+    async def send_brief(self, session_id: str) -> None:
         """Send generated country information.
 
         Args:
             session_id (str): session ID to send to
-            country (Country): the generated country
         """
-        brief = BriefPayload(
-            country_name=country.country_name,
-            language_name=country.language_name,
-            country_description=country.country_description
-        )
         await self.server.emit(
             "brief",
-            brief.to_json(),
+            get_static_payloads(self.get_session(session_id).game).brief,
             session_id
         )
 
+    def submit_turn(self, session_id: str, turn: Turn, content: str, key: str | None) -> None:
+        """Queue a turn of a session, so that it only runs after the session's previous turns.
+
+        Args:
+            session_id (str): session ID from which the turn is coming from
+            turn (Turn): function creating the turn's coroutine
+            content (str): what the turn does, e.g. the sentence said
+            key (str | None): idempotency key sent by the client, if any
+        """
+        if self.draining:
+            self.tasks.spawn(self.send_error(session_id, SERVER_RESTARTING, SERVER_RESTARTING_CODE), session_id)
+            return
+        session = self.sessions.get(session_id)
+        if session is None:
+            # Let the handler report the missing session
+            self.tasks.spawn(turn(), session_id)
+            return
+        session.last_active = time.monotonic()
+        session.turns.submit(turn, content, key, session_id)
+
     async def _give_documents(self, session_id: str, doc_id: int, difficulty: str) -> None:
         """Private 'give documents' event handler.
 
@@ -206,30 +650,46 @@ class GameSessionManager:
             doc_id (int): document ID to give
             difficulty (str): current difficulty
         """
-        session = self.get_session(session_id)
-        await self.tell_to_wait(session_id, True)
+        if not self.is_batched(session_id):
+            await self.tell_to_wait(session_id, True)
         reply = ""
         try:
-            reply = await session.game.give_document(doc_id, difficulty)
-        except ValueError as error:
-            if "BadGateway" in str(error):
-                await self.send_error(session_id, "")
-                return
+            session = self.get_session(session_id)
+            await session.wake()
+            with (
+                self.track_turn(),
+                turn_deadline(self.deadline_policy),
+                self.journal_turn(session, JournalEntryKind.GIVE_DOCUMENT, str(doc_id), difficulty)
+            ):
+                reply = await session.game.give_document(doc_id, difficulty)
+        except CblitTimeoutError as error:
+            await self.send_error(session_id, str(error), TIMEOUT_ERROR_CODE)
+            return
+        except CblitModelUnavailableError:
+            await self.send_error(session_id, MODEL_NOT_AVAILABLE, MODEL_NOT_AVAILABLE_CODE)
+            return
         except Exception as error:
             await self.send_error(session_id, str(error))
             return
-        await self.reply(session_id, reply)
-        await self.tell_to_wait(session_id, False)
+        # The turn has been played already, so it is delivered whether or not it has been saved
+        await self.try_save_session(session_id)
+        await self.send_turn(session_id, reply)
 
-    def give_documents(self, session_id: str, doc_id: int, difficulty: str) -> None:
+    def give_documents(self, session_id: str, doc_id: int, difficulty: str, idempotency_key: str | None = None) -> None:
         """Give document to the officer in a game.
 
         Args:
             session_id (str): session ID from which the event is coming from
             doc_id (int): document ID to give
             difficulty (str): current difficulty
+            idempotency_key (str | None): key of the client's submission, if it has sent one
         """
-        aiorun(self._give_documents(session_id, doc_id, difficulty))
+        self.submit_turn(
+            session_id,
+            lambda: self._give_documents(session_id, doc_id, difficulty),
+            f"give_document:{doc_id}",
+            idempotency_key
+        )
 
     async def _say(self, session_id: str, text: str, difficulty: str) -> None:
         """Private 'say' event handler.
@@ -239,65 +699,213 @@ class GameSessionManager:
             text (str): text to say
             difficulty (str): current difficulty
         """
-        session = self.get_session(session_id)
-        await self.tell_to_wait(session_id, True)
+        if not self.is_batched(session_id):
+            await self.tell_to_wait(session_id, True)
         reply = ""
         try:
-            reply = await session.game.say_to_officer(text, difficulty)
-        except ValueError as error:
-            if "BadGateway" in str(error):
-                await self.send_error(session_id, "")
-                return
+            session = self.get_session(session_id)
+            await session.wake()
+            with (
+                self.track_turn(),
+                turn_deadline(self.deadline_policy),
+                self.journal_turn(session, JournalEntryKind.SAY, text, difficulty)
+            ):
+                reply = await session.game.say_to_officer(text, difficulty)
+        except CblitTimeoutError as error:
+            await self.send_error(session_id, str(error), TIMEOUT_ERROR_CODE)
+            return
+        except CblitModelUnavailableError:
+            await self.send_error(session_id, MODEL_NOT_AVAILABLE, MODEL_NOT_AVAILABLE_CODE)
+            return
         except Exception as error:
             await self.send_error(session_id, str(error))
             return
-        await self.reply(session_id, reply)
-        await self.tell_to_wait(session_id, False)
+        # The turn has been played already, so it is delivered whether or not it has been saved
+        await self.try_save_session(session_id)
+        await self.send_turn(session_id, reply)
 
-    def say(self, session_id: str, text: str, difficulty: str) -> None:
+    def say(self, session_id: str, text: str, difficulty: str, idempotency_key: str | None = None) -> None:
         """Say to the officer in a game.
 
         Args:
             session_id (str): session ID from which the event is coming from
             text (str): text to say
             difficulty (str): current difficulty
+            idempotency_key (str | None): key of the client's submission, if it has sent one
         """
-        aiorun(self._say(session_id, text, difficulty))
+        self.submit_turn(
+            session_id,
+            lambda: self._say(session_id, text, difficulty),
+            f"say:{text}",
+            idempotency_key
+        )
 
-    async def _create_session(self, session_id: str) -> None:
+    async def _create_session(
+            self,
+            session_id: str,
+            resume_token: str | None,
+            batched: bool = False,
+            admitted: bool = False
+    ) -> None:
         """Private game session creation handler.
 
         Args:
             session_id (str): session ID from which the request is coming from
+            resume_token (str | None): token of the session to resume, if the client has one
+            batched (bool): whether the client uses the batched protocol
+            admitted (bool): whether the player has already been admitted from the waiting room
         """
-        self.sessions[session_id] = GameSession(session_id)
-        await self.tell_to_wait(session_id, True)
+        if not batched and not admitted:
+            await self.tell_to_wait(session_id, True)
         try:
-            await self.sessions[session_id].initialise()
-            start_officer_line = await self.sessions[session_id].start()
-            await asyncio.gather(
-                self.reply(session_id, start_officer_line),
-                self.send_documents(session_id),
-                self.send_phrasebook(session_id),
-                self.send_brief(session_id, self.sessions[session_id].game.country)
-            )
-        except ValueError as error:
-            if "BadGateway" in str(error):
-                await self.send_error(session_id, "")
-                return
+            session = None
+            start_officer_line = None
+            if resume_token is not None:
+                session = await self.resume_session(session_id, resume_token)
+                if session is not None:
+                    self.journal_resume(session)
+            if session is None:
+                # Resumed players are always let in, new ones wait while the LLM backend is saturated
+                if not admitted and (self.admission.waiting or self.admission.is_saturated(self.turns_in_flight)):
+                    await self.enter_waiting_room(session_id, batched)
+                    return
+                warm_game = self.warm_pool.pop() if self.warm_pool is not None else None
+                session = GameSession(
+                    session_id, warm_game.game if warm_game is not None else None, turns=self.new_turn_queue()
+                )
+                session.creating = True
+                self.sessions[session_id] = session
+                self.tokens[session.token] = session
+                try:
+                    with self.journal_turn(session, JournalEntryKind.START, None, None):
+                        if warm_game is not None:
+                            start_officer_line = warm_game.opening_line
+                        else:
+                            with self.track_turn(), turn_deadline(self.deadline_policy):
+                                await session.initialise(self.corpus)
+                                start_officer_line = await session.start()
+                    await self.try_save_session(session_id)
+                finally:
+                    session.creating = False
+            session.batched = batched
+            # A resumed session only replays what the game already has, no LLM calls are needed
+            await self.send_init(session_id, start_officer_line)
+        except asyncio.CancelledError:
+            # The client has disconnected meanwhile, keep the session resumable if it has been registered
+            self.detach_session(session_id)
+            raise
+        except CblitModelUnavailableError:
+            # There is no game to go on with yet
+            await self.send_error(session_id, MODEL_NOT_AVAILABLE)
+            return
         except Exception as error:
             await self.send_error(session_id, str(error))
             return
 
-        await self.tell_to_wait(session_id, False)
-
-    def create_session(self, session_id: str) -> None:
+    def create_session(self, session_id: str, resume_token: str | None = None, batched: bool = False) -> None:
         """Create game session for a session ID.
 
-        It will return, and then generate a game in the background.
-        When the game is generated the player will be notified.
+        It will return, and then generate a game in the background, or resume the existing one.
+        When the game is ready the player will be notified.
+
+        Args:
+            session_id (str): session ID from which the request is coming from
+            resume_token (str | None): token of the session to resume, if the client has one
+            batched (bool): whether the client uses the batched protocol
+        """
+        if self.draining:
+            self.tasks.spawn(self.send_error(session_id, SERVER_RESTARTING, SERVER_RESTARTING_CODE), session_id)
+            return
+        self.run_creation(session_id, self._create_session(session_id, resume_token, batched))
+
+    def run_creation(self, session_id: str, creation: Coroutine[Any, Any, None]) -> None:
+        """Run game creation in the background, owned by the session, so that it is cancelled on disconnect.
 
         Args:
             session_id (str): session ID from which the request is coming from
+            creation (Coroutine[Any, Any, None]): creation coroutine
+        """
+        task = self.tasks.spawn(creation, session_id)
+        self.creations[session_id] = task
+
+        def forget(_: asyncio.Task[None]) -> None:
+            if self.creations.get(session_id) is task:
+                del self.creations[session_id]
+
+        task.add_done_callback(forget)
+
+    def new_turn_queue(self) -> TurnQueue:
+        """Create a turn queue for a session, running its turns in the task registry.
+
+        Returns:
+            TurnQueue: empty queue
         """
-        aiorun(self._create_session(session_id))
+        return TurnQueue(self.turn_policy, self.tasks)
+
+    async def drain(self, timeout: float) -> bool:
+        """Stop accepting new games and turns, and let the ones in flight finish before the server stops.
+
+        Players in the waiting room are told to reconnect, and connected sessions are saved to the state backend,
+        so that their players go on with their games on another worker.
+
+        Args:
+            timeout (float): time to wait for the turns in flight, in seconds
+
+        Returns:
+            bool: whether all background work has finished in time
+        """
+        self.draining = True
+        self.stop_hibernation()
+        if self.warm_pool is not None:
+            self.warm_pool.stop()
+        waiting = list(self.admission.waiting)
+        for session_id in waiting:
+            self.admission.leave(session_id)
+            self.tasks.spawn(self.send_error(session_id, SERVER_RESTARTING, SERVER_RESTARTING_CODE), session_id)
+        drained = await self.tasks.drain(timeout)
+        results = await asyncio.gather(
+            *(self.save_session(session_id) for session_id, session in self.sessions.items() if session.is_initialised),
+            return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error(f"Could not save a session before the restart: {result}")
+        logger.info(f"Drained {len(self.sessions)} sessions, {'all' if drained else 'not all'} turns have finished")
+        return drained
+
+    def hibernate_idle_sessions(self) -> int:
+        """Hibernate sessions, both connected and waiting for a reconnect, which have been idle for long enough.
+
+        Returns:
+            int: number of sessions hibernated now
+        """
+        if self.hibernate_after is None:
+            return 0
+        hibernated = 0
+        for session in self.tokens.values():
+            if session.can_hibernate(self.hibernate_after):
+                session.hibernate()
+                hibernated += 1
+        if hibernated:
+            metrics.increment("sessions.hibernated", hibernated)
+        metrics.set_gauge(
+            "sessions.hibernating", sum(1 for session in self.tokens.values() if session.hibernated is not None)
+        )
+        return hibernated
+
+    def start_hibernation(self) -> None:
+        """Start hibernating idle sessions periodically, if hibernation is on."""
+        if self.hibernate_after is not None and self._hibernation_task is None:
+            self._hibernation_task = asyncio.get_running_loop().create_task(self._hibernate_periodically())
+
+    def stop_hibernation(self) -> None:
+        """Stop hibernating idle sessions."""
+        if self._hibernation_task is not None:
+            self._hibernation_task.cancel()
+            self._hibernation_task = None
+
+    async def _hibernate_periodically(self) -> None:
+        """Hibernate idle sessions periodically."""
+        while True:
+            await asyncio.sleep(HIBERNATION_CHECK_INTERVAL)
+            self.hibernate_idle_sessions()
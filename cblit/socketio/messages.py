@@ -1,8 +1,13 @@
 """SocketIO messages."""
 import dataclasses
+from collections import OrderedDict
+from typing import Any
 
+import orjson
 from dataclasses_json import DataClassJsonMixin
 
+from cblit.game.game import Game
+
 
 @dataclasses.dataclass
 class WaitPayload(DataClassJsonMixin):
@@ -10,12 +15,24 @@ class WaitPayload(DataClassJsonMixin):
     wait: bool
 
 
+@dataclasses.dataclass
+class WaitingRoomPayload(DataClassJsonMixin):
+    """Wait payload of a player in the waiting room."""
+    wait: bool
+    # One-based position in the waiting room
+    position: int
+    # Estimated wait, in seconds
+    estimated_start: float
+
+
 @dataclasses.dataclass
 class SayPayload(DataClassJsonMixin):
     """Say payload."""
     who: str
     message: str
     difficulty: str
+    # Key of the player's submission, so that a resent turn is only run once
+    idempotency_key: str | None = None
 
 
 @dataclasses.dataclass
@@ -23,6 +40,8 @@ class GiveDocumentPayload(DataClassJsonMixin):
     """Give document payload."""
     index: int
     difficulty: str
+    # Key of the player's submission, so that a resent turn is only run once
+    idempotency_key: str | None = None
 
 
 @dataclasses.dataclass
@@ -56,3 +75,121 @@ class BriefPayload(DataClassJsonMixin):
     country_name: str
     language_name: str
     country_description: str
+
+
+@dataclasses.dataclass
+class ResumePayload(DataClassJsonMixin):
+    """Resume payload."""
+    token: str
+
+
+@dataclasses.dataclass
+class TurnPayload(DataClassJsonMixin):
+    """Turn payload of the batched protocol, replacing 'say', 'win' and 'wait' events."""
+    say: SayPayload
+    won: bool
+    wait: bool
+
+
+def encode_json(value: Any) -> str:
+    """Encode a payload, dataclass or plain JSON value, bypassing dataclasses_json reflection.
+
+    Args:
+        value (Any): value to encode
+
+    Returns:
+        str: compact JSON
+    """
+    return orjson.dumps(value).decode()
+
+
+WAIT_PAYLOAD = encode_json(WaitPayload(True))
+NO_WAIT_PAYLOAD = encode_json(WaitPayload(False))
+
+
+@dataclasses.dataclass
+class StaticPayloads:
+    """Encoded payloads, which only depend on the pregenerated game content."""
+    documents: str
+    phrasebook: str
+    brief: str
+
+    @classmethod
+    def from_game(cls, game: Game) -> "StaticPayloads":
+        """Encode static payloads of a game.
+
+        Args:
+            game (Game): game to encode
+
+        Returns:
+            StaticPayloads:
+        """
+        return cls(
+            documents=encode_json(DocumentsPayload([
+                DocumentPayload(document.player_representation) for document in game.immigrant.documents
+            ])),
+            phrasebook=encode_json(game.phrasebook.dict()),
+            brief=encode_json(BriefPayload(
+                country_name=game.country.country_name,
+                language_name=game.country.language_name,
+                country_description=game.country.country_description
+            )),
+        )
+
+
+# Maximum number of pregenerated games, which static payloads are kept for
+STATIC_PAYLOADS_CACHE_SIZE = 256
+
+# Least recently used pregenerated games come first
+_static_payloads: OrderedDict[str, StaticPayloads] = OrderedDict()
+
+
+def get_static_payloads(game: Game) -> StaticPayloads:
+    """Get static payloads of a game, encoded once per pregenerated game and shared by all its players.
+
+    Payloads of the least recently played games are evicted once `STATIC_PAYLOADS_CACHE_SIZE` games are cached.
+
+    Args:
+        game (Game): game to get payloads for
+
+    Returns:
+        StaticPayloads:
+    """
+    if game.pregenerated_game_id is None:
+        return StaticPayloads.from_game(game)
+    static_payloads = _static_payloads.get(game.pregenerated_game_id)
+    if static_payloads is None:
+        static_payloads = StaticPayloads.from_game(game)
+        _static_payloads[game.pregenerated_game_id] = static_payloads
+        if len(_static_payloads) > STATIC_PAYLOADS_CACHE_SIZE:
+            _static_payloads.popitem(last=False)
+    else:
+        _static_payloads.move_to_end(game.pregenerated_game_id)
+    return static_payloads
+
+
+def encode_init_payload(token: str, static_payloads: StaticPayloads, opening_line: str | None, won: bool) -> str:
+    """Encode init payload of the batched protocol, replacing all the game bootstrap events.
+
+    The payload has `token`, `documents`, `phrasebook`, `brief`, `say` (null for a resumed game),
+    `won` and `wait` keys. Static payloads are embedded as they are, without encoding them again.
+
+    Args:
+        token (str): resume token
+        static_payloads (StaticPayloads): encoded static payloads of the game
+        opening_line (str | None): officer's opening line, None if the game is resumed
+        won (bool): whether the game is won
+
+    Returns:
+        str: compact JSON
+    """
+    say = None if opening_line is None else SayPayload(who="officer", message=opening_line, difficulty="")
+    return "".join([
+        '{"token":', encode_json(token),
+        ',"documents":', static_payloads.documents,
+        ',"phrasebook":', static_payloads.phrasebook,
+        ',"brief":', static_payloads.brief,
+        ',"say":', encode_json(say),
+        ',"won":', encode_json(won),
+        ',"wait":false}',
+    ])
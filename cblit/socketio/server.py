@@ -1,35 +1,171 @@
 """Server module."""
+import asyncio
+import importlib.util
 import os.path
+import signal
 from typing import Any
 
 import socketio
-from sanic import Sanic
-
-from cblit.game.game import Game
+from loguru import logger
+from sanic import Request, Sanic
+from sanic.response import HTTPResponse, json
+
+from cblit.errors.errors import CblitArgumentError
+from cblit.game.corpus import CorpusRefiller, PregeneratedCorpus, RefillPolicy
+from cblit.game.deadline import DeadlinePolicy
+from cblit.game.journal import JournalPolicy, JournalWriter
+from cblit.game.state_backend import get_state_backend
+from cblit.game.warm_pool import WarmGamePool
+from cblit.logs import configure_logging, toggle_verbose
+from cblit.loop_monitor import LoopLagMonitor
+from cblit.metrics import metrics
+from cblit.socketio.admission import AdmissionPolicy
 from cblit.socketio.game import GameSessionManager
 from cblit.socketio.messages import GiveDocumentPayload, SayPayload
+from cblit.socketio.turn_queue import TurnPolicy
 
 static_path = os.path.join(os.path.dirname(__file__), "static")
 
-games: dict[str, Game] = {}
+configure_logging()
+
+
+def get_client_manager() -> socketio.AsyncManager | None:
+    """Get socket.io client manager for emitting across workers and nodes.
+
+    The message queue only carries emits. A game session lives in the worker, which has created it,
+    so the load balancer must keep every client on the same worker (sticky sessions) for its turns to reach it.
+    The Redis manager needs the `redis` extra: `poetry install --extras redis`.
+
+    Returns:
+        socketio.AsyncManager | None: Redis-backed manager if a message queue is configured, otherwise default one
+
+    Raises:
+        CblitArgumentError: A message queue is configured, but the `redis` extra is not installed
+    """
+    message_queue = os.getenv("CBLIT_MESSAGE_QUEUE")
+    if message_queue is None:
+        return None
+    if importlib.util.find_spec("redis") is None:
+        raise CblitArgumentError("CBLIT_MESSAGE_QUEUE is set, but redis is not installed, install the redis extra")
+    return socketio.AsyncRedisManager(message_queue)
+
 
-sio = socketio.AsyncServer(async_mode="sanic")
+sio = socketio.AsyncServer(async_mode="sanic", client_manager=get_client_manager())
 
 app = Sanic(name="cblit")
 app.static("/", os.path.join(static_path, "index.html"), name="game")
 app.static("/static/", static_path, name="statics")
 sio.attach(app)
 
-session_manager = GameSessionManager(sio)
+corpus = PregeneratedCorpus()
+
+session_manager = GameSessionManager(sio, get_state_backend(os.getenv("CBLIT_STATE_BACKEND")), corpus)
+session_manager.turn_policy = TurnPolicy.from_name(os.getenv("CBLIT_TURN_POLICY"))
+session_manager.deadline_policy = DeadlinePolicy(
+    turn_timeout=float(os.getenv("CBLIT_TURN_TIMEOUT", "120")),
+    stage_timeout=float(os.getenv("CBLIT_STAGE_TIMEOUT", "60")),
+    translation_target=float(os.getenv("CBLIT_TRANSLATION_TARGET", "10")),
+)
+session_manager.admission.policy = AdmissionPolicy(
+    max_turns_in_flight=int(os.getenv("CBLIT_MAX_TURNS_IN_FLIGHT", "8")),
+    latency_target=float(os.getenv("CBLIT_LATENCY_TARGET", "20")),
+    max_waiting=int(os.getenv("CBLIT_MAX_WAITING", "100")),
+)
+
+warm_pool_size = int(os.getenv("CBLIT_WARM_POOL_SIZE", "0"))
+if warm_pool_size > 0:
+    session_manager.warm_pool = WarmGamePool(
+        warm_pool_size, corpus, session_manager.is_idle, session_manager.tasks.spawn
+    )
+
+hibernate_after = os.getenv("CBLIT_HIBERNATE_AFTER")
+session_manager.hibernate_after = float(hibernate_after) if hibernate_after is not None else None
+
+journal_directory = os.getenv("CBLIT_JOURNAL")
+if journal_directory is not None:
+    session_manager.journal = JournalWriter(journal_directory, JournalPolicy(
+        fsync_interval=float(os.getenv("CBLIT_JOURNAL_FSYNC_INTERVAL", "10")),
+        max_bytes=int(os.getenv("CBLIT_JOURNAL_MAX_BYTES", str(64 * 1024 * 1024))),
+    ))
+
+loop_lag_monitor = LoopLagMonitor()
+
+# Several workers need a message queue and sticky sessions, see get_client_manager
+workers = int(os.getenv("WORKERS", "1"))
+
+corpus_games_per_player = float(os.getenv("CBLIT_CORPUS_GAMES_PER_PLAYER", "0"))
+# Only one worker grows the corpus, and it sees its own players only, who are a share of all of them
+corpus_refiller = CorpusRefiller(
+    corpus,
+    lambda: session_manager.active_players() * workers,
+    session_manager.is_idle,
+    RefillPolicy(
+        games_per_player=corpus_games_per_player,
+        max_concurrency=int(os.getenv("CBLIT_CORPUS_MAX_CONCURRENCY", "1")),
+        token_budget=int(os.getenv("CBLIT_CORPUS_TOKEN_BUDGET", "200000")),
+    )
+) if corpus_games_per_player > 0 else None
+
+
+@app.after_server_start
+async def start_background_work(app: Sanic[Any, Any], loop: Any) -> None:
+    """Start filling the warm pool, growing the corpus, writing the journal, and hibernating idle sessions.
+
+    The event loop lag is monitored meanwhile, and SIGUSR1 toggles verbose logging of the worker.
+
+    Args:
+        app (Sanic[Any, Any]): unused
+        loop (Any): unused
+    """
+    asyncio.get_running_loop().add_signal_handler(signal.SIGUSR1, toggle_verbose)
+    loop_lag_monitor.start()
+    session_manager.start_hibernation()
+    if session_manager.warm_pool is not None:
+        session_manager.warm_pool.schedule_refill()
+    if corpus_refiller is not None:
+        corpus_refiller.start()
+    if session_manager.journal is not None:
+        session_manager.journal.start()
+
+
+@app.before_server_stop
+async def stop_background_work(app: Sanic[Any, Any], loop: Any) -> None:
+    """Let the turns in flight finish, and write the rest of the journal before the server stops.
+
+    Turns are waited for up to `CBLIT_DRAIN_TIMEOUT` seconds, so that rolling restarts do not drop players.
+
+    Args:
+        app (Sanic[Any, Any]): unused
+        loop (Any): unused
+    """
+    await session_manager.drain(float(os.getenv("CBLIT_DRAIN_TIMEOUT", "30")))
+    if session_manager.journal is not None:
+        await session_manager.journal.close()
+
+
+@app.get("/metrics")
+async def get_metrics(request: Request) -> HTTPResponse:
+    """Metrics endpoint.
+
+    Args:
+        request (Request): unused
+
+    Returns:
+        HTTPResponse: JSON report of the worker's metrics
+    """
+    session_manager.tasks.report()
+    return json(metrics.report())
 
 
-def generate_game(sid: str) -> None:
+def generate_game(sid: str, resume_token: str | None = None, batched: bool = False) -> None:
     """Start generating a game for a session ID.
 
     Args:
         sid (str): session ID
+        resume_token (str | None): token of the game to resume instead, if any
+        batched (bool): whether the client uses the batched protocol
     """
-    session_manager.create_session(sid)
+    session_manager.create_session(sid, resume_token, batched)
 
 
 @sio.event
@@ -39,9 +175,16 @@ async def connect(sid: str, environ: Any, auth: Any) -> None:
     Args:
         sid (str): session ID
         environ (Any): unused
-        auth (Any): unused
+        auth (Any): authentication data, may contain a resume token and a protocol name
     """
-    generate_game(sid)
+    if not isinstance(auth, dict):
+        auth = {}
+    resume_token = auth.get("resume_token")
+    generate_game(
+        sid,
+        resume_token if isinstance(resume_token, str) else None,
+        auth.get("protocol") == "batched"
+    )
 
 
 @sio.event
@@ -51,7 +194,8 @@ def disconnect(sid: str) -> None:
     Args:
         sid (str): session ID
     """
-    print("disconnect ", sid)
+    logger.info(f"Disconnected {sid}")
+    session_manager.detach_session(sid)
 
 
 @sio.event
@@ -63,7 +207,7 @@ def say(sid: str, data: str) -> None:
         data (str): raw event data
     """
     payload = SayPayload.from_json(data)
-    session_manager.say(sid, payload.message, payload.difficulty)
+    session_manager.say(sid, payload.message, payload.difficulty, payload.idempotency_key)
 
 
 @sio.event
@@ -75,10 +219,10 @@ def give_document(sid: str, data: str) -> None:
         data (str): raw event data
     """
     payload = GiveDocumentPayload.from_json(data)
-    session_manager.give_documents(sid, payload.index, payload.difficulty)
+    session_manager.give_documents(sid, payload.index, payload.difficulty, payload.idempotency_key)
 
 
 if __name__ == "__main__":
     host = os.getenv("HOST", "0.0.0.0")
     port = int(os.getenv("PORT", "8000"))
-    app.run(host=host, port=port)
+    app.run(host=host, port=port, workers=workers)
@@ -1,11 +1,22 @@
 import { io } from "https://cdn.socket.io/4.6.1/socket.io.esm.min.js";
-import {addChatMessage, addDocument, addPhrase, showBrief, showWin} from "./ui.js";
+import {addChatMessage, addDocument, addPhrase, clearDocuments, clearPhrasebook, showBrief, showWin} from "./ui.js";
+
+const RESUME_TOKEN_KEY = "cblit-resume-token"
+// Turn timeout and unavailable language model
+const RECOVERABLE_ERROR_CODES = [408, 503]
 
 const socket = io({
-  autoConnect: false
+  autoConnect: false,
+  auth: (callback) => {
+    callback({"resume_token": sessionStorage.getItem(RESUME_TOKEN_KEY), "protocol": "batched"})
+  }
 });
 
 let finished = false;
+let briefShown = false;
+let waitingRoomShown = false;
+// Turn sent and not replied to yet, a repeated submission of it is sent with the same idempotency key
+let pendingTurn = null;
 
 function setDisabled(flag) {
   let chat_input = document.getElementById("chat-input")
@@ -52,61 +63,127 @@ socket.on("connect", () => {
 socket.on("wait", (dataString) => {
   let data = JSON.parse(dataString)
   console.log("wait", data)
+  // Only the first estimate is shown, later ones just update the queue position
+  if (data.position !== undefined && !waitingRoomShown) {
+    waitingRoomShown = true
+    addChatMessage(
+      "Waiting room",
+      `You are #${data.position} in the queue, the game should start in about ${Math.ceil(data.estimated_start)} seconds.`,
+      false
+    )
+  }
   setWait(data.wait)
 })
 
+function handleSay(data) {
+  addChatMessage("Officer", data.message, false)
+}
+
+function handleDocuments(data) {
+  clearDocuments()
+  for (let i in data["documents"]) {
+    let doc = data["documents"][i]
+    let docText = doc["text"]
+    let docTitle = docText.split("\n")[0]
+    let callback = () => {
+      addChatMessage("You", `[give ${docTitle}]`, true)
+      giveDocument(parseInt(i))
+    }
+    addDocument(doc["text"], callback)
+  }
+}
+
+function handlePhrasebook(data) {
+  clearPhrasebook()
+  for (let phrase of data["phrases"]) {
+    addPhrase(phrase["english"], phrase["conlang"])
+  }
+}
+
+function handleWin(won) {
+  if (won === true) {
+    finished = true
+    setWait(false)
+    showWin()
+  }
+}
+
+function handleBrief(data) {
+  if (!briefShown) {
+    briefShown = true
+    showBrief(data)
+  }
+}
+
 socket.on("say", (dataString) => {
   let data = JSON.parse(dataString)
   console.log("say", data)
-  let message = data.message
-  addChatMessage("Officer", message, false)
+  handleSay(data)
+})
+
+socket.on("turn", (dataString) => {
+  let data = JSON.parse(dataString)
+  console.log("turn", data)
+  pendingTurn = null
+  handleSay(data["say"])
+  setWait(data["wait"])
+  handleWin(data["won"])
+})
+
+socket.on("init", (dataString) => {
+  let data = JSON.parse(dataString)
+  console.log("init", data)
+  sessionStorage.setItem(RESUME_TOKEN_KEY, data["token"])
+  handleDocuments(data["documents"])
+  handlePhrasebook(data["phrasebook"])
+  handleBrief(data["brief"])
+  if (data["say"] !== null) {
+    handleSay(data["say"])
+  }
+  setWait(data["wait"])
+  handleWin(data["won"])
 })
 
 socket.on("error", (dataString) => {
   let data = JSON.parse(dataString)
   console.log("error", data)
   addChatMessage("ERROR", data.message)
+  // A failed turn is over, sending it again is a new submission
+  pendingTurn = null
+  if (RECOVERABLE_ERROR_CODES.includes(data.code)) {
+    // Only the turn has failed, the game goes on
+    setWait(false)
+    return
+  }
 
   finished = true
   setWait(false)
   addChatMessage("ERROR", "The error is unrecoverable, try again later.")
 })
 
+socket.on("resume", (dataString) => {
+  let data = JSON.parse(dataString)
+  sessionStorage.setItem(RESUME_TOKEN_KEY, data["token"])
+})
+
 socket.on("documents", (dataString) => {
   let data = JSON.parse(dataString)
   console.log("documents", data)
-  for (let i in data["documents"]) {
-    let doc = data["documents"][i]
-    let docText = doc["text"]
-    let docTitle = docText.split("\n")[0]
-    let callback = () => {
-      addChatMessage("You", `[give ${docTitle}]`, true)
-      giveDocument(parseInt(i))
-    }
-    addDocument(doc["text"], callback)
-  }
+  handleDocuments(data)
 })
 
 socket.on("phrasebook", (dataString) => {
-  let data = JSON.parse(dataString)
-  for (let phrase of data["phrases"]) {
-    addPhrase(phrase["english"], phrase["conlang"])
-  }
+  handlePhrasebook(JSON.parse(dataString))
 })
 
 socket.on("win", (dataString) => {
   let data = JSON.parse(dataString)
   console.log("win", data)
-  if (data["won"] === true) {
-    finished = true
-    setWait(false)
-    showWin()
-  }
+  handleWin(data["won"])
 })
 
 socket.on("brief", (dataString) => {
-  let data = JSON.parse(dataString)
-  showBrief(data)
+  handleBrief(JSON.parse(dataString))
 })
 
 function getDifficulty() {
@@ -114,8 +191,18 @@ function getDifficulty() {
   return difficulty_select.value
 }
 
+function sendTurn(event, payload) {
+  let content = event + JSON.stringify(payload)
+  if (pendingTurn === null || pendingTurn.content !== content) {
+    pendingTurn = {"content": content, "key": crypto.randomUUID()}
+  }
+  // The server does not send a separate 'wait' event in the batched protocol
+  setWait(true)
+  socket.emit(event, JSON.stringify({...payload, "idempotency_key": pendingTurn.key}))
+}
+
 function giveDocument(index) {
-  socket.emit("give_document", JSON.stringify({"index": index, "difficulty": getDifficulty()}))
+  sendTurn("give_document", {"index": index, "difficulty": getDifficulty()})
 }
 
 function sayHandler() {
@@ -127,7 +214,7 @@ function sayHandler() {
 }
 
 function say(msg) {
-  socket.emit("say", JSON.stringify({"who": "player", "message": msg, "difficulty": getDifficulty()}))
+  sendTurn("say", {"who": "player", "message": msg, "difficulty": getDifficulty()})
 }
 
 console.log(socket)
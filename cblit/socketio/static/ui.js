@@ -28,6 +28,10 @@ export function addPhrase(original, translation) {
     phrasebookElement.appendChild(phraseElement)
 }
 
+export function clearPhrasebook() {
+    document.getElementById("phrasebook").replaceChildren()
+}
+
 export function addDocument(text, callback) {
     let documentElement = document.createElement("div")
     documentElement.className = "document bordered"
@@ -37,6 +41,10 @@ export function addDocument(text, callback) {
     documentsElement.appendChild(documentElement)
 }
 
+export function clearDocuments() {
+    document.getElementById("documents").replaceChildren()
+}
+
 export function showBrief(data) {
     addChatMessage("system", `Country: ${data["country_name"]}`)
     addChatMessage("system", data["country_description"])
@@ -0,0 +1,130 @@
+"""Background task registry module.
+
+Background tasks of the server are held by the registry until they finish, so that they are never
+garbage collected mid-flight, their errors are logged, and they can be drained when the server stops.
+"""
+import asyncio
+import dataclasses
+import time
+from collections.abc import Coroutine
+from typing import Any, TypeVar
+
+from loguru import logger
+
+from cblit.metrics import metrics
+
+T = TypeVar("T")
+
+# Group of tasks, which do not belong to a session
+GLOBAL_GROUP = "global"
+
+
+@dataclasses.dataclass
+class RunningTask:
+    """Task held by the registry."""
+    # Session ID the task belongs to, or the global group
+    group: str
+    # Monotonic time the task has been spawned at
+    start_time: float
+
+
+class TaskRegistry:
+    """Registry of running background tasks, grouped by session."""
+    tasks: dict[asyncio.Task[Any], RunningTask]
+
+    def __init__(self) -> None:
+        """Initialise an empty registry."""
+        self.tasks = {}
+
+    def spawn(self, coroutine: Coroutine[Any, Any, T], group: str = GLOBAL_GROUP) -> asyncio.Task[T]:
+        """Run a coroutine in the background, holding the task until it finishes.
+
+        Args:
+            coroutine (Coroutine[Any, Any, T]): coroutine to run
+            group (str): session ID the task belongs to, the global group if not set
+
+        Returns:
+            asyncio.Task[T]: task
+        """
+        task = asyncio.get_running_loop().create_task(coroutine)
+        self.tasks[task] = RunningTask(group, time.monotonic())
+        task.add_done_callback(self._forget)
+        metrics.increment("tasks.spawned")
+        return task
+
+    def _forget(self, task: asyncio.Task[Any]) -> None:
+        """Release a finished task, logging its error if it has failed.
+
+        Args:
+            task (asyncio.Task[Any]): finished task
+        """
+        running = self.tasks.pop(task, None)
+        if task.cancelled():
+            metrics.increment("tasks.cancelled")
+            return
+        error = task.exception()
+        if error is not None:
+            metrics.increment("tasks.failed")
+            group = running.group if running is not None else GLOBAL_GROUP
+            logger.opt(exception=error).error(f"Background task of {group} failed: {error}")
+
+    def group(self, group: str) -> list[asyncio.Task[Any]]:
+        """Get running tasks of a group.
+
+        Args:
+            group (str): session ID, or the global group
+
+        Returns:
+            list[asyncio.Task[Any]]: tasks
+        """
+        return [task for task, running in self.tasks.items() if running.group == group]
+
+    def cancel_group(self, group: str) -> int:
+        """Cancel running tasks of a group.
+
+        Args:
+            group (str): session ID, or the global group
+
+        Returns:
+            int: number of cancelled tasks
+        """
+        tasks = self.group(group)
+        for task in tasks:
+            task.cancel()
+        return len(tasks)
+
+    def report(self) -> dict[str, int]:
+        """Report numbers and the age of running tasks as gauges.
+
+        Returns:
+            dict[str, int]: numbers of running tasks by group
+        """
+        counts: dict[str, int] = {}
+        for running in self.tasks.values():
+            counts[running.group] = counts.get(running.group, 0) + 1
+        oldest = min((running.start_time for running in self.tasks.values()), default=None)
+        metrics.set_gauge("tasks.running", len(self.tasks))
+        metrics.set_gauge("tasks.groups", len(counts))
+        metrics.set_gauge("tasks.oldest_seconds", time.monotonic() - oldest if oldest is not None else 0.0)
+        return counts
+
+    async def drain(self, timeout: float) -> bool:
+        """Wait for running tasks to finish, including the ones they spawn meanwhile, and cancel the rest.
+
+        Args:
+            timeout (float): time to wait for, in seconds
+
+        Returns:
+            bool: whether all tasks have finished in time
+        """
+        deadline = time.monotonic() + timeout
+        while self.tasks and (remaining := deadline - time.monotonic()) > 0:
+            await asyncio.wait(list(self.tasks), timeout=remaining)
+        if not self.tasks:
+            return True
+        left = list(self.tasks)
+        logger.warning(f"Cancelling {len(left)} background tasks, which have not finished in {timeout} seconds")
+        for task in left:
+            task.cancel()
+        await asyncio.gather(*left, return_exceptions=True)
+        return False
@@ -0,0 +1,179 @@
+"""Per-session turn queue module.
+
+Turns of a game session are run one at a time, so that concurrent turns never interleave
+in the officer's conversation memory or the translator's memory.
+"""
+import asyncio
+import collections
+import dataclasses
+import enum
+from collections.abc import Callable, Coroutine
+from typing import Any
+
+from loguru import logger
+
+from cblit.errors.errors import CblitArgumentError
+from cblit.metrics import metrics
+from cblit.socketio.task_registry import GLOBAL_GROUP, TaskRegistry
+
+# Number of recently finished idempotency keys remembered per session
+RECENT_KEYS_SIZE = 32
+
+Turn = Callable[[], Coroutine[Any, Any, None]]
+
+
+class TurnPolicy(str, enum.Enum):
+    """Policy of handling a turn submitted while another one is in flight."""
+    # Run every turn, one after another
+    SERIALIZE = "serialize"
+    # Drop a turn with the same content as one in flight or pending
+    DROP_DUPLICATES = "drop_duplicates"
+    # Keep only the latest pending turn
+    REPLACE_PENDING = "replace_pending"
+
+    @classmethod
+    def from_name(cls, name: str | None) -> "TurnPolicy":
+        """Get policy by name.
+
+        Args:
+            name (str | None): policy name, serialize if not set
+
+        Returns:
+            TurnPolicy: policy
+
+        Raises:
+            CblitArgumentError: Unknown policy name
+        """
+        if name is None:
+            return cls.SERIALIZE
+        try:
+            return cls(name)
+        except ValueError as error:
+            raise CblitArgumentError(f"Unknown turn policy: {name}") from error
+
+
+@dataclasses.dataclass
+class PendingTurn:
+    """Turn waiting to be run."""
+    # What the turn does, e.g. the sentence said, to tell duplicates apart
+    content: str
+    # Idempotency key sent by the client, if any
+    key: str | None
+    turn: Turn
+
+
+class TurnQueue:
+    """Queue of a single session's turns."""
+    policy: TurnPolicy
+    pending: collections.deque[PendingTurn]
+    running: PendingTurn | None
+    recent_keys: collections.deque[str]
+    # Registry holding the worker, if any
+    tasks: TaskRegistry | None
+    _worker: asyncio.Task[None] | None
+
+    def __init__(self, policy: TurnPolicy = TurnPolicy.SERIALIZE, tasks: TaskRegistry | None = None) -> None:
+        """Initialise an empty queue.
+
+        Args:
+            policy (TurnPolicy): policy of handling turns submitted while another one is in flight
+            tasks (TaskRegistry | None): registry to run the worker in, so that it is drained on shutdown
+        """
+        self.policy = policy
+        self.tasks = tasks
+        self.pending = collections.deque()
+        self.running = None
+        self.recent_keys = collections.deque(maxlen=RECENT_KEYS_SIZE)
+        self._worker = None
+
+    @property
+    def is_idle(self) -> bool:
+        """Check whether no turn is in flight or pending.
+
+        Returns:
+            bool: whether the queue is idle
+        """
+        return self.running is None and not self.pending
+
+    def _queued(self) -> list[PendingTurn]:
+        """Get turns in flight or pending.
+
+        Returns:
+            list[PendingTurn]: queued turns
+        """
+        return ([self.running] if self.running is not None else []) + list(self.pending)
+
+    def submit(self, turn: Turn, content: str, key: str | None = None, group: str = GLOBAL_GROUP) -> bool:
+        """Submit a turn to be run after the ones already queued.
+
+        A turn with an idempotency key is always dropped if the key has already been seen.
+
+        Args:
+            turn (Turn): function creating the turn's coroutine
+            content (str): what the turn does, e.g. the sentence said
+            key (str | None): idempotency key sent by the client, if any
+            group (str): session ID to register the worker under
+
+        Returns:
+            bool: whether the turn has been accepted
+        """
+        metrics.increment("turns.submitted")
+        queued = self._queued()
+        if key is not None and (key in self.recent_keys or any(pending.key == key for pending in queued)):
+            self._deduplicate("turns.duplicate_keys")
+            return False
+        if self.policy == TurnPolicy.DROP_DUPLICATES and any(pending.content == content for pending in queued):
+            self._deduplicate("turns.dropped")
+            return False
+        if self.policy == TurnPolicy.REPLACE_PENDING and self.pending:
+            self._deduplicate("turns.replaced", len(self.pending))
+            self.pending.clear()
+        self.pending.append(PendingTurn(content, key, turn))
+        if self._worker is None or self._worker.done():
+            if self.tasks is not None:
+                self._worker = self.tasks.spawn(self._run(), group)
+            else:
+                self._worker = asyncio.get_running_loop().create_task(self._run())
+        return True
+
+    def cancel(self) -> int:
+        """Cancel the turn in flight and drop the pending ones.
+
+        Returns:
+            int: number of cancelled turns
+        """
+        cancelled = len(self.pending) + (1 if self.running is not None else 0)
+        self.pending.clear()
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+        self.running = None
+        if cancelled:
+            metrics.increment("turns.cancelled", cancelled)
+        return cancelled
+
+    async def _run(self) -> None:
+        """Run pending turns one at a time."""
+        while self.pending:
+            pending = self.pending.popleft()
+            self.running = pending
+            try:
+                await pending.turn()
+            except Exception as error:
+                logger.error(f"Turn failed: {error}")
+            finally:
+                self.running = None
+                if pending.key is not None:
+                    self.recent_keys.append(pending.key)
+
+    @staticmethod
+    def _deduplicate(counter: str, count: int = 1) -> None:
+        """Count turns, which have not been run.
+
+        Args:
+            counter (str): counter of the reason
+            count (int): number of turns
+        """
+        metrics.increment(counter, count)
+        metrics.increment("turns.deduplicated", count)
+        metrics.set_gauge("turns.deduplicated_rate", metrics.ratio("turns.deduplicated", "turns.submitted"))
@@ -0,0 +1 @@
+"""Game tests package."""
@@ -0,0 +1,43 @@
+"""Pregenerated corpus tests."""
+import os
+from pathlib import Path
+from unittest import mock
+
+import pytest
+
+from cblit.game.corpus import CorpusRefiller, PregeneratedCorpus, RefillPolicy
+
+
+def test_refresh(tmp_path: Path):
+    """Test that only game files are drawn, and that games removed from the directory are forgotten.
+
+    Args:
+        tmp_path (Path): corpus directory
+    """
+    for filename in ["pregen_1.json", "pregen_2.json", "pregen_3.json.1.2.tmp"]:
+        (tmp_path / filename).write_text("{}")
+    corpus = PregeneratedCorpus(str(tmp_path))
+    assert set(corpus.usage) == {"pregen_1", "pregen_2"}
+
+    os.remove(tmp_path / "pregen_2.json")
+    corpus.refresh()
+    assert set(corpus.usage) == {"pregen_1"}
+    assert corpus.fresh_games == 1
+
+
+@pytest.mark.asyncio
+async def test_one_refiller_per_corpus(tmp_path: Path):
+    """Test that only one refiller grows a corpus directory at a time.
+
+    Args:
+        tmp_path (Path): corpus directory
+    """
+    refillers = [
+        CorpusRefiller(PregeneratedCorpus(str(tmp_path)), lambda: 0, lambda: True, RefillPolicy()) for _ in range(2)
+    ]
+    with mock.patch.object(CorpusRefiller, "_run", mock.AsyncMock()):
+        assert refillers[0].start()
+        assert not refillers[1].start()
+        refillers[0].stop()
+        assert refillers[1].start()
+        refillers[1].stop()
@@ -0,0 +1,28 @@
+"""Turn deadline tests."""
+import asyncio
+
+import pytest
+
+from cblit.errors.errors import CblitTimeoutError
+from cblit.game.deadline import DeadlinePolicy, run_stage, turn_deadline
+
+
+@pytest.mark.asyncio
+async def test_stage_without_deadline():
+    """Test that a stage runs without a timeout outside of a turn."""
+    assert await run_stage("stage", asyncio.sleep(0.01, "done")) == "done"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("policy", [
+    DeadlinePolicy(turn_timeout=10, stage_timeout=0.01),
+    DeadlinePolicy(turn_timeout=0.01, stage_timeout=10),
+])
+async def test_stage_timeout(policy: DeadlinePolicy):
+    """Test that a stage is cut short by either its own or the turn's deadline.
+
+    Args:
+        policy (DeadlinePolicy): timeouts to apply
+    """
+    with turn_deadline(policy), pytest.raises(CblitTimeoutError):
+        await run_stage("stage", asyncio.sleep(1))
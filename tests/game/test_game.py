@@ -0,0 +1,22 @@
+"""Game tests."""
+import types
+from unittest import mock
+
+import pytest
+
+from cblit.game.game import Game
+from cblit.session.language.translator import ConlangEntry
+from cblit.session.registration import RegistrationTracker
+
+
+@pytest.mark.asyncio
+async def test_success_marker_wins():
+    """Test that the officer's success marker wins the game, even if the tracked registration is not complete."""
+    translate = mock.AsyncMock(side_effect=lambda reply, to_conlang: ConlangEntry(english=reply, conlang=reply))
+    game = types.SimpleNamespace(
+        officer_session=types.SimpleNamespace(registration=RegistrationTracker()), won=False, _translate=translate
+    )
+    assert await Game.process_officer(game, "All set, have a nice day!") == "All set, have a nice day!"
+    assert not game.won
+    assert await Game.process_officer(game, "All set, have a nice day! %%SUCCESS%%") == "All set, have a nice day! "
+    assert game.won
@@ -0,0 +1,19 @@
+"""Game script tests."""
+import pytest
+
+from cblit.errors.errors import CblitArgumentError
+from cblit.game.game_script import ScriptAction, parse_script
+
+
+def test_parse_script():
+    """Test that actions are parsed, skipping comments and empty lines."""
+    actions = parse_script("# Greet the officer\nnew\n\nsay Hello there!\ngive 0\n")
+    assert actions == [
+        ScriptAction(name="new"),
+        ScriptAction(name="say", argument="Hello there!"),
+        ScriptAction(name="give", argument="0"),
+    ]
+    with pytest.raises(CblitArgumentError):
+        parse_script("dance")
+    with pytest.raises(CblitArgumentError):
+        parse_script("save")
@@ -0,0 +1,45 @@
+"""Generation graph tests."""
+import asyncio
+
+import pytest
+
+from cblit.errors.errors import CblitArgumentError
+from cblit.game.generation_graph import GenerationGraph
+
+
+@pytest.mark.asyncio
+async def test_independent_stages_run_concurrently():
+    """Test that stages sharing an input run at the same time, and known stages are not run."""
+    started: list[str] = []
+    both_started = asyncio.Event()
+
+    async def branch(name: str, country: str) -> str:
+        started.append(name)
+        if len(started) == len(["phrasebook", "immigrant"]):
+            both_started.set()
+        # Each branch only finishes once the other one has started
+        await asyncio.wait_for(both_started.wait(), 1)
+        return f"{name} of {country}"
+
+    async def fail() -> str:
+        raise AssertionError("Known stage has been run")
+
+    graph = GenerationGraph()
+    graph.add("country", fail)
+    graph.add("phrasebook", lambda country: branch("phrasebook", country), "country")
+    graph.add("immigrant", lambda country: branch("immigrant", country), "country")
+    results = await graph.run({"country": "Fradolia"})
+    assert results["phrasebook"] == "phrasebook of Fradolia"
+    assert results["immigrant"] == "immigrant of Fradolia"
+
+
+def test_cycle():
+    """Test that stages forming a cycle are rejected."""
+    async def stage(_: str) -> str:
+        return ""
+
+    graph = GenerationGraph()
+    graph.add("a", stage, "b")
+    graph.add("b", stage, "a")
+    with pytest.raises(CblitArgumentError):
+        graph.order(set())
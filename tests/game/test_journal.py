@@ -0,0 +1,35 @@
+"""Session journal tests."""
+import asyncio
+import os
+
+import pytest
+
+from cblit.game.deadline import run_stage
+from cblit.game.journal import (
+    JournalEntry,
+    JournalEntryKind,
+    JournalPolicy,
+    JournalWriter,
+    read_journal,
+    recording_turn,
+)
+
+
+@pytest.mark.asyncio
+async def test_write_and_read(tmp_path):
+    """Test that recorded turns are read back by session, across rotated files."""
+    session_ids = ["first", "second", "first"]
+    # Every batch fills a journal file up
+    writer = JournalWriter(str(tmp_path), JournalPolicy(max_bytes=1))
+    for i, session_id in enumerate(session_ids):
+        entry = JournalEntry(session_id=session_id, kind=JournalEntryKind.SAY, time=i, input=str(i))
+        with recording_turn(entry):
+            await run_stage("officer", asyncio.sleep(0))
+        writer.append(entry)
+        await writer.flush()
+    await writer.close()
+
+    assert len(os.listdir(tmp_path)) == len(session_ids)
+    entries = read_journal(str(tmp_path), "first")
+    assert [entry.input for entry in entries] == ["0", "2"]
+    assert list(entries[0].stage_seconds) == ["officer"]
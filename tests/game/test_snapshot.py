@@ -0,0 +1,37 @@
+"""Game snapshot tests."""
+import pytest
+
+from cblit.errors.errors import CblitArgumentError
+from cblit.game.snapshot import SNAPSHOT_SCHEMA_VERSION, GameSnapshot
+from cblit.session.language.translator import ConlangEntry
+from cblit.session.officer import OfficerTurn
+
+SNAPSHOT = GameSnapshot(
+    pregenerated_game_id="pregen_1",
+    officer_turns=[OfficerTurn(visitor="<speaks clearly> Hi!", officer="Hello, how can I help?")],
+    translations=[ConlangEntry(english="Hello", conlang="Finigutixa")],
+    started=True,
+    won=False
+)
+
+
+def test_round_trip():
+    """Test that a snapshot survives serialisation."""
+    data = SNAPSHOT.dumps()
+
+    assert GameSnapshot.loads(data) == SNAPSHOT
+    assert ": " not in data
+
+
+def test_unsupported_schema_version():
+    """Test that snapshots of other schema versions are rejected."""
+    data = SNAPSHOT.copy(update={"schema_version": SNAPSHOT_SCHEMA_VERSION + 1}).dumps()
+
+    with pytest.raises(CblitArgumentError):
+        GameSnapshot.loads(data)
+
+
+def test_not_a_snapshot():
+    """Test that arbitrary JSON is rejected."""
+    with pytest.raises(CblitArgumentError):
+        GameSnapshot.loads('{"country_session": {}}')
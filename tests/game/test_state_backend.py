@@ -0,0 +1,52 @@
+"""Session state backend tests."""
+from pathlib import Path
+
+import pytest
+
+from cblit.game.snapshot import GameSnapshot
+from cblit.game.state_backend import SessionStateBackend, get_state_backend
+from cblit.session.language.translator import ConlangEntry
+from cblit.session.officer import OfficerTurn
+
+SNAPSHOT = GameSnapshot(
+    pregenerated_game_id="pregen_1",
+    officer_turns=[OfficerTurn(visitor="<speaks clearly> Hi!", officer="Hello, how can I help?")],
+    translations=[ConlangEntry(english="Hello", conlang="Finigutixa")],
+    started=True,
+    won=False
+)
+
+
+@pytest.fixture(params=["memory", "sqlite", "file"])
+def backend(request: pytest.FixtureRequest, tmp_path: Path) -> SessionStateBackend:
+    """Session state backend of every supported kind.
+
+    Args:
+        request (pytest.FixtureRequest): fixture request with the backend kind
+        tmp_path (Path): temporary directory
+
+    Returns:
+        SessionStateBackend: backend
+    """
+    urls = {
+        "memory": "memory://",
+        "sqlite": f"sqlite://{tmp_path}/state.db",
+        "file": f"file://{tmp_path}/state",
+    }
+    return get_state_backend(urls[request.param])
+
+
+@pytest.mark.asyncio
+async def test_save_load_delete(backend: SessionStateBackend):
+    """Test snapshot round trip through a backend.
+
+    Args:
+        backend (SessionStateBackend): backend to test
+    """
+    assert await backend.load("sid") is None
+
+    await backend.save("sid", SNAPSHOT)
+    assert await backend.load("sid") == SNAPSHOT
+
+    await backend.delete("sid")
+    assert await backend.load("sid") is None
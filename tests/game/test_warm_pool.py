@@ -0,0 +1,35 @@
+"""Warm game pool tests."""
+import asyncio
+from pathlib import Path
+from unittest import mock
+
+import pytest
+
+from cblit.game import warm_pool
+from cblit.game.corpus import PregeneratedCorpus
+from cblit.game.warm_pool import WarmGame, WarmGamePool
+from cblit.socketio.task_registry import TaskRegistry
+
+
+@pytest.mark.asyncio
+async def test_refill_waits_for_idleness(tmp_path: Path):
+    """Test that the pool is only refilled while the server is idle, by a task held by the registry.
+
+    Args:
+        tmp_path (Path): corpus directory
+    """
+    idle = False
+    tasks = TaskRegistry()
+    pool = WarmGamePool(1, PregeneratedCorpus(str(tmp_path)), lambda: idle, tasks.spawn)
+    warm_game = WarmGame(game=mock.Mock(), opening_line="Hello", memory_cost=0)
+    with mock.patch.object(warm_pool, "REFILL_INTERVAL", 0.01), \
+            mock.patch.object(pool, "_build", mock.AsyncMock(return_value=warm_game)) as build:
+        pool.schedule_refill()
+        assert len(tasks.tasks) == 1
+        await asyncio.sleep(0.05)
+        build.assert_not_called()
+
+        idle = True
+        await tasks.drain(1.0)
+        build.assert_called_once()
+        assert list(pool.games) == [warm_game]
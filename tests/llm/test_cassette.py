@@ -0,0 +1,19 @@
+"""Cassette tests."""
+import pytest
+from langchain.embeddings.fake import FakeEmbeddings
+
+from cblit.errors.errors import CblitArgumentError
+from cblit.llm.cassette import Cassette, CassetteEmbeddings, CassetteMode
+
+
+def test_record_and_replay(tmp_path):
+    """Test that recorded embeddings are replayed without the wrapped embeddings."""
+    path = str(tmp_path / "cassette.jsonl.gz")
+    recording = CassetteEmbeddings(FakeEmbeddings(size=4), Cassette(path, CassetteMode.RECORD))
+    recorded = recording.embed_query("Hello")
+
+    replaying = CassetteEmbeddings(None, Cassette(path, CassetteMode.REPLAY))
+    assert replaying.embed_query("Hello") == recorded
+    assert replaying.embed_query("Hello") == recorded
+    with pytest.raises(CblitArgumentError):
+        replaying.embed_query("Goodbye")
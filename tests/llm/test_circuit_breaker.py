@@ -0,0 +1,80 @@
+"""Circuit breaker tests."""
+import asyncio
+
+import openai.error
+import pytest
+
+from cblit.errors.errors import CblitModelUnavailableError
+from cblit.llm.circuit_breaker import CircuitBreaker, CircuitBreakerPolicy, CircuitState
+
+
+def fail(breaker: CircuitBreaker) -> None:
+    """Make a call, which fails because the backend is unavailable.
+
+    Args:
+        breaker (CircuitBreaker): breaker to guard the call with
+    """
+    with pytest.raises(CblitModelUnavailableError), breaker.guard():
+        raise openai.error.ServiceUnavailableError("The server is overloaded")
+
+
+def test_opens_on_failure_rate():
+    """Test that the circuit opens once the failure rate is too high, and then fails fast."""
+    policy = CircuitBreakerPolicy(failure_rate_threshold=0.5, minimum_calls=4, open_duration=60)
+    breaker = CircuitBreaker("test", policy)
+    with breaker.guard():
+        pass
+    for _ in range(3):
+        fail(breaker)
+    assert breaker.state == CircuitState.OPEN
+    with pytest.raises(CblitModelUnavailableError), breaker.guard():
+        pytest.fail("The call should not go through")
+
+
+def test_request_errors_are_not_failures():
+    """Test that errors of the request itself do not open the circuit."""
+    breaker = CircuitBreaker("test", CircuitBreakerPolicy(minimum_calls=1))
+    with pytest.raises(openai.error.InvalidRequestError), breaker.guard():
+        raise openai.error.InvalidRequestError("Too long", "prompt")
+    assert breaker.state == CircuitState.CLOSED
+
+
+def test_half_open_probe():
+    """Test that a single probe is let through after the open duration, and closes the circuit if it succeeds."""
+    breaker = CircuitBreaker("test", CircuitBreakerPolicy(minimum_calls=1, open_duration=0))
+    fail(breaker)
+    assert breaker.state == CircuitState.OPEN
+    with breaker.guard(), pytest.raises(CblitModelUnavailableError), breaker.guard():
+        pytest.fail("Only a single probe should go through")
+    assert breaker.state == CircuitState.CLOSED
+
+
+def test_timeouts_are_failures():
+    """Test that calls timing out, e.g. while the backend hangs, open the circuit."""
+    breaker = CircuitBreaker("test", CircuitBreakerPolicy(minimum_calls=1))
+    with pytest.raises(CblitModelUnavailableError), breaker.guard():
+        raise openai.error.Timeout("Request timed out")
+    assert breaker.state == CircuitState.OPEN
+
+
+@pytest.mark.asyncio
+async def test_cancellations_are_not_failures():
+    """Test that calls cancelled by the caller, e.g. by a translation deadline, are not counted."""
+    breaker = CircuitBreaker("test", CircuitBreakerPolicy(minimum_calls=1, open_duration=0))
+
+    async def hang() -> None:
+        with breaker.guard():
+            await asyncio.Event().wait()
+
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(hang(), 0.01)
+    assert breaker.state == CircuitState.CLOSED
+    assert not breaker.outcomes
+
+    # A cancelled probe lets the next call probe again
+    fail(breaker)
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(hang(), 0.01)
+    with breaker.guard():
+        pass
+    assert breaker.state == CircuitState.CLOSED
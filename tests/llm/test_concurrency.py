@@ -0,0 +1,33 @@
+"""LLM concurrency budget tests."""
+import asyncio
+
+import pytest
+
+from cblit.llm.concurrency import get_generation_budget, limiting_llm_calls, llm_call_slot
+
+
+async def hold_slot() -> None:
+    """Hold a slot of the current budget for a loop iteration."""
+    async with llm_call_slot():
+        await asyncio.sleep(0)
+
+
+async def contend_for_budget() -> asyncio.Semaphore:
+    """Make calls contend for the generation budget, so that they wait on it.
+
+    Returns:
+        asyncio.Semaphore: budget of the running loop
+    """
+    with limiting_llm_calls(get_generation_budget()):
+        await asyncio.gather(hold_slot(), hold_slot())
+    return get_generation_budget()
+
+
+def test_budget_per_event_loop(monkeypatch: pytest.MonkeyPatch):
+    """Test that every event loop gets its own budget, so that the budget works across `asyncio.run` calls.
+
+    Args:
+        monkeypatch (pytest.MonkeyPatch): patch of the budget size
+    """
+    monkeypatch.setenv("CBLIT_GENERATION_LLM_CONCURRENCY", "1")
+    assert asyncio.run(contend_for_budget()) is not asyncio.run(contend_for_budget())
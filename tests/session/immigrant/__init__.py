@@ -0,0 +1 @@
+"""Immigrant test package."""
@@ -0,0 +1,21 @@
+"""Document tests."""
+from cblit.session.immigrant.document import Document
+from cblit.session.language.translator import ConlangEntry
+
+
+def test_line_entries():
+    """Test that a translated document is split into line-level entries, without the title underline."""
+    document = Document(
+        officer_representation="Passport\n========\nFull name: Anna\n",
+        player_representation="Pasporto\n========\nPlena nomo: Anna\n",
+    )
+    assert document.to_entries() == [
+        ConlangEntry(english="Passport", conlang="Pasporto"),
+        ConlangEntry(english="Full name: Anna", conlang="Plena nomo: Anna"),
+    ]
+
+
+def test_misaligned_document():
+    """Test that a document, which representations do not line up, is a single entry."""
+    document = Document(officer_representation="Passport\nFull name: Anna", player_representation="Pasporto")
+    assert document.to_entries() == [ConlangEntry(english="Passport\nFull name: Anna", conlang="Pasporto")]
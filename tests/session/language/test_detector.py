@@ -0,0 +1,51 @@
+"""Language detector tests."""
+import pytest
+
+from cblit.session.language.detector import DetectedLanguage, LanguageDetector
+
+KNOWN_TRANSLATIONS = [
+    ("Hello", "Zhakkarit"),
+    ("My name is Anna", "Vorrash ki Anna"),
+    ("I want to register", "Threnn vokk ulurash"),
+    ("My address is the old street", "Vorrash ulmakk ki thorr zhuldak"),
+    ("Identity documents", "Kharrit zhuldakkor"),
+    ("I do not understand", "Threnn ka ulkharrit"),
+    ("My reason to enter is work", "Vorrash dhakki vokk ki thrumak"),
+]
+
+
+@pytest.fixture
+def detector() -> LanguageDetector:
+    """Detector, which has learned a few translations.
+
+    Returns:
+        LanguageDetector: detector
+    """
+    detector = LanguageDetector()
+    for english, conlang in KNOWN_TRANSLATIONS:
+        detector.add(english, conlang)
+    return detector
+
+
+@pytest.mark.parametrize(("text", "expected"), [
+    ("Vorrash ki Anna, threnn vokk ulurash", DetectedLanguage.CONLANG),
+    ("Hello, my name is Anna and I want to work", DetectedLanguage.ENGLISH),
+    ("qxqxqx pfffft", DetectedLanguage.GIBBERISH),
+    ("!!!", DetectedLanguage.GIBBERISH),
+])
+def test_detect(detector: LanguageDetector, text: str, expected: DetectedLanguage):
+    """Test that the language is told from the n-grams of the known translations.
+
+    Args:
+        detector (LanguageDetector): detector to test
+        text (str): player's sentence
+        expected (DetectedLanguage): expected language
+    """
+    assert detector.detect(text) == expected
+
+
+def test_untrained():
+    """Test that every text is taken for Conlang, until both languages are learned."""
+    detector = LanguageDetector()
+    detector.add("Passport", "Passport")
+    assert detector.detect("Hello") == DetectedLanguage.CONLANG
@@ -0,0 +1,28 @@
+"""Fallback translator tests."""
+from cblit.session.language.fallback import FallbackTranslator
+
+
+def get_translator() -> FallbackTranslator:
+    """Get a translator, which knows a few translations.
+
+    Returns:
+        FallbackTranslator: translator
+    """
+    translator = FallbackTranslator()
+    translator.add("Hello", "Zdravo")
+    translator.add("My name is Anna", "Mi nomo estas Anna")
+    translator.add("My passport", "Mi pasporto")
+    translator.add("My address", "Mi adreso")
+    return translator
+
+
+def test_longest_phrase():
+    """Test that known phrases are translated as a whole."""
+    assert get_translator().to_conlang.translate("Hello! My name is Anna.") == "zdravo! mi nomo estas anna."
+
+
+def test_word_alignment():
+    """Test that unknown phrases are translated word by word, keeping unknown words as they are."""
+    translator = get_translator()
+    assert translator.to_conlang.translate("my Boris") == "mi boris"
+    assert translator.from_conlang.translate("Zdravo, mi pasporto") == "hello, my passport"
@@ -0,0 +1,79 @@
+"""Translator tests."""
+from collections.abc import Iterator
+from unittest.mock import patch
+
+import pytest
+from langchain.embeddings.base import Embeddings
+
+from cblit.session.language.translator import ConlangEntry, RetrievalPolicy, TranslatorMemory
+
+EMBEDDING_SIZE = 1536
+TOPICS = ["passport", "address"]
+
+
+class TopicEmbeddings(Embeddings):
+    """Embeddings, which put texts of the same topic at the same unit vector."""
+
+    def embed_query(self, text: str) -> list[float]:
+        """Embed a text.
+
+        Args:
+            text (str): text to embed
+
+        Returns:
+            list[float]: unit vector of the text's topic
+        """
+        axis = next((i for i, topic in enumerate(TOPICS) if topic in text.lower()), len(TOPICS))
+        return [1.0 if i == axis else 0.0 for i in range(EMBEDDING_SIZE)]
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        """Embed texts.
+
+        Args:
+            texts (list[str]): texts to embed
+
+        Returns:
+            list[list[float]]: unit vectors of the texts' topics
+        """
+        return [self.embed_query(text) for text in texts]
+
+
+@pytest.fixture
+def memory() -> Iterator[TranslatorMemory]:
+    """Translator memory, which knows a few entries.
+
+    Yields:
+        TranslatorMemory: memory
+    """
+    with patch("cblit.session.language.translator.get_embeddings", return_value=TopicEmbeddings()):
+        memory = TranslatorMemory()
+        memory.save_entries([
+            ConlangEntry(english="Passport number", conlang="Pasporta numero"),
+            ConlangEntry(english="Passport expiry", conlang="Pasporta limdato"),
+            ConlangEntry(english="Home address", conlang="Hejma adreso"),
+        ])
+        yield memory
+
+
+def test_similarity_threshold(memory: TranslatorMemory):
+    """Test that only entries similar to the phrase are retrieved.
+
+    Args:
+        memory (TranslatorMemory): memory to retrieve from
+    """
+    phrasebook = memory.get_entries("English", "Show me your passport")["phrasebook"]
+    assert "Passport number" in phrasebook
+    assert "Passport expiry" in phrasebook
+    assert "address" not in phrasebook
+
+
+def test_token_budget(memory: TranslatorMemory):
+    """Test that entries beyond the token budget are not retrieved, apart from the nearest one.
+
+    Args:
+        memory (TranslatorMemory): memory to retrieve from
+    """
+    with patch.object(TranslatorMemory, "policy", RetrievalPolicy(token_budget=1)):
+        phrasebook = memory.get_entries("English", "Show me your passport")["phrasebook"]
+    assert isinstance(phrasebook, str)
+    assert len(phrasebook.splitlines()) == len(["english", "conlang"])
@@ -0,0 +1,69 @@
+"""Batch generation tests."""
+import json
+from unittest import mock
+
+import openai
+import pytest
+from pydantic import BaseModel
+
+from cblit.session.batch import BATCH_MAX_TOKENS, BATCH_SIZE, BatchOutputParser, generate_batch
+from cblit.session.country import ConstructedCountrySession, Country
+
+
+class Item(BaseModel):
+    """Generated item."""
+    name: str
+    size: int
+
+
+def test_per_item_validation():
+    """Test that invalid items are left out of a batch, keeping the valid ones in their places."""
+    parser = BatchOutputParser(Item)
+    completion = "Sure! " + json.dumps({"items": [{"name": "a", "size": 1}, {"name": "b", "size": "big"}]})
+    assert parser.parse(completion, 3) == [Item(name="a", size=1), None, None]
+    assert parser.parse("Not JSON", 2) == [None, None]
+
+
+@pytest.mark.asyncio
+async def test_only_invalid_items_are_retried():
+    """Test that only the invalid items are requested again, in batches of the batch size."""
+    batches: list[list[str]] = []
+    requested: set[str] = set()
+
+    async def generate(requests: list[str]) -> list[Item | None]:
+        batches.append(requests)
+        # Every item fails the first time it is requested
+        items = [Item(name=request, size=1) if request in requested else None for request in requests]
+        requested.update(requests)
+        return items
+
+    names = [str(i) for i in range(BATCH_SIZE + 1)]
+    items = await generate_batch(generate, names)
+    assert [item.name for item in items if item is not None] == names
+    assert batches == [names[:BATCH_SIZE], names[BATCH_SIZE:], names[:BATCH_SIZE], names[BATCH_SIZE:]]
+
+
+@pytest.mark.asyncio
+async def test_batched_countries(monkeypatch):
+    """Test that countries are generated in batches through the OpenAI LLM, without counting the prompt's tokens."""
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setattr(ConstructedCountrySession, "_instance", None)
+    country = Country(
+        country_name="Fradolia",
+        country_description="A planet",
+        country_currency_name="Frad",
+        neighbour_country_name="Gorbia",
+        people_description="Friendly",
+        language_name="Fradolian",
+        language_description="Melodic",
+        example_sentence="Zdravo",
+        example_sentence_translation="Hello",
+    )
+    completion = json.dumps({"items": [country.dict(), country.dict()]})
+    create = mock.AsyncMock(return_value={
+        "choices": [{"text": completion, "finish_reason": "stop", "logprobs": None}],
+        "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+    })
+    with mock.patch.object(openai.Completion, "acreate", create):
+        assert await ConstructedCountrySession.instance().new_countries(2) == [country, country]
+    assert create.call_args.kwargs["max_tokens"] == BATCH_MAX_TOKENS
@@ -0,0 +1,70 @@
+"""Registration tracker tests."""
+from cblit.session.officer import EARLIER_STEPS_PROMPT, SUCCESS_PROMPT, OfficerPromptTemplate, get_registration_steps
+from cblit.session.registration import STALLED_REPLIES_LIMIT, RegistrationStep, RegistrationTracker
+
+
+def test_procedure():
+    """Test that the officer's replies advance the procedure only as far as the given documents allow."""
+    tracker = RegistrationTracker()
+    tracker.hear_officer("Hello, this is the residence permit office. How can I help you?")
+    assert tracker.step == RegistrationStep.PURPOSE
+
+    tracker.hear_officer("Registration, sure. May I have your name and passport?")
+    assert tracker.step == RegistrationStep.SCAN
+    tracker.give_document("Passport")
+    assert tracker.step == RegistrationStep.REASON
+
+    # Steps beyond the next one are not taken for done
+    tracker.hear_officer("What is your address?")
+    assert tracker.step == RegistrationStep.REASON
+    tracker.hear_officer("What is the reason for your move?")
+    tracker.give_document("Work Permit")
+    tracker.give_document("Employment Agreement")
+    # The farewell is still too early, the address has not been asked for
+    tracker.hear_officer("Your residence permit will arrive via post.")
+    assert tracker.step == RegistrationStep.ADDRESS
+    tracker.hear_officer("What is your address?")
+    assert tracker.step == RegistrationStep.FAREWELL
+    assert not tracker.is_complete
+
+    tracker.hear_officer("Thank you! You will receive your residence permit via post in 14 to 21 days.")
+    assert tracker.is_complete
+
+
+def test_unrecognised_wording():
+    """Test that the procedure advances on documents and replies, when the officer's wording matches no pattern."""
+    tracker = RegistrationTracker()
+    tracker.hear_officer("Registration, sure. May I have your name and passport?")
+    tracker.give_document("Passport")
+    assert tracker.step == RegistrationStep.REASON
+
+    # The officer's question is not recognised, but the documents asked for by the next step are given
+    tracker.hear_officer("What brings you to our country?")
+    assert tracker.step == RegistrationStep.REASON
+    tracker.give_document("Work Permit")
+    tracker.give_document("Employment Agreement")
+    assert tracker.step == RegistrationStep.ADDRESS
+
+    # Without any documents to give, the step is taken for done after a few replies
+    for _ in range(STALLED_REPLIES_LIMIT - 1):
+        tracker.hear_officer("Where will you be living?")
+        assert tracker.step == RegistrationStep.ADDRESS
+    tracker.hear_officer("Where will you be living?")
+    assert tracker.step == RegistrationStep.FAREWELL
+
+    # The farewell is never taken for done, the officer marks it instead
+    for _ in range(STALLED_REPLIES_LIMIT):
+        tracker.hear_officer("All set, have a nice day!")
+    assert not tracker.is_complete
+
+
+def test_prompted_steps():
+    """Test that only the current and the next steps are prompted."""
+    assert get_registration_steps(RegistrationStep.PURPOSE).startswith("1. ")
+    assert get_registration_steps(RegistrationStep.REASON).splitlines() == [
+        EARLIER_STEPS_PROMPT,
+        "4. Ask for a reason to immigrate",
+        "5. If it is for work, ask for the work permit and employment contract",
+    ]
+    assert get_registration_steps(RegistrationStep.DONE) == get_registration_steps(RegistrationStep.FAREWELL)
+    assert SUCCESS_PROMPT in OfficerPromptTemplate(RegistrationTracker()).format(history="", input="Hello")
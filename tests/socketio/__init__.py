@@ -0,0 +1 @@
+"""Socket.IO tests package."""
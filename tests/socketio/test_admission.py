@@ -0,0 +1,23 @@
+"""Admission control tests."""
+from cblit.socketio.admission import AdmissionController, AdmissionPolicy
+
+
+def test_waiting_room():
+    """Test that players are admitted in order, only while there is spare capacity."""
+    controller = AdmissionController(AdmissionPolicy(max_turns_in_flight=2, latency_target=10, max_waiting=2))
+    assert controller.is_saturated(2)
+    assert controller.enqueue("a", False)
+    assert controller.enqueue("b", True)
+    assert not controller.enqueue("c", False)
+    assert controller.admit(2) == []
+    assert controller.admit(1) == [("a", False)]
+    assert controller.admit(0) == [("b", True)]
+
+
+def test_latency_target():
+    """Test that slow turns stop admissions while there is work in flight."""
+    controller = AdmissionController(AdmissionPolicy(max_turns_in_flight=8, latency_target=10))
+    controller.observe_latency(30)
+    assert controller.is_saturated(1)
+    assert not controller.is_saturated(0)
+    assert controller.estimated_start(1) == 2 * 30 / 8
@@ -0,0 +1,25 @@
+"""Game session manager tests."""
+import types
+from unittest import mock
+
+import pytest
+
+from cblit.socketio.game import GameSession, GameSessionManager
+
+
+@pytest.mark.asyncio
+async def test_turn_is_delivered_when_save_fails():
+    """Test that a turn is sent to the player even if its session state cannot be saved."""
+    server = mock.Mock(emit=mock.AsyncMock())
+    state_backend = mock.Mock(save=mock.AsyncMock(side_effect=ConnectionError("Redis is down")))
+    manager = GameSessionManager(server, state_backend, corpus=mock.Mock())
+    game = types.SimpleNamespace(say_to_officer=mock.AsyncMock(return_value="Welcome"), won=False)
+    session = GameSession("sid", game)
+    session.batched = True
+    manager.sessions["sid"] = session
+    with mock.patch("cblit.socketio.game.GameSnapshot"):
+        await manager._say("sid", "Hello", "easy")
+    state_backend.save.assert_awaited_once()
+    event, payload, _ = server.emit.call_args.args
+    assert event == "turn"
+    assert "Welcome" in payload
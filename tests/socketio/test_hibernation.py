@@ -0,0 +1,33 @@
+"""Session hibernation tests."""
+import asyncio
+import types
+
+import pytest
+
+from cblit.socketio.game import GameSession
+from cblit.socketio.turn_queue import TurnQueue
+
+
+@pytest.mark.asyncio
+async def test_can_hibernate():
+    """Test that only idle sessions of pregenerated games hibernate, never while starting or with a turn in flight."""
+    game = types.SimpleNamespace(pregenerated_game_id="pregen_1")
+    session = GameSession("sid", game, turns=TurnQueue())
+    assert session.can_hibernate(0)
+    assert not session.can_hibernate(60)
+    session.creating = True
+    assert not session.can_hibernate(0)
+    session.creating = False
+
+    release = asyncio.Event()
+    session.turns.submit(release.wait, "turn")
+    await asyncio.sleep(0)
+    assert not session.turns.is_idle
+    assert not session.can_hibernate(0)
+    release.set()
+    while not session.turns.is_idle:
+        await asyncio.sleep(0)
+    assert session.can_hibernate(0)
+
+    session = GameSession("sid", types.SimpleNamespace(pregenerated_game_id=None))
+    assert not session.can_hibernate(0)
@@ -0,0 +1,77 @@
+"""SocketIO messages tests."""
+import json
+from unittest import mock
+
+import pytest
+from dataclasses_json import DataClassJsonMixin
+
+from cblit.socketio import messages
+from cblit.socketio.messages import (
+    NO_WAIT_PAYLOAD,
+    WAIT_PAYLOAD,
+    BriefPayload,
+    DocumentPayload,
+    DocumentsPayload,
+    SayPayload,
+    StaticPayloads,
+    WaitPayload,
+    encode_init_payload,
+    encode_json,
+    get_static_payloads,
+)
+
+
+@pytest.mark.parametrize("payload", [
+    SayPayload(who="officer", message="Zdravo, ¿qué tal?\n[English: Hello]", difficulty=""),
+    DocumentsPayload([DocumentPayload("Passport\n========"), DocumentPayload("Work Permit")]),
+    BriefPayload(country_name="Fradolia", language_name="Fradolian", country_description="A planet"),
+])
+def test_encode_json_matches_dataclasses_json(payload: DataClassJsonMixin):
+    """Test that the fast encoder produces the same messages as dataclasses_json.
+
+    Args:
+        payload (DataClassJsonMixin): payload to encode
+    """
+    assert json.loads(encode_json(payload)) == json.loads(payload.to_json())
+
+
+def test_wait_payloads():
+    """Test pre-encoded wait payloads."""
+    assert WaitPayload.from_json(WAIT_PAYLOAD) == WaitPayload(True)
+    assert WaitPayload.from_json(NO_WAIT_PAYLOAD) == WaitPayload(False)
+
+
+@pytest.mark.parametrize("opening_line", ["Zdravo!", None])
+def test_encode_init_payload(opening_line: str | None):
+    """Test that init payload embeds the static payloads as valid JSON.
+
+    Args:
+        opening_line (str | None): officer's opening line
+    """
+    static_payloads = StaticPayloads(
+        documents=encode_json(DocumentsPayload([DocumentPayload("Passport")])),
+        phrasebook='{"phrases":[]}',
+        brief=encode_json(BriefPayload(country_name="Fradolia", language_name="Fradolian", country_description="")),
+    )
+    payload = json.loads(encode_init_payload("token", static_payloads, opening_line, False))
+    assert payload["token"] == "token"
+    assert payload["documents"] == {"documents": [{"text": "Passport"}]}
+    assert payload["brief"]["country_name"] == "Fradolia"
+    assert payload["say"] == (None if opening_line is None else {
+        "who": "officer", "message": opening_line, "difficulty": "", "idempotency_key": None
+    })
+    assert payload["wait"] is False
+
+
+def test_static_payloads_cache_is_bounded(monkeypatch):
+    """Test that static payloads of the least recently played games are evicted."""
+    monkeypatch.setattr(messages, "STATIC_PAYLOADS_CACHE_SIZE", 2)
+    monkeypatch.setattr(messages, "_static_payloads", messages.OrderedDict())
+    static_payloads = StaticPayloads(documents="[]", phrasebook="{}", brief="{}")
+    game_ids = ["pregen_1", "pregen_2", "pregen_1", "pregen_3", "pregen_1"]
+    with mock.patch.object(StaticPayloads, "from_game", return_value=static_payloads) as from_game:
+        for game_id in game_ids:
+            get_static_payloads(mock.Mock(pregenerated_game_id=game_id))
+    assert list(messages._static_payloads) == ["pregen_3", "pregen_1"]
+    # Only the first game is kept while the others are played, so it is encoded once
+    assert from_game.call_count == len(set(game_ids))
@@ -0,0 +1,43 @@
+"""Task registry tests."""
+import asyncio
+
+import pytest
+
+from cblit.socketio.task_registry import TaskRegistry
+
+
+@pytest.mark.asyncio
+async def test_drain_waits_for_tasks():
+    """Test that draining waits for tasks, including the ones spawned meanwhile, and then releases them."""
+    registry = TaskRegistry()
+    finished = []
+
+    async def follow_up() -> None:
+        await asyncio.sleep(0.01)
+        finished.append("follow-up")
+
+    async def turn() -> None:
+        await asyncio.sleep(0.01)
+        registry.spawn(follow_up(), "session")
+        finished.append("turn")
+
+    registry.spawn(turn(), "session")
+    assert registry.report() == {"session": 1}
+    assert await registry.drain(1.0)
+    assert finished == ["turn", "follow-up"]
+    assert not registry.tasks
+
+
+@pytest.mark.asyncio
+async def test_drain_cancels_late_tasks():
+    """Test that tasks still running after the timeout are cancelled, and failed ones are released."""
+    registry = TaskRegistry()
+
+    async def fail() -> None:
+        raise ValueError("failed")
+
+    registry.spawn(fail())
+    slow = registry.spawn(asyncio.sleep(10), "session")
+    assert not await registry.drain(0.01)
+    assert slow.cancelled()
+    assert not registry.tasks
@@ -0,0 +1,92 @@
+"""Turn queue tests."""
+import asyncio
+
+import pytest
+
+from cblit.socketio.turn_queue import TurnPolicy, TurnQueue
+
+
+class Recorder:
+    """Recorder of run turns, which only finish when released."""
+
+    def __init__(self) -> None:
+        """Initialise empty recorder."""
+        self.started: list[str] = []
+        self.running = 0
+        self.max_running = 0
+        self.release = asyncio.Event()
+
+    def turn(self, name: str):
+        """Create a turn.
+
+        Args:
+            name (str): turn name
+
+        Returns:
+            Turn: function creating the turn's coroutine
+        """
+        async def run() -> None:
+            self.started.append(name)
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+            await self.release.wait()
+            self.running -= 1
+        return run
+
+
+async def drain(queue: TurnQueue, recorder: Recorder) -> None:
+    """Let the queue run all of its turns.
+
+    Args:
+        queue (TurnQueue): queue to drain
+        recorder (Recorder): recorder of the queue's turns
+    """
+    recorder.release.set()
+    while not queue.is_idle:
+        await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(("policy", "expected"), [
+    (TurnPolicy.SERIALIZE, ["a", "a", "b"]),
+    (TurnPolicy.DROP_DUPLICATES, ["a", "b"]),
+    (TurnPolicy.REPLACE_PENDING, ["a", "b"]),
+])
+async def test_policies(policy: TurnPolicy, expected: list[str]):
+    """Test that turns never run concurrently, and are deduplicated according to the policy.
+
+    Args:
+        policy (TurnPolicy): policy to test
+        expected (list[str]): expected turns to run
+    """
+    queue = TurnQueue(policy)
+    recorder = Recorder()
+    for name in ["a", "a", "b"]:
+        queue.submit(recorder.turn(name), name)
+        await asyncio.sleep(0)
+    await drain(queue, recorder)
+    assert recorder.started == expected
+    assert recorder.max_running == 1
+
+
+@pytest.mark.asyncio
+async def test_idempotency_key():
+    """Test that a resent turn is only run once, even after it has finished."""
+    queue = TurnQueue()
+    recorder = Recorder()
+    assert queue.submit(recorder.turn("a"), "a", "key")
+    await drain(queue, recorder)
+    assert not queue.submit(recorder.turn("a"), "a", "key")
+    assert recorder.started == ["a"]
+
+
+@pytest.mark.asyncio
+async def test_drop_duplicates_by_content():
+    """Test that duplicates are dropped by their content, even when the client has sent different keys."""
+    queue = TurnQueue(TurnPolicy.DROP_DUPLICATES)
+    recorder = Recorder()
+    assert queue.submit(recorder.turn("a"), "a", "key-1")
+    assert not queue.submit(recorder.turn("a"), "a", "key-2")
+    assert queue.submit(recorder.turn("b"), "b", "key-3")
+    await drain(queue, recorder)
+    assert recorder.started == ["a", "b"]
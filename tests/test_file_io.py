@@ -0,0 +1,26 @@
+"""Asynchronous file I/O tests."""
+import pytest
+
+from cblit import file_io
+from cblit.file_io import read_json, write_text
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("mmap_threshold", [0, file_io.MMAP_THRESHOLD])
+async def test_write_and_read_json(tmp_path, monkeypatch, mmap_threshold: int):
+    """Test that JSON is read back the same, whether or not it is memory mapped."""
+    monkeypatch.setattr(file_io, "MMAP_THRESHOLD", mmap_threshold)
+    path = str(tmp_path / "game.json")
+    await write_text(path, '{"phrases": ["Hello", "Goodbye"]}')
+    assert await read_json(path) == {"phrases": ["Hello", "Goodbye"]}
+    assert [p.name for p in tmp_path.iterdir()] == ["game.json"]
+
+
+def test_create_text_atomically(tmp_path):
+    """Test that a new file is never written over an existing one."""
+    path = str(tmp_path / "pregen_1.json")
+    file_io.create_text_atomically(path, "first")
+    with pytest.raises(FileExistsError):
+        file_io.create_text_atomically(path, "second")
+    assert file_io.read_text_file(path) == "first"
+    assert [p.name for p in tmp_path.iterdir()] == ["pregen_1.json"]
@@ -0,0 +1,25 @@
+"""Logging tests."""
+import pytest
+
+from cblit import logs
+from cblit.logs import LoggingPolicy, set_policy, truncate
+
+
+def test_policy_from_env(monkeypatch):
+    """Test that stage levels are read from the environment."""
+    monkeypatch.setenv("CBLIT_LOG_STAGE_LEVELS", "officer=debug, translator=WARNING")
+    monkeypatch.setenv("CBLIT_LOG_PROMPT_SAMPLE_RATE", "0.1")
+    policy = LoggingPolicy.from_env()
+    assert policy.stage_levels == {"officer": "DEBUG", "translator": "WARNING"}
+    assert policy.prompt_sample_rate == pytest.approx(0.1)
+
+
+def test_truncate():
+    """Test that long texts are cut short, with the number of omitted characters."""
+    previous = LoggingPolicy(**vars(logs.policy))
+    set_policy(LoggingPolicy(max_length=5))
+    try:
+        assert truncate("Hello") == "Hello"
+        assert truncate("Hello, officer!") == "Hello... [10 more characters]"
+    finally:
+        set_policy(previous)